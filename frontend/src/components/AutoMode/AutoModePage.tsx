@@ -1,6 +1,6 @@
 import React, { useState, useEffect, useRef, useCallback, lazy, Suspense } from 'react'; // Import lazy and Suspense
 import { getMessage } from '../../lang';
-import { Message as ServiceMessage, HistoryCommand } from './types';
+import { Message as ServiceMessage, HistoryCommand, JobStatusContent } from './types';
 import { ChatPanel } from './index';
 import InputPanel from './InputPanel';
 import AskUserDialog from './AskUserDialog'; // Import the new component
@@ -28,6 +28,7 @@ const AutoModePage: React.FC<AutoModePageProps> = ({ projectName, onSwitchToExpe
   const [messages, setMessages] = useState<Message[]>([]); // 存储所有消息的数组
   const [isProcessing, setIsProcessing] = useState(false); // 命令处理中状态标志
   const [isStreaming, setIsStreaming] = useState(false); // 流式响应状态标志
+  const [queuedJob, setQueuedJob] = useState<JobStatusContent | null>(null); // 任务排队时的位置，开始执行后清空
   const [activeAskUserMessage, setActiveAskUserMessage] = useState<Message | null>(null); // 当前活动的用户询问消息
   const [currentEventFileId, setCurrentEventFileId] = useState<string | null>(null); // 当前事件文件ID
   const [isMessageAreaVisible, setIsMessageAreaVisible] = useState(true); // 消息区域显示状态
@@ -160,6 +161,11 @@ const AutoModePage: React.FC<AutoModePageProps> = ({ projectName, onSwitchToExpe
     });
 
     // 组件卸载时清理
+    // 排队位置只作为状态提示显示
+    autoCommandService.on('jobStatus', (status: JobStatusContent) => {
+      setQueuedJob(status.status === 'queued' ? status : null);
+    });
+
     return () => {
       autoCommandService.closeEventStream();
       autoCommandService.removeAllListeners();
@@ -211,6 +217,7 @@ const AutoModePage: React.FC<AutoModePageProps> = ({ projectName, onSwitchToExpe
         
         // 任务真正停止的时候是这个时候
         setIsProcessing(false);
+        setQueuedJob(null);
         console.log('AutoModePage: Set isProcessing to false');
         saveTaskHistory(isError, lastSubmittedQuery, currentEventFileId);
       } else {
@@ -446,6 +453,12 @@ const AutoModePage: React.FC<AutoModePageProps> = ({ projectName, onSwitchToExpe
           currentEventFileId={currentEventFileId}
         />
 
+        {isProcessing && queuedJob && (
+          <div className="text-center text-xs text-gray-400 mt-2">
+            {getMessage('jobQueuedPosition', { position: queuedJob.position })}
+          </div>
+        )}
+
         {/* 示例命令区域 - 提供快速使用的示例命令按钮 */}
         <div className="text-center text-gray-400 mt-4">
           <p className="mb-2">{getMessage('autoModeDescription')}</p>
@@ -36,6 +36,14 @@ export interface BaseEventContent {
     speed: number;
   }
   
+  // Queue position of a job, sent with content_type "job_status"; position 0 means it started
+  export interface JobStatusContent {
+    job_id: string;
+    kind: string;
+    status: 'queued' | 'running';
+    position: number;
+  }
+
   // Index build start content
   export interface IndexBuildStartContent {
     file_number: number;
@@ -21,7 +21,7 @@ import { AgenticEditService } from '../../services/agenticEditService';
 import { AutoCoderConfService } from '../../services/AutoCoderConfService';
 import { ChatListService } from '../../services/chatListService';
 import { FileGroupService } from '../../services/fileGroupService';
-import { Message as AutoModeMessage } from '../../components/AutoMode/types';
+import { Message as AutoModeMessage, JobStatusContent } from '../../components/AutoMode/types';
 import MessageList, { MessageProps } from '../../components/AutoMode/MessageList';
 import eventBus from '../../services/eventBus';
 import { EVENTS } from '../../services/eventBus';
@@ -192,6 +192,8 @@ const ChatPanel: React.FC<ChatPanelProps> = ({
   const [showChatListInput, setShowChatListInput] = useState(false);
 
   const [sendLoading, setSendLoading] = useState<boolean>(false);
+  // 任务在调度器中排队时的位置，开始执行后清空
+  const [queuedJob, setQueuedJob] = useState<JobStatusContent | null>(null);
   const editorRef = useRef<any>(null);
   const messagesEndRef = useRef<HTMLDivElement>(null);
   const messagesContainerRef = useRef<HTMLDivElement>(null); // 添加消息容器的引用，用于导出图片
@@ -776,7 +778,14 @@ const ChatPanel: React.FC<ChatPanelProps> = ({
       updateMessage(autoModeMessage);
     });
 
-    service.on('taskComplete', handleTaskCompletion);
+    service.on('jobStatus', (status: JobStatusContent) => {
+      setQueuedJob(status.status === 'queued' ? status : null);
+    });
+
+    service.on('taskComplete', (hasError: boolean) => {
+      setQueuedJob(null);
+      handleTaskCompletion(hasError);
+    });
   }, [handleTaskCompletion, updateMessage]);
 
   // 在组件挂载时设置事件监听器
@@ -1666,6 +1675,11 @@ const ChatPanel: React.FC<ChatPanelProps> = ({
                 <div className="w-1.5 h-1.5 bg-gray-400 rounded-full animate-bounce" style={{ animationDelay: '150ms' }}></div>
                 <div className="w-1.5 h-1.5 bg-gray-400 rounded-full animate-bounce" style={{ animationDelay: '300ms' }}></div>
               </div>
+              {queuedJob && (
+                <span className="ml-2 mt-1 text-xs text-gray-400">
+                  {getMessage('jobQueuedPosition', { position: queuedJob.position })}
+                </span>
+              )}
             </div>
           </div>
 
@@ -8,6 +8,7 @@ import '@xterm/xterm/css/xterm.css';
 
 interface TerminalProps {
   useLocalHost?: boolean; // 控制是否使用本地固定地址
+  sessionName?: string; // 命名会话：断线或刷新页面后重新连接到同一个仍在运行的shell
 }
 
 // 检测是否为开发环境
@@ -38,8 +39,25 @@ const isDevEnvironment = (): boolean => {
   return false;
 };
 
+// 终端输出以二进制帧（原始字节）接收，由 xterm 增量解码 UTF-8
+const openTerminalSocket = (host: string, sessionName?: string): WebSocket => {
+  const session = sessionName ? `&session=${encodeURIComponent(sessionName)}` : '';
+  const ws = new WebSocket(`ws://${host}/ws/terminal?binary=1${session}`);
+  ws.binaryType = 'arraybuffer';
+  return ws;
+};
+
+// 重新连接命名会话时，服务端将回滚缓冲作为一个 gzip 压缩的二进制帧发送
+const gunzip = async (data: ArrayBuffer): Promise<Uint8Array> => {
+  // DecompressionStream 不在 TypeScript 4.9 的 DOM 类型中
+  const DecompressionStream = (window as any).DecompressionStream;
+  const stream = new Response(data).body!.pipeThrough(new DecompressionStream('gzip'));
+  return new Uint8Array(await new Response(stream).arrayBuffer());
+};
+
 const Terminal: React.FC<TerminalProps> = ({ 
-  useLocalHost = isDevEnvironment() // 根据环境自动设置默认值
+  useLocalHost = isDevEnvironment(), // 根据环境自动设置默认值
+  sessionName
 }) => {
   const terminalRef = useRef<HTMLDivElement>(null);
   const xtermRef = useRef<XTerminal | null>(null);
@@ -83,7 +101,7 @@ const Terminal: React.FC<TerminalProps> = ({
     // Initialize WebSocket connection with heartbeat
     // const host = window.location.host
     const host = useLocalHost ? "127.0.0.1:8007" : window.location.host;
-    const ws = new WebSocket(`ws://${host}/ws/terminal`);
+    const ws = openTerminalSocket(host, sessionName);
     websocketRef.current = ws;
 
     ws.onopen = () => {
@@ -96,9 +114,11 @@ const Terminal: React.FC<TerminalProps> = ({
         }
         
         heartbeatIntervalRef.current = setInterval(() => {
-          if (ws.readyState === WebSocket.OPEN) {
+          // 重连后 websocketRef 指向新连接，不能使用闭包中的 ws
+          const socket = websocketRef.current;
+          if (socket?.readyState === WebSocket.OPEN) {
             try {
-              ws.send(JSON.stringify({ type: 'heartbeat' }));
+              socket.send(JSON.stringify({ type: 'heartbeat' }));
             } catch (error) {
               console.error('Failed to send heartbeat:', error);
               handleReconnect();
@@ -116,7 +136,7 @@ const Terminal: React.FC<TerminalProps> = ({
           xterm.writeln('\r\n' + getMessage('connectionLost'));
           // const host = window.location.host
           const host = useLocalHost ? "127.0.0.1:8007" : window.location.host;
-          const newWs = new WebSocket(`ws://${host}/ws/terminal`);
+          const newWs = openTerminalSocket(host, sessionName);
           websocketRef.current = newWs;
           
           // Reattach all event handlers
@@ -131,7 +151,7 @@ const Terminal: React.FC<TerminalProps> = ({
 
       // Send initial size with error handling
       try {
-        ws.send(JSON.stringify({
+        websocketRef.current?.send(JSON.stringify({
           type: 'resize',
           cols: xterm.cols,
           rows: xterm.rows
@@ -142,22 +162,46 @@ const Terminal: React.FC<TerminalProps> = ({
       }
     };
 
+    // 回滚缓冲需要异步解压，所有输出按到达顺序排队写入
+    let outputQueue: Promise<void> = Promise.resolve();
+    let expectScrollback = false;
+    const enqueueOutput = (task: () => void | Promise<void>) => {
+      outputQueue = outputQueue.then(task).catch((error) => {
+        console.error('Error writing to terminal:', error);
+      });
+    };
+
     ws.onmessage = (event) => {
       try {
         const data = event.data;
         if (typeof data === 'string') {
-          let isHeartbeat = false;
+          let controlType: string | null = null;
+          let jsonData: any = null;
           try {
-            const jsonData = JSON.parse(data);
-            isHeartbeat =
-              typeof jsonData === 'object' &&
-              jsonData !== null &&
-              jsonData.type === 'heartbeat';
+            jsonData = JSON.parse(data);
+            if (typeof jsonData === 'object' && jsonData !== null && typeof jsonData.type === 'string') {
+              controlType = jsonData.type;
+            }
           } catch {
             /* Not JSON – fall through */
           }
-          if (!isHeartbeat) {
-            xterm.write(data);
+          if (controlType === 'scrollback') {
+            expectScrollback = true;
+          } else if (controlType === 'error') {
+            xterm.writeln('\r\n' + jsonData.message);
+          } else if (controlType !== 'heartbeat') {
+            enqueueOutput(() => xterm.write(data));
+          }
+        } else if (data instanceof ArrayBuffer) {
+          if (expectScrollback) {
+            expectScrollback = false;
+            enqueueOutput(async () => {
+              const scrollback = await gunzip(data);
+              xterm.reset();
+              xterm.write(scrollback);
+            });
+          } else {
+            enqueueOutput(() => xterm.write(new Uint8Array(data)));
           }
         } else if (data instanceof Blob) {
           const reader = new FileReader();
@@ -191,7 +235,7 @@ const Terminal: React.FC<TerminalProps> = ({
           if (websocketRef.current?.readyState === WebSocket.CLOSED) {
             // const host = window.location.host
             const host = useLocalHost ? "127.0.0.1:8007" : window.location.host;
-            const newWs = new WebSocket(`ws://${host}/ws/terminal`);
+            const newWs = openTerminalSocket(host, sessionName);
             websocketRef.current = newWs;
             // Reattach all event handlers
             newWs.onopen = ws.onopen;
@@ -245,7 +289,7 @@ const Terminal: React.FC<TerminalProps> = ({
       }
       window.removeEventListener('resize', handleResize);
     };
-  }, [useLocalHost]); // 添加useLocalHost作为依赖
+  }, [useLocalHost, sessionName]); // 添加useLocalHost作为依赖
 
   return (
     <div className="h-full w-full bg-[#1e1e1e]">
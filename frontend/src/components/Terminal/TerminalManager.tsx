@@ -7,12 +7,32 @@ import { getMessage } from '../../lang';
 interface TerminalTab {
   id: string;
   name: string;
+  sessionName: string; // 服务端命名会话，刷新页面后重新连接到同一个shell
 }
 
+const TERMINAL_TABS_KEY = 'terminalTabs';
+
+const newSessionName = (): string =>
+  `term-${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 8)}`;
+
+const loadTerminalTabs = (): TerminalTab[] => {
+  try {
+    const saved = JSON.parse(localStorage.getItem(TERMINAL_TABS_KEY) || '[]');
+    if (Array.isArray(saved) && saved.length > 0 && saved.every((t: any) => t && t.id && t.sessionName)) {
+      return saved;
+    }
+  } catch {
+    /* ignore invalid saved tabs */
+  }
+  return [{ id: '1', name: `${getMessage('terminal')} 1`, sessionName: newSessionName() }];
+};
+
 const TerminalManager: React.FC = () => {
-  const [terminals, setTerminals] = useState<TerminalTab[]>([
-    { id: '1', name: `${getMessage('terminal')} 1` }
-  ]);
+  const [terminals, setTerminals] = useState<TerminalTab[]>(loadTerminalTabs);
+
+  useEffect(() => {
+    localStorage.setItem(TERMINAL_TABS_KEY, JSON.stringify(terminals));
+  }, [terminals]);
   
   // 在组件挂载时触发resize事件
   // 注释掉，暂时没发现这里去掉后有什么影响，其他监听的都有自己的完整的监听卸载事件
@@ -24,17 +44,23 @@ const TerminalManager: React.FC = () => {
   //   window.addEventListener('resize', handleResize);
   //   return () => window.removeEventListener('resize', handleResize);
   // }, []);
-  const [activeTerminal, setActiveTerminal] = useState<string>('1');
+  const [activeTerminal, setActiveTerminal] = useState<string>(() => terminals[0].id);
   const [isSettingsVisible, setIsSettingsVisible] = useState<boolean>(false);
 
   const addTerminal = () => {
-    const newId = String(terminals.length + 1);
-    setTerminals([...terminals, { id: newId, name: `${getMessage('terminal')} ${newId}` }]);
+    const newId = String(Math.max(0, ...terminals.map(t => Number(t.id) || 0)) + 1);
+    setTerminals([...terminals, { id: newId, name: `${getMessage('terminal')} ${newId}`, sessionName: newSessionName() }]);
     setActiveTerminal(newId);
   };
 
   const removeTerminal = (id: string) => {
     if (terminals.length > 1) {
+      const removed = terminals.find(t => t.id === id);
+      if (removed) {
+        // 命名会话在连接断开后仍会保留，关闭标签页时显式结束其shell
+        fetch(`/api/terminal/sessions/${encodeURIComponent(removed.sessionName)}`, { method: 'DELETE' })
+          .catch(error => console.error('Failed to close terminal session:', error));
+      }
       const newTerminals = terminals.filter(t => t.id !== id);
       setTerminals(newTerminals);
       if (activeTerminal === id) {
@@ -58,7 +84,7 @@ const TerminalManager: React.FC = () => {
             key={terminal.id}
             className={`h-full ${activeTerminal === terminal.id ? 'block' : 'hidden'}`}
           >
-            <Terminal />
+            <Terminal sessionName={terminal.sessionName} />
           </div>
         ))}
       </div>
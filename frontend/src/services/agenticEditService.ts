@@ -1,5 +1,5 @@
 import { EventEmitter } from 'eventemitter3';
-import { Message, AutoCommandEvent, StreamContent, ResultContent, AskUserContent, UserResponseContent, ErrorContent, CompletionContent, ResultTokenStatContent, ResultCommandPrepareStatContent, ResultCommandExecuteStatContent, ResultContextUsedContent, CodeContent, MarkdownContent, ResultSummaryContent, IndexBuildStartContent, IndexBuildEndContent } from '../components/AutoMode/types';
+import { Message, AutoCommandEvent, StreamContent, ResultContent, AskUserContent, UserResponseContent, ErrorContent, CompletionContent, ResultTokenStatContent, ResultCommandPrepareStatContent, ResultCommandExecuteStatContent, ResultContextUsedContent, CodeContent, MarkdownContent, ResultSummaryContent, IndexBuildStartContent, IndexBuildEndContent, JobStatusContent } from '../components/AutoMode/types';
 import eventBus, { EVENTS } from './eventBus';
 import { v4 as uuidv4 } from 'uuid';
 
@@ -17,6 +17,7 @@ export class AgenticEditService extends EventEmitter {
   private maxReconnectAttempts: number = 5;
   private currentReconnectAttempts: number = 0;
   private reconnectDelay: number = 3000; // 3秒重连延迟
+  private lastEventId: string | null = null; // 最后收到的事件ID，用于断线后续传
 
   constructor(panelId?: string) {
     super();
@@ -69,6 +70,7 @@ export class AgenticEditService extends EventEmitter {
     // 设置连接状态为活跃
     this.isConnectionActive = true;
     this.currentReconnectAttempts = 0;
+    this.lastEventId = null;
     
     const connect = () => {
       // 如果已经不需要连接了，不执行重连
@@ -79,13 +81,21 @@ export class AgenticEditService extends EventEmitter {
 
       console.log(`尝试建立SSE连接: ${this.eventFileId} (尝试次数: ${this.currentReconnectAttempts})`);
       
-      // 创建新的EventSource连接
-      this.eventSource = new EventSource(`/api/auto-command/events?event_file_id=${this.eventFileId}`);
+      // 创建新的EventSource连接，重连时从最后收到的事件之后继续
+      const resumeParam = this.lastEventId ? `&last_event_id=${encodeURIComponent(this.lastEventId)}` : '';
+      // batch=true: 高频输出时多个事件合并为一帧（事件数组）；compress=true: 浏览器支持时使用gzip
+      this.eventSource = new EventSource(`/api/auto-command/events?event_file_id=${this.eventFileId}&batch=true&compress=true${resumeParam}`);
 
       this.eventSource.onmessage = (event) => {
+        if (event.lastEventId) {
+          this.lastEventId = event.lastEventId;
+        }
         try {
-          const eventData: AutoCommandEvent = JSON.parse(event.data);        
-          this.handleEvent(eventData);
+          const eventData: AutoCommandEvent | AutoCommandEvent[] = JSON.parse(event.data);
+          const events = Array.isArray(eventData) ? eventData : [eventData];
+          for (const item of events) {
+            this.handleEvent(item);
+          }
         } catch (error) {
           console.error('解析事件数据错误:', error);
         }
@@ -100,11 +110,13 @@ export class AgenticEditService extends EventEmitter {
           this.eventSource = null;
         }
         
-        // 重置流相关状态，但保留eventFileId
-        this.streamEvents.clear();
-        this.lastEventType = null;
-        this.currentStreamMessageId = null;
-        this.isStreamingActive = false;
+        // 无法续传时重置流相关状态，但保留eventFileId；续传时保持当前流式消息继续累积
+        if (!this.lastEventId) {
+          this.streamEvents.clear();
+          this.lastEventType = null;
+          this.currentStreamMessageId = null;
+          this.isStreamingActive = false;
+        }
         
         // 如果连接仍应该活跃，尝试重连
         if (this.isConnectionActive) {
@@ -241,6 +253,12 @@ export class AgenticEditService extends EventEmitter {
   private handleResultEvent(event: AutoCommandEvent, messageId: string) {
     const content = event.content as ResultContent;
 
+    // 排队位置更新只用于显示状态，不作为消息显示，也不会进入聊天历史
+    if (content.content_type === 'job_status') {
+      this.emit('jobStatus', content.content as JobStatusContent);
+      return;
+    }
+
     let messageContent: string;
     let contentType = content.content_type;
     let metadata = { ...content.metadata, ...event.metadata };
@@ -1,9 +1,10 @@
 import { EventEmitter } from 'eventemitter3';
-import { Message, AutoCommandEvent, StreamContent, ResultContent, AskUserContent, UserResponseContent, ErrorContent, CompletionContent, ResultTokenStatContent, ResultCommandPrepareStatContent, ResultCommandExecuteStatContent, ResultContextUsedContent, CodeContent, MarkdownContent, ResultSummaryContent, IndexBuildStartContent, IndexBuildEndContent } from '../components/AutoMode/types';
+import { eventChannel } from './eventChannel';
+import { Message, AutoCommandEvent, StreamContent, ResultContent, AskUserContent, UserResponseContent, ErrorContent, CompletionContent, ResultTokenStatContent, ResultCommandPrepareStatContent, ResultCommandExecuteStatContent, ResultContextUsedContent, CodeContent, MarkdownContent, ResultSummaryContent, IndexBuildStartContent, IndexBuildEndContent, JobStatusContent } from '../components/AutoMode/types';
 
 
 class AutoCommandService extends EventEmitter {
-  private eventSource: EventSource | null = null;
+  private unsubscribeEvents: (() => void) | null = null;
   private streamEvents: Map<string, Message> = new Map();
   private lastEventType: string | null = null;
   private messageId = 0;
@@ -53,21 +54,15 @@ class AutoCommandService extends EventEmitter {
       return;
     }
 
-    this.eventSource = new EventSource(`/api/auto-command/events?event_file_id=${this.eventFileId}`);
-
-    this.eventSource.onmessage = (event) => {
-      try {
-        const eventData: AutoCommandEvent = JSON.parse(event.data);        
-        this.handleEvent(eventData);
-      } catch (error) {
-        console.error('Error parsing event data:', error);
-      }
-    };
-
-    this.eventSource.onerror = (error) => {
-      console.error('EventSource error:', error);
-      this.closeEventStream();
-    };
+    // 通过共享的 /ws/events 连接订阅事件流，任务结束（COMPLETION/ERROR）后服务端结束订阅
+    this.unsubscribeEvents = eventChannel.subscribe(this.eventFileId, {
+      onEvent: (event) => this.handleEvent(event),
+      onEnd: () => this.closeEventStream(),
+      onError: (message) => {
+        console.error('Event channel error:', message);
+        this.closeEventStream();
+      },
+    });
   }
 
   private handleEvent(event: AutoCommandEvent) {
@@ -175,6 +170,12 @@ class AutoCommandService extends EventEmitter {
   private handleResultEvent(event: AutoCommandEvent, messageId: string) {
     const content = event.content as ResultContent;
 
+    // 排队位置更新只用于显示状态，不作为消息显示，也不会进入聊天历史
+    if (content.content_type === 'job_status') {
+      this.emit('jobStatus', content.content as JobStatusContent);
+      return;
+    }
+
     let messageContent: string;
     let contentType = content.content_type;
     let metadata = { ...content.metadata, ...event.metadata };
@@ -405,9 +406,9 @@ class AutoCommandService extends EventEmitter {
   }
 
   closeEventStream() {
-    if (this.eventSource) {
-      this.eventSource.close();
-      this.eventSource = null;
+    if (this.unsubscribeEvents) {
+      this.unsubscribeEvents();
+      this.unsubscribeEvents = null;
     }
     // Finalize any pending stream messages
     Array.from(this.streamEvents.keys()).forEach(messageId => {
@@ -426,21 +427,7 @@ class AutoCommandService extends EventEmitter {
     }
 
     try {
-      const apiResponse = await fetch('/api/auto-command/response', {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-          event_id: eventId,
-          event_file_id: this.eventFileId,
-          response
-        }),
-      });
-
-      if (!apiResponse.ok) {
-        throw new Error(`HTTP error! status: ${apiResponse.status}`);
-      }
+      await eventChannel.respond(this.eventFileId, eventId, response);
 
     } catch (error) {
       console.error('Error sending user response:', error);
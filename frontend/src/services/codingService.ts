@@ -1,4 +1,5 @@
 import { EventEmitter } from 'eventemitter3';
+import { eventChannel } from './eventChannel';
 import { v4 as uuidv4 } from 'uuid';
 import eventBus, { EVENTS } from './eventBus';
 import { 
@@ -18,11 +19,12 @@ import {
   MarkdownContent, 
   ResultSummaryContent,
   IndexBuildStartContent,
-  IndexBuildEndContent 
+  IndexBuildEndContent,
+  JobStatusContent
 } from '../components/AutoMode/types';
 
 export class CodingService extends EventEmitter {
-  private eventSource: EventSource | null = null;
+  private unsubscribeEvents: (() => void) | null = null;
   private streamEvents: Map<string, AutoModeMessage> = new Map();
   private lastEventType: string | null = null;
   private messageId = 0;
@@ -77,21 +79,15 @@ export class CodingService extends EventEmitter {
       return;
     }
 
-    this.eventSource = new EventSource(`/api/coding-command/events?event_file_id=${this.eventFileId}`);
-
-    this.eventSource.onmessage = (event) => {
-      try {
-        const eventData: AutoCommandEvent = JSON.parse(event.data);        
-        this.handleEvent(eventData);
-      } catch (error) {
-        console.error('Error parsing event data:', error);
-      }
-    };
-
-    this.eventSource.onerror = (error) => {
-      console.error('EventSource error:', error);
-      this.closeEventStream();
-    };
+    // 通过共享的 /ws/events 连接订阅事件流，任务结束（COMPLETION/ERROR）后服务端结束订阅
+    this.unsubscribeEvents = eventChannel.subscribe(this.eventFileId, {
+      onEvent: (event) => this.handleEvent(event),
+      onEnd: () => this.closeEventStream(),
+      onError: (message) => {
+        console.error('Event channel error:', message);
+        this.closeEventStream();
+      },
+    });
   }
 
   private handleEvent(event: AutoCommandEvent) {
@@ -201,6 +197,12 @@ export class CodingService extends EventEmitter {
   private handleResultEvent(event: AutoCommandEvent, messageId: string) {
     const content = event.content as ResultContent;
 
+    // 排队位置更新只用于显示状态，不作为消息显示，也不会进入聊天历史
+    if (content.content_type === 'job_status') {
+      this.emit('jobStatus', content.content as JobStatusContent);
+      return;
+    }
+
     console.log('原始消息', event);
     let messageContent: string;
     let contentType = content.content_type;
@@ -441,9 +443,9 @@ export class CodingService extends EventEmitter {
   }
 
   closeEventStream() {
-    if (this.eventSource) {
-      this.eventSource.close();
-      this.eventSource = null;
+    if (this.unsubscribeEvents) {
+      this.unsubscribeEvents();
+      this.unsubscribeEvents = null;
     }
 
     // Finalize any pending stream messages
@@ -463,21 +465,7 @@ export class CodingService extends EventEmitter {
     }
 
     try {
-      const response_data = await fetch('/api/coding-command/response', {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-          event_id: eventId,
-          event_file_id: this.eventFileId,
-          response,
-        }),
-      });
-
-      if (!response_data.ok) {
-        throw new Error(`HTTP error! status: ${response_data.status}`);
-      }
+      await eventChannel.respond(this.eventFileId, eventId, response);
 
     } catch (error) {
       console.error('Error sending response:', error);
@@ -535,19 +523,7 @@ export class CodingService extends EventEmitter {
     }
 
     try {
-      const response = await fetch('/api/coding-command/cancel', {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-          event_file_id: this.eventFileId,
-        }),
-      });
-
-      if (!response.ok) {
-        throw new Error(`HTTP error! status: ${response.status}`);
-      }
+      await eventChannel.cancel(this.eventFileId);
 
       // Close the event stream
       this.closeEventStream();
@@ -0,0 +1,185 @@
+import { AutoCommandEvent } from '../components/AutoMode/types';
+
+/**
+ * 多路复用的任务事件通道（/ws/events）
+ *
+ * 所有面板的 chat/coding/auto 任务共用一个 WebSocket 连接订阅事件流，
+ * 用户响应和取消请求也通过同一连接发送，避免每个任务占用一个 SSE 长连接。
+ * 每收到一批事件就回 ack 补充服务端的发送额度（流控）；断线后自动重连，
+ * 并从每个订阅最后收到的事件之后继续。
+ */
+
+export interface EventSubscriptionHandlers {
+  onEvent: (event: AutoCommandEvent) => void;
+  // 收到 COMPLETION/ERROR 事件后服务端结束该订阅
+  onEnd?: (reason: string) => void;
+  onError?: (message: string) => void;
+}
+
+interface ChannelSubscription {
+  eventFileId: string;
+  handlers: EventSubscriptionHandlers;
+  lastEventId: string | null;
+}
+
+interface PendingRequest {
+  resolve: (value: any) => void;
+  reject: (error: Error) => void;
+  timer: ReturnType<typeof setTimeout>;
+}
+
+const SUBSCRIPTION_WINDOW = 512;
+const REQUEST_TIMEOUT = 30000;
+const RECONNECT_DELAY = 1000;
+const MAX_RECONNECT_DELAY = 10000;
+
+class EventChannel {
+  private ws: WebSocket | null = null;
+  private connected = false;
+  private subscriptions: Map<string, ChannelSubscription> = new Map();
+  private pendingRequests: Map<string, PendingRequest> = new Map();
+  private outbox: string[] = [];
+  private requestSeq = 0;
+  private reconnectDelay = RECONNECT_DELAY;
+  private reconnectTimer: ReturnType<typeof setTimeout> | null = null;
+
+  subscribe(eventFileId: string, handlers: EventSubscriptionHandlers): () => void {
+    const subscription: ChannelSubscription = { eventFileId, handlers, lastEventId: null };
+    this.subscriptions.set(eventFileId, subscription);
+    this.sendSubscribe(subscription);
+    return () => {
+      if (this.subscriptions.get(eventFileId) === subscription) {
+        this.subscriptions.delete(eventFileId);
+        this.send({ type: 'unsubscribe', event_file_id: eventFileId });
+      }
+    };
+  }
+
+  respond(eventFileId: string, eventId: string, response: string): Promise<any> {
+    return this.request({ type: 'response', event_file_id: eventFileId, event_id: eventId, response });
+  }
+
+  cancel(eventFileId: string): Promise<any> {
+    return this.request({ type: 'cancel', event_file_id: eventFileId });
+  }
+
+  private request(message: Record<string, any>): Promise<any> {
+    const requestId = `req-${++this.requestSeq}`;
+    return new Promise((resolve, reject) => {
+      const timer = setTimeout(() => {
+        this.pendingRequests.delete(requestId);
+        reject(new Error(`Request ${message.type} timed out`));
+      }, REQUEST_TIMEOUT);
+      this.pendingRequests.set(requestId, { resolve, reject, timer });
+      this.send({ ...message, request_id: requestId });
+    });
+  }
+
+  private sendSubscribe(subscription: ChannelSubscription) {
+    this.send({
+      type: 'subscribe',
+      event_file_id: subscription.eventFileId,
+      last_event_id: subscription.lastEventId,
+      window: SUBSCRIPTION_WINDOW,
+    });
+  }
+
+  private send(message: Record<string, any>) {
+    const data = JSON.stringify(message);
+    if (this.connected && this.ws) {
+      this.ws.send(data);
+      return;
+    }
+    // 订阅在重连时按最新的 lastEventId 重新发送，不进入发送队列
+    if (message.type !== 'subscribe' && message.type !== 'unsubscribe' && message.type !== 'ack') {
+      this.outbox.push(data);
+    }
+    this.connect();
+  }
+
+  private connect() {
+    if (this.ws || this.reconnectTimer) {
+      return;
+    }
+    const protocol = window.location.protocol === 'https:' ? 'wss' : 'ws';
+    const ws = new WebSocket(`${protocol}://${window.location.host}/ws/events`);
+    this.ws = ws;
+
+    ws.onopen = () => {
+      this.connected = true;
+      this.reconnectDelay = RECONNECT_DELAY;
+      this.subscriptions.forEach(subscription => this.sendSubscribe(subscription));
+      const outbox = this.outbox;
+      this.outbox = [];
+      outbox.forEach(data => ws.send(data));
+    };
+
+    ws.onmessage = (event) => {
+      try {
+        this.handleMessage(JSON.parse(event.data));
+      } catch (error) {
+        console.error('Error handling event channel message:', error);
+      }
+    };
+
+    ws.onclose = () => {
+      this.ws = null;
+      this.connected = false;
+      // 仍有订阅或未完成的请求时重连，订阅会从最后收到的事件之后继续
+      if (this.subscriptions.size > 0 || this.pendingRequests.size > 0 || this.outbox.length > 0) {
+        this.reconnectTimer = setTimeout(() => {
+          this.reconnectTimer = null;
+          this.connect();
+        }, this.reconnectDelay);
+        this.reconnectDelay = Math.min(this.reconnectDelay * 2, MAX_RECONNECT_DELAY);
+      }
+    };
+
+    ws.onerror = (error) => {
+      console.warn('Event channel connection error:', error);
+    };
+  }
+
+  private handleMessage(message: any) {
+    const subscription = message.event_file_id ? this.subscriptions.get(message.event_file_id) : undefined;
+    switch (message.type) {
+      case 'events':
+        if (!subscription) {
+          return;
+        }
+        subscription.lastEventId = message.last_event_id;
+        for (const event of message.events as AutoCommandEvent[]) {
+          subscription.handlers.onEvent(event);
+        }
+        this.send({ type: 'ack', event_file_id: subscription.eventFileId, count: message.events.length });
+        return;
+      case 'end':
+        if (subscription) {
+          this.subscriptions.delete(subscription.eventFileId);
+          subscription.handlers.onEnd?.(message.reason);
+        }
+        return;
+      case 'ok':
+      case 'error': {
+        const pending = message.request_id ? this.pendingRequests.get(message.request_id) : undefined;
+        if (pending) {
+          clearTimeout(pending.timer);
+          this.pendingRequests.delete(message.request_id);
+          if (message.type === 'ok') {
+            pending.resolve(message);
+          } else {
+            pending.reject(new Error(message.message));
+          }
+        } else if (message.type === 'error') {
+          console.error('Event channel error:', message.message);
+          subscription?.handlers.onError?.(message.message);
+        }
+        return;
+      }
+      default:
+        return;
+    }
+  }
+}
+
+export const eventChannel = new EventChannel();
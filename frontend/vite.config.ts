@@ -14,6 +14,10 @@ export default defineConfig({
         changeOrigin: true,
         secure: false,
       },
+      "/ws/events": {
+        target: "ws://localhost:8007",
+        ws: true,
+      },
     },
   },
   resolve: {
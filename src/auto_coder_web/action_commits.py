@@ -0,0 +1,161 @@
+"""
+Action file -> commit mapping of event files, for ``/api/current-changes``.
+
+The commits of a task are found through its event file: events name the
+action files the task wrote, and the commits of an action file are the ones
+whose last message line names it (plus reverts that mention it), the same
+rule as ``ActionYmlFileManager.get_all_commit_id_from_file``. That method
+walks the whole history once per action file. ``ActionCommitIndex`` does
+the lookup for all action files in one ``git log --fixed-strings --grep``
+pass, and caches the result per event file:
+
+* events are read incrementally from the last byte offset
+* commit IDs are valid for the HEAD they were computed for; when HEAD moves
+  forward only the new commits are scanned, if it was rewritten the
+  mapping is recomputed
+"""
+import subprocess
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from git import GitCommandError
+from loguru import logger
+
+from auto_coder_web.event_tail import read_events_from_offset
+
+REVERT_PREFIX = "<revert>"
+# Event files whose mapping is kept in memory
+MAX_CACHED_EVENT_FILES = 64
+_RECORD_SEP = "\x1e"
+_FIELD_SEP = "\x00"
+_MESSAGE_LOG_FORMAT = "%H%x00%B%x1e"
+
+
+@dataclass
+class _EventFileEntry:
+    offset: int = 0
+    # Action files named by the events, in order of first appearance
+    action_files: List[str] = field(default_factory=list)
+    # HEAD the commit IDs were computed for
+    head: Optional[str] = None
+    # Action file -> commit SHAs, newest first
+    commit_ids: Dict[str, List[str]] = field(default_factory=dict)
+
+
+def match_action_commits(output: str, action_files: List[str]) -> Dict[str, List[str]]:
+    """
+    Assign the commits of ``git log --format=%H%x00%B%x1e`` output to action files
+
+    Returns:
+        action文件 -> 提交SHA列表（保持git log的顺序）
+    """
+    matches: Dict[str, List[str]] = {action_file: [] for action_file in action_files}
+    for record in output.split(_RECORD_SEP):
+        sha, _, message = record.lstrip("\n").partition(_FIELD_SEP)
+        if not sha:
+            continue
+        last_line = message.strip().split("\n")[-1]
+        for action_file in action_files:
+            if action_file in last_line or (message.startswith(REVERT_PREFIX) and action_file in message):
+                matches[action_file].append(sha)
+    return matches
+
+
+class ActionCommitIndex:
+    """Cached action file -> commit mapping of the event files of one project"""
+
+    def __init__(self, project_path: str, max_entries: int = MAX_CACHED_EVENT_FILES):
+        self.project_path = project_path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _EventFileEntry]" = OrderedDict()
+
+    def _git(self, args: List[str]) -> subprocess.CompletedProcess:
+        return subprocess.run(
+            ["git", *args], cwd=self.project_path,
+            capture_output=True, encoding="utf-8", errors="replace",
+        )
+
+    def _scan(self, action_files: List[str], revisions: List[str]) -> Dict[str, List[str]]:
+        if not action_files:
+            return {}
+        args = ["log", "--fixed-strings", *[f"--grep={action_file}" for action_file in action_files],
+                f"--format={_MESSAGE_LOG_FORMAT}", *revisions]
+        result = self._git(args)
+        if result.returncode != 0:
+            raise GitCommandError(["git", *args], result.returncode, result.stderr)
+        return match_action_commits(result.stdout, action_files)
+
+    def _read_action_files(self, entry: _EventFileEntry, event_file: str) -> List[str]:
+        """Read events appended since the last call, returns the newly named action files"""
+        offset_events, entry.offset, _ = read_events_from_offset(event_file, entry.offset)
+        new_files = []
+        for _, event in offset_events:
+            action_file = (event.metadata or {}).get("action_file")
+            if not action_file:
+                continue
+            # action_file 这里的值是 类似这样的 actions/000000000104_chat_action.yml
+            if action_file.startswith("actions"):
+                action_file = action_file[len("actions/"):]
+            if action_file not in entry.action_files and action_file not in new_files:
+                new_files.append(action_file)
+        return new_files
+
+    def get_commit_ids(self, event_file: str) -> Dict[str, List[str]]:
+        """
+        Commits of each action file named in an event file
+
+        Args:
+            event_file: 事件文件路径
+
+        Returns:
+            action文件 -> 提交SHA列表（最新的在前），按action文件在事件中首次出现的顺序
+        """
+        with self._lock:
+            entry = self._entries.pop(event_file, None) or _EventFileEntry()
+            self._entries[event_file] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+            try:
+                new_files = self._read_action_files(entry, event_file)
+                result = self._git(["rev-parse", "--verify", "--quiet", "HEAD"])
+                head = result.stdout.strip() if result.returncode == 0 else None
+                if head is None:
+                    entry.action_files.extend(new_files)
+                    return {action_file: [] for action_file in entry.action_files}
+
+                if head != entry.head and entry.action_files:
+                    forward = entry.head is not None and self._git(
+                        ["merge-base", "--is-ancestor", entry.head, head]).returncode == 0
+                    if forward:
+                        # HEAD 只是向前移动，只扫描新提交并放在已有结果之前
+                        for action_file, shas in self._scan(entry.action_files, [head, "--not", entry.head]).items():
+                            entry.commit_ids[action_file] = shas + entry.commit_ids.get(action_file, [])
+                    else:
+                        logger.info(f"Rescanning commits of {len(entry.action_files)} action files for {head[:7]}")
+                        entry.commit_ids = self._scan(entry.action_files, [head])
+                if new_files:
+                    entry.commit_ids.update(self._scan(new_files, [head]))
+                    entry.action_files.extend(new_files)
+                entry.head = head
+            except Exception:
+                # 更新到一半失败时丢弃该条目，下次重新计算
+                self._entries.pop(event_file, None)
+                raise
+            return {action_file: list(entry.commit_ids.get(action_file, [])) for action_file in entry.action_files}
+
+
+_indexes: Dict[str, ActionCommitIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_action_commit_index(project_path: str) -> ActionCommitIndex:
+    """The shared action commit index of a project"""
+    with _indexes_lock:
+        index = _indexes.get(project_path)
+        if index is None:
+            index = _indexes[project_path] = ActionCommitIndex(project_path)
+        return index
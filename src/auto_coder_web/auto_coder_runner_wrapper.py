@@ -1,4 +1,6 @@
-from typing import Dict,Any
+import os
+import threading
+from typing import Dict,Any,Optional,Tuple
 from autocoder.auto_coder_runner import (
     auto_command,
     load_memory,
@@ -36,13 +38,56 @@ from autocoder.auto_coder_runner import (
     start as start_engine,
     stop as stop_engine
 )
+from auto_coder_web.job_context import install_job_config_overlay, in_job_context, set_job_conf, unset_job_conf
+
+# 后台任务通过 configure_wrapper 设置的配置只对当前任务生效
+install_job_config_overlay()
+
+# 每个后台命令都会创建一个 AutoCoderRunnerWrapper。tokenizer 的反序列化（数百毫秒）
+# 和 memory.json 的读取在进程内共享：tokenizer 只加载一次，memory 只在文件变化后才重新加载。
+_warm_state_lock = threading.Lock()
+_memory_signature: Optional[Tuple[int, int]] = None
+
+
+def _get_memory_file_signature() -> Optional[Tuple[int, int]]:
+    from autocoder.auto_coder_runner import base_persist_dir
+    try:
+        stat = os.stat(os.path.join(base_persist_dir, "memory.json"))
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def ensure_tokenizer_loaded():
+    """Load the tokenizer unless this process already has one"""
+    from autocoder.rag.variable_holder import VariableHolder
+    if VariableHolder.TOKENIZER_MODEL is not None:
+        return
+    with _warm_state_lock:
+        if VariableHolder.TOKENIZER_MODEL is None:
+            load_tokenizer()
+
+
+def refresh_memory(force: bool = False):
+    """
+    Reload memory.json into the shared memory, skipping the read when the
+    file has not changed since the previous load.
+    """
+    global _memory_signature
+    with _warm_state_lock:
+        signature = _get_memory_file_signature()
+        if not force and signature is not None and signature == _memory_signature:
+            return
+        load_memory()
+        _memory_signature = signature
+
 
 class AutoCoderRunnerWrapper:
     def __init__(self, project_path: str, product_mode: str = "lite"):
         self.project_path = project_path
         self.product_mode = product_mode
-        load_memory()
-        load_tokenizer()
+        refresh_memory()
+        ensure_tokenizer_loaded()
 
 
     def start(self):
@@ -59,8 +104,22 @@ class AutoCoderRunnerWrapper:
         return auto_command(command,params)
     
     def configure_wrapper(self,conf: str, skip_print=False ):
+        # 在后台任务中（如 event_file:xxx），配置只写入当前任务的覆盖层，
+        # 不修改共享的 memory["conf"] 和 memory.json，并发任务互不影响
+        if in_job_context():
+            return self._configure_job(conf)
         return configure(conf, skip_print)  
 
+    def _configure_job(self, conf: str):
+        parts = conf.split(None, 1)
+        if len(parts) == 2 and parts[0] in ["/drop", "/unset", "/remove"]:
+            unset_job_conf(parts[1].strip())
+            return
+        key, sep, value = conf.partition(":")
+        if not sep or not key.strip() or not value.strip():
+            raise ValueError(f"Invalid configuration: {conf}, expected key:value")
+        set_job_conf(key.strip(), value.strip())
+
     def build_index_wrapper(self):
         return index_build()  
     
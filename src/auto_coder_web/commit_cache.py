@@ -0,0 +1,230 @@
+"""
+Commit metadata cache for the commit history endpoints.
+
+The metadata of a commit (author, date, message and its numstat totals)
+never changes for a given SHA, so it is computed once and kept in memory and
+in the append-only ``.auto-coder/cache/commit-metadata.jsonl``.
+
+* pages are listed with ``git log --skip --max-count`` (SHAs only)
+* commits missing from the cache are hydrated with one
+  ``git log --no-walk --numstat`` call per batch instead of one
+  ``commit.stats`` subprocess per commit
+* the total number of commits comes from ``git rev-list --count``, cached
+  per HEAD
+
+Stats follow GitPython's ``Commit.stats``: merges are diffed against their
+first parent, renames are not detected and binary files count as 0 lines.
+"""
+import json
+import os
+import subprocess
+import threading
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from git import GitCommandError
+from loguru import logger
+
+from auto_coder_web.git_service import get_git_service
+
+# Record and field separators of the hydration log format
+_RECORD_SEP = "\x1e"
+_FIELD_SEP = "\x00"
+_HYDRATE_FORMAT = "%x1e%H%x00%an%x00%ae%x00%ct%x00%B%x00"
+
+
+@dataclass
+class CommitMetadata:
+    hash: str
+    author: str
+    timestamp: int
+    message: str
+    insertions: int
+    deletions: int
+    files_changed: int
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Commit info in the shape returned by the commit endpoints"""
+        return {
+            "hash": self.hash,
+            "short_hash": self.hash[:7],
+            "author": self.author,
+            "date": datetime.fromtimestamp(self.timestamp).isoformat(),
+            "timestamp": self.timestamp,
+            "message": self.message,
+            "stats": {
+                "insertions": self.insertions,
+                "deletions": self.deletions,
+                "files_changed": self.files_changed,
+            },
+        }
+
+
+def parse_hydrated_log(output: str) -> List[CommitMetadata]:
+    """Parse the output of ``git log --numstat --format=_HYDRATE_FORMAT``"""
+    commits = []
+    for record in output.split(_RECORD_SEP):
+        if not record.strip():
+            continue
+        fields = record.split(_FIELD_SEP, 5)
+        if len(fields) < 6:
+            continue
+        sha, name, email, committed, message, numstat = fields
+        insertions = deletions = files = 0
+        for line in numstat.splitlines():
+            parts = line.split("\t", 2)
+            if len(parts) != 3:
+                continue
+            files += 1
+            # 二进制文件的增删行数为 "-"
+            insertions += int(parts[0]) if parts[0].isdigit() else 0
+            deletions += int(parts[1]) if parts[1].isdigit() else 0
+        commits.append(CommitMetadata(
+            hash=sha.strip(),
+            author=f"{name} <{email}>",
+            timestamp=int(committed) if committed.isdigit() else 0,
+            message=message.strip(),
+            insertions=insertions,
+            deletions=deletions,
+            files_changed=files,
+        ))
+    return commits
+
+
+class CommitMetadataCache:
+    """Cached commit metadata of one repository"""
+
+    def __init__(self, project_path: str):
+        self.project_path = project_path
+        # 创建时验证仓库；缓存在Git线程池的多个线程中使用，不持有共享的GitPython Repo
+        get_git_service(project_path)
+        self.cache_file = os.path.join(project_path, ".auto-coder", "cache", "commit-metadata.jsonl")
+        self._lock = threading.RLock()
+        self._commits: Dict[str, CommitMetadata] = {}
+        self._loaded = False
+        # (HEAD sha, number of commits reachable from it)
+        self._count: Optional[Tuple[str, int]] = None
+
+    def _git(self, args: List[str], input: Optional[str] = None) -> str:
+        result = subprocess.run(
+            ["git", *args], cwd=self.project_path, input=input,
+            capture_output=True, encoding="utf-8", errors="replace",
+        )
+        if result.returncode != 0:
+            raise GitCommandError(["git", *args], result.returncode, result.stderr)
+        return result.stdout
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        commit = CommitMetadata(**json.loads(line))
+                    except (ValueError, TypeError):
+                        # 跳过写入中断留下的不完整行
+                        continue
+                    self._commits[commit.hash] = commit
+        except OSError as e:
+            logger.warning(f"Could not read commit metadata cache {self.cache_file}: {str(e)}")
+
+    def _persist(self, commits: List[CommitMetadata]):
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            with open(self.cache_file, "a", encoding="utf-8") as f:
+                for commit in commits:
+                    f.write(json.dumps(asdict(commit), ensure_ascii=False) + "\n")
+        except OSError as e:
+            logger.warning(f"Could not write commit metadata cache {self.cache_file}: {str(e)}")
+
+    def head_sha(self) -> Optional[str]:
+        """SHA of HEAD, None for a repository without commits"""
+        try:
+            return self._git(["rev-parse", "--verify", "--quiet", "HEAD^{commit}"]).strip() or None
+        except GitCommandError:
+            # --verify --quiet 在还没有提交时返回1
+            return None
+
+    def get(self, shas: Iterable[str]) -> Dict[str, CommitMetadata]:
+        """
+        Metadata of the given commits, hydrating missing ones in a single git call
+
+        Args:
+            shas: Full commit SHAs, unknown ones are left out of the result
+
+        Returns:
+            Metadata by SHA
+        """
+        shas = list(dict.fromkeys(shas))
+        with self._lock:
+            self._ensure_loaded()
+            missing = [sha for sha in shas if sha not in self._commits]
+        if missing:
+            output = self._git(
+                ["log", "--no-walk=unsorted", "--ignore-missing", "--stdin", "-m", "--first-parent",
+                 "--no-renames", "--numstat", f"--format={_HYDRATE_FORMAT}"],
+                input="\n".join(missing) + "\n",
+            )
+            hydrated = parse_hydrated_log(output)
+            with self._lock:
+                new_commits = [commit for commit in hydrated if commit.hash not in self._commits]
+                for commit in new_commits:
+                    self._commits[commit.hash] = commit
+                self._persist(new_commits)
+        with self._lock:
+            return {sha: self._commits[sha] for sha in shas if sha in self._commits}
+
+    def list_commits(self, skip: int = 0, limit: int = 10, since: Optional[int] = None) -> List[CommitMetadata]:
+        """
+        A page of the history of HEAD, newest first
+
+        Args:
+            skip: 跳过的提交数量
+            limit: 最大提交数量
+            since: 只返回提交时间不早于该Unix时间戳的提交
+        """
+        if limit <= 0 or self.head_sha() is None:
+            return []
+        args = ["log", f"--skip={max(skip, 0)}", f"--max-count={limit}", "--format=%H"]
+        if since is not None:
+            args.append(f"--max-age={int(since)}")
+        output = self._git([*args, "HEAD"])
+        shas = output.split()
+        commits = self.get(shas)
+        return [commits[sha] for sha in shas if sha in commits]
+
+    def count_commits(self) -> int:
+        """Number of commits reachable from HEAD"""
+        head = self.head_sha()
+        if head is None:
+            return 0
+        with self._lock:
+            if self._count is not None and self._count[0] == head:
+                return self._count[1]
+        count = int(self._git(["rev-list", "--count", head]).strip() or 0)
+        with self._lock:
+            self._count = (head, count)
+        return count
+
+
+_caches: Dict[str, CommitMetadataCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_commit_metadata_cache(project_path: str) -> CommitMetadataCache:
+    """
+    The shared cache of a project
+
+    Raises:
+        git.NoSuchPathError, git.InvalidGitRepositoryError: project_path is not a git repository
+    """
+    with _caches_lock:
+        cache = _caches.get(project_path)
+        if cache is None:
+            cache = _caches[project_path] = CommitMetadataCache(project_path)
+        return cache
@@ -0,0 +1,191 @@
+"""
+Two-tier cache for computed commit and file diffs.
+
+A diff between two commits never changes, so the commit and file diff
+endpoints compute their response once per
+``(parent_sha, commit_sha, path, options)`` and keep the JSON body
+
+* in a per-project in-memory LRU bounded by total size, and
+* gzip-compressed under ``.auto-coder/cache/diffs/<xx>/<key>.json.gz``,
+  which survives restarts and is trimmed by the retention janitor (category
+  ``diffs``; hits refresh the file's mtime so age based retention is LRU-like)
+
+Every entry carries a strong ETag (a hash of the exact body bytes), so
+browsers can revalidate with ``If-None-Match`` and get a 304 without the
+body being sent again. ``options`` names the kind of response, so bumping
+``CACHE_VERSION`` or changing an endpoint's option string invalidates old
+entries.
+"""
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from fastapi import Request, Response
+from loguru import logger
+
+CACHE_VERSION = 1
+DISK_SUFFIX = ".json.gz"
+MEMORY_CACHE_BYTES = 32 * 1024 * 1024
+# Larger bodies are only kept on disk
+MAX_MEMORY_ENTRY_BYTES = 4 * 1024 * 1024
+
+
+@dataclass(frozen=True)
+class CachedDiff:
+    body: bytes
+    etag: str
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match header matches etag"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        # If-None-Match 使用弱比较
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def cached_response(request: Request, entry: CachedDiff) -> Response:
+    """JSON response of a cache entry, or 304 if the client already has it"""
+    # 短哈希或分支名可能在之后指向其他提交，所以让浏览器每次都重新验证
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request, entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+class DiffCache:
+    """Memory and disk cache of diff responses of one repository"""
+
+    def __init__(self, project_path: str, memory_bytes: int = MEMORY_CACHE_BYTES):
+        self.project_path = project_path
+        self.cache_dir = os.path.join(project_path, ".auto-coder", "cache", "diffs")
+        self.memory_bytes = memory_bytes
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, CachedDiff]" = OrderedDict()
+        self._memory_size = 0
+
+    @staticmethod
+    def make_key(parent_sha: Optional[str], commit_sha: str, path: str = "", options: str = "") -> str:
+        """
+        Cache key of a diff
+
+        Args:
+            parent_sha: 对比的父提交，首次提交为None
+            commit_sha: 提交的完整SHA
+            path: 文件路径，整个提交的差异为空
+            options: 响应类型及影响结果的参数
+        """
+        raw = "\0".join([str(CACHE_VERSION), parent_sha or "", commit_sha, path or "", options or ""])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key[2:] + DISK_SUFFIX)
+
+    def _remember(self, key: str, entry: CachedDiff):
+        if len(entry.body) > MAX_MEMORY_ENTRY_BYTES:
+            return
+        with self._lock:
+            previous = self._memory.pop(key, None)
+            if previous is not None:
+                self._memory_size -= len(previous.body)
+            self._memory[key] = entry
+            self._memory_size += len(entry.body)
+            while self._memory_size > self.memory_bytes and self._memory:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_size -= len(evicted.body)
+
+    def get_memory(self, key: str) -> Optional[CachedDiff]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+            return entry
+
+    def get(self, key: str) -> Optional[CachedDiff]:
+        """Look up an entry in memory, then on disk"""
+        entry = self.get_memory(key)
+        if entry is not None:
+            return entry
+        path = self._disk_path(key)
+        try:
+            with gzip.open(path, "rb") as f:
+                body = f.read()
+            # 刷新修改时间，按时间清理时保留常用的条目
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError) as e:
+            logger.warning(f"Could not read diff cache entry {path}: {str(e)}")
+            return None
+        entry = CachedDiff(body, make_etag(body))
+        self._remember(key, entry)
+        return entry
+
+    def put(self, key: str, value: Any) -> CachedDiff:
+        """Store a JSON serializable response"""
+        body = json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        entry = CachedDiff(body, make_etag(body))
+        self._remember(key, entry)
+        path = self._disk_path(key)
+        tmp_file = path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with gzip.open(tmp_file, "wb", compresslevel=6) as f:
+                f.write(body)
+            os.replace(tmp_file, path)
+        except OSError as e:
+            logger.warning(f"Could not write diff cache entry {path}: {str(e)}")
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+        return entry
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]]) -> CachedDiff:
+        """
+        Cached entry of key, computing and storing it on a miss
+
+        Args:
+            key: make_key 生成的缓存键
+            compute: 计算响应内容的协程函数，抛出异常时不缓存
+
+        Returns:
+            缓存条目
+        """
+        entry = self.get_memory(key)
+        if entry is None:
+            entry = await asyncio.to_thread(self.get, key)
+        if entry is None:
+            value = await compute()
+            entry = await asyncio.to_thread(self.put, key, value)
+        return entry
+
+
+_caches: Dict[str, DiffCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_diff_cache(project_path: str) -> DiffCache:
+    """The shared diff cache of a project"""
+    with _caches_lock:
+        cache = _caches.get(project_path)
+        if cache is None:
+            cache = _caches[project_path] = DiffCache(project_path)
+        return cache
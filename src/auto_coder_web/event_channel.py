@@ -0,0 +1,260 @@
+"""
+Multiplexed WebSocket channel for task event streams (``/ws/events``).
+
+One connection carries any number of event streams, so several chat panels
+no longer need one SSE connection (and one server loop) each. Messages are
+JSON objects with a ``type``; commands may carry a ``request_id`` which is
+echoed in the ``ok``/``error`` reply.
+
+Client -> server::
+
+    {"type": "subscribe", "event_file_id": "...", "last_event_id": "123", "window": 256}
+    {"type": "unsubscribe", "event_file_id": "..."}
+    {"type": "ack", "event_file_id": "...", "count": 10}
+    {"type": "response", "event_file_id": "...", "event_id": "...", "response": "..."}
+    {"type": "cancel", "event_file_id": "..."}
+    {"type": "ping"}
+
+Server -> client::
+
+    {"type": "subscribed", "event_file_id": "...", "offset": 0}
+    {"type": "events", "event_file_id": "...", "last_event_id": "456", "events": [...]}
+    {"type": "end", "event_file_id": "...", "reason": "COMPLETION"}
+    {"type": "ok" | "error" | "pong", "request_id": "...", ...}
+
+Flow control is credit based per subscription: the server sends at most
+``window`` events that have not been acknowledged with ``ack``. A stalled
+subscription stops reading its live queue and later catches up from the
+event file, so it neither blocks the other subscriptions nor buffers
+unbounded data. ``last_event_id`` is the byte offset used by the SSE
+endpoints, so a reconnecting client resumes exactly where it stopped.
+"""
+import asyncio
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+from fastapi import WebSocket, WebSocketDisconnect
+from loguru import logger
+
+from autocoder.events import event_content as EventContentCreator
+from autocoder.events.event_manager_singleton import get_event_manager, get_event_file_path
+from autocoder.events.event_types import EventType
+
+from auto_coder_web.event_tail import OffsetEvent, event_tail_service, resolve_resume_offset
+from auto_coder_web.job_scheduler import job_scheduler
+from auto_coder_web.sse_stream import COALESCE_WINDOW, StreamStats, stream_monitor
+
+DEFAULT_WINDOW = 256
+MAX_WINDOW = 4096
+MAX_SUBSCRIPTIONS = 64
+
+
+class ChannelError(Exception):
+    """A command that cannot be executed, reported to the client as an error reply"""
+
+
+class ChannelSubscription:
+    """One event stream of a channel together with its flow control credit"""
+
+    def __init__(self, event_file_id: str, event_file: str, offset: int, window: int):
+        self.event_file_id = event_file_id
+        self.event_file = event_file
+        self.offset = offset
+        self.window = window
+        self.credit = window
+        self.credit_available = asyncio.Event()
+        self.credit_available.set()
+        self.stats = StreamStats(f"ws:{event_file_id}", True, None)
+        self.task: Optional[asyncio.Task] = None
+
+    def add_credit(self, count: int):
+        self.credit = min(self.window, self.credit + max(count, 0))
+        if self.credit > 0:
+            self.credit_available.set()
+
+    async def take_credit(self, wanted: int) -> int:
+        """Wait until credit is available and take up to ``wanted`` events of it"""
+        while self.credit <= 0:
+            self.credit_available.clear()
+            await self.credit_available.wait()
+        taken = min(wanted, self.credit)
+        self.credit -= taken
+        return taken
+
+
+class EventChannel:
+    """Serves one ``/ws/events`` connection"""
+
+    def __init__(self, websocket: WebSocket, project_path: str):
+        self.websocket = websocket
+        self.project_path = project_path
+        self.subscriptions: Dict[str, ChannelSubscription] = {}
+        self._send_lock = asyncio.Lock()
+
+    async def run(self):
+        await self.websocket.accept()
+        try:
+            while True:
+                data = await self.websocket.receive_text()
+                try:
+                    message = json.loads(data)
+                except json.JSONDecodeError:
+                    await self.send({"type": "error", "message": "Invalid JSON message"})
+                    continue
+                if not isinstance(message, dict):
+                    await self.send({"type": "error", "message": "Message must be a JSON object"})
+                    continue
+                await self.handle(message)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            for event_file_id in list(self.subscriptions):
+                self.unsubscribe(event_file_id)
+
+    async def send(self, message: Dict[str, Any]):
+        await self.send_text(json.dumps(message, ensure_ascii=False))
+
+    async def send_text(self, text: str):
+        # Subscriptions send from their own tasks, websocket sends must not interleave
+        async with self._send_lock:
+            await self.websocket.send_text(text)
+
+    async def handle(self, message: Dict[str, Any]):
+        request_id = message.get("request_id")
+        handlers = {
+            "subscribe": self._handle_subscribe,
+            "unsubscribe": self._handle_unsubscribe,
+            "ack": self._handle_ack,
+            "response": self._handle_response,
+            "cancel": self._handle_cancel,
+            "ping": self._handle_ping,
+        }
+        handler = handlers.get(message.get("type"))
+        try:
+            if handler is None:
+                raise ChannelError(f"Unknown message type: {message.get('type')}")
+            await handler(message)
+        except ChannelError as e:
+            await self.send({"type": "error", "request_id": request_id, "message": str(e)})
+        except Exception as e:
+            logger.error(f"Error handling {message.get('type')} message on /ws/events: {str(e)}")
+            await self.send({"type": "error", "request_id": request_id, "message": str(e)})
+
+    def _event_file_id(self, message: Dict[str, Any]) -> str:
+        event_file_id = message.get("event_file_id")
+        if not isinstance(event_file_id, str) or not event_file_id or os.path.basename(event_file_id) != event_file_id:
+            raise ChannelError(f"Invalid event_file_id: {event_file_id}")
+        return event_file_id
+
+    async def _handle_subscribe(self, message: Dict[str, Any]):
+        event_file_id = self._event_file_id(message)
+        if event_file_id in self.subscriptions:
+            # Resubscribing restarts the stream, e.g. from another last_event_id
+            self.unsubscribe(event_file_id)
+        if len(self.subscriptions) >= MAX_SUBSCRIPTIONS:
+            raise ChannelError(f"Too many subscriptions, at most {MAX_SUBSCRIPTIONS} per connection")
+        try:
+            window = int(message.get("window") or DEFAULT_WINDOW)
+        except (TypeError, ValueError):
+            raise ChannelError(f"Invalid window: {message.get('window')}")
+        window = max(1, min(window, MAX_WINDOW))
+
+        event_file = get_event_file_path(event_file_id, self.project_path)
+        last_event_id = message.get("last_event_id")
+        offset = resolve_resume_offset(event_file, str(last_event_id) if last_event_id is not None else None)
+        subscription = ChannelSubscription(event_file_id, event_file, offset, window)
+        self.subscriptions[event_file_id] = subscription
+        await self.send({"type": "subscribed", "request_id": message.get("request_id"),
+                         "event_file_id": event_file_id, "offset": offset})
+        subscription.task = asyncio.get_running_loop().create_task(self._pump(subscription))
+
+    async def _handle_unsubscribe(self, message: Dict[str, Any]):
+        event_file_id = self._event_file_id(message)
+        self.unsubscribe(event_file_id)
+        await self.send({"type": "ok", "request_id": message.get("request_id"), "event_file_id": event_file_id})
+
+    async def _handle_ack(self, message: Dict[str, Any]):
+        subscription = self.subscriptions.get(self._event_file_id(message))
+        if subscription is not None:
+            try:
+                subscription.add_credit(int(message.get("count", 0)))
+            except (TypeError, ValueError):
+                raise ChannelError(f"Invalid ack count: {message.get('count')}")
+
+    async def _handle_response(self, message: Dict[str, Any]):
+        """Same as the /api/*-command/response endpoints"""
+        event_file_id = self._event_file_id(message)
+        event_id = message.get("event_id")
+        if not event_id or "response" not in message:
+            raise ChannelError("response requires event_id and response")
+        event_manager = get_event_manager(get_event_file_path(event_file_id, self.project_path))
+        response_event = await asyncio.to_thread(event_manager.respond_to_user, event_id, message["response"])
+        await self.send({"type": "ok", "request_id": message.get("request_id"),
+                         "event_file_id": event_file_id, "event_id": response_event.event_id})
+
+    async def _handle_cancel(self, message: Dict[str, Any]):
+        """Same as the /api/*-command/cancel endpoints, auto tasks also undo their file changes"""
+        event_file_id = self._event_file_id(message)
+        job = job_scheduler.get_job(event_file_id)
+        if job is not None and job.kind == "auto":
+            from auto_coder_web.routers.auto_router import cancel_auto_task
+            if not await asyncio.to_thread(cancel_auto_task, event_file_id, self.project_path):
+                raise ChannelError(f"Failed to cancel task {event_file_id}")
+        else:
+            event_file = get_event_file_path(event_file_id, self.project_path)
+            error_content = EventContentCreator.create_error(
+                error_code="499", error_message="cancelled", details={}).to_dict()
+            await asyncio.to_thread(job_scheduler.cancel, event_file_id, event_file, error_content)
+        await self.send({"type": "ok", "request_id": message.get("request_id"), "event_file_id": event_file_id})
+
+    async def _handle_ping(self, message: Dict[str, Any]):
+        await self.send({"type": "pong", "request_id": message.get("request_id")})
+
+    def unsubscribe(self, event_file_id: str):
+        subscription = self.subscriptions.pop(event_file_id, None)
+        if subscription is not None and subscription.task is not None:
+            subscription.task.cancel()
+
+    async def _send_events(self, subscription: ChannelSubscription, events: List[OffsetEvent]):
+        header = json.dumps({"type": "events", "event_file_id": subscription.event_file_id,
+                             "last_event_id": str(events[-1][0])}, ensure_ascii=False)
+        # Events are already JSON, splice them in instead of encoding twice
+        text = header[:-1] + ', "events": [' + ",".join(event.to_json() for _, event in events) + "]}"
+        await self.send_text(text)
+        size = len(text.encode("utf-8"))
+        subscription.stats.record(len(events), size, size)
+
+    async def _pump(self, subscription: ChannelSubscription):
+        stream_monitor.add(subscription.stats)
+        try:
+            async with event_tail_service.subscribe(subscription.event_file, subscription.offset) as tail:
+                async for batch in tail.batches(coalesce=COALESCE_WINDOW):
+                    pending = batch
+                    while pending:
+                        taken = await subscription.take_credit(len(pending))
+                        await self._send_events(subscription, pending[:taken])
+                        pending = pending[taken:]
+
+                    last_event = batch[-1][1]
+                    if last_event.event_type in (EventType.ERROR, EventType.COMPLETION):
+                        await self.send({"type": "end", "event_file_id": subscription.event_file_id,
+                                         "reason": last_event.event_type.name})
+                        break
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error streaming {subscription.event_file_id} on /ws/events: {str(e)}")
+            try:
+                await self.send({"type": "error", "event_file_id": subscription.event_file_id, "message": str(e)})
+            except Exception:
+                pass
+        finally:
+            stream_monitor.finish(subscription.stats)
+            if self.subscriptions.get(subscription.event_file_id) is subscription:
+                del self.subscriptions[subscription.event_file_id]
+
+
+async def handle_event_channel(websocket: WebSocket, project_path: str):
+    """Entry point of the ``/ws/events`` route"""
+    await EventChannel(websocket, project_path).run()
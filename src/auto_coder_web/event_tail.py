@@ -0,0 +1,594 @@
+"""
+Push-based tailing of event files for the SSE endpoints.
+
+The event endpoints used to call ``EventManager.read_events`` from a worker
+thread every 100 ms, and ``read_events`` re-reads and re-parses the whole
+JSONL file on each call. ``EventTailService`` keeps a byte offset per reader
+and only reads the bytes appended since the previous read. Readers park on an
+asyncio future which is resolved by a watchdog observer (inotify on Linux)
+when the file changes, so new events are delivered within milliseconds and an
+idle stream costs nothing. If no observer can be started, readers fall back to
+polling the file size with an adaptive backoff.
+
+Completed event files may be archived by the retention janitor as
+``<id>.jsonl.gz``. Readers fall back to the archive when the plain file is
+gone, and offsets keep referring to the uncompressed bytes, so replay and
+``Last-Event-ID`` resumption work the same for archived files.
+"""
+import asyncio
+import gzip
+import json
+import os
+import struct
+import threading
+import time
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from loguru import logger
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+from autocoder.events.event_types import Event, EventType, ResponseEvent
+
+# Deltas larger than this are read in a worker thread instead of on the event loop
+INLINE_READ_LIMIT = 256 * 1024
+
+# (offset right after the event's line, event)
+OffsetEvent = Tuple[int, Event]
+
+# Suffix of event files compressed by the retention janitor
+ARCHIVE_SUFFIX = ".gz"
+
+# Events after which a stream is closed by the endpoints
+TERMINAL_EVENT_TYPES = (EventType.COMPLETION, EventType.ERROR)
+
+# Block size used when scanning backwards for the start of a line
+_BACKWARD_READ_SIZE = 8192
+
+
+def parse_event_line(line: bytes) -> Optional[Event]:
+    """Parse one JSONL line the same way JsonlEventStore does"""
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        event_data = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(event_data, dict) or "event_type" not in event_data:
+        return None
+    try:
+        if "response_to" in event_data:
+            return ResponseEvent.from_dict(event_data)
+        return Event.from_dict(event_data)
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def archived_event_file(event_file: str) -> str:
+    """Path of the compressed archive of ``event_file``"""
+    return event_file + ARCHIVE_SUFFIX
+
+
+def open_event_file(event_file: str):
+    """Open an event file for binary reading, falling back to its archive"""
+    try:
+        return open(event_file, "rb")
+    except FileNotFoundError:
+        return gzip.open(archived_event_file(event_file), "rb")
+
+
+def _archived_size(event_file: str) -> int:
+    # ISIZE, the last 4 bytes of a gzip member, is the uncompressed size
+    # modulo 2**32; the janitor only archives files smaller than that
+    try:
+        with open(archived_event_file(event_file), "rb") as f:
+            f.seek(-4, os.SEEK_END)
+            return struct.unpack("<I", f.read(4))[0]
+    except (OSError, struct.error):
+        return 0
+
+
+def _file_size(path: str) -> int:
+    """Size of the event data, uncompressed for archived files"""
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return _archived_size(path)
+
+
+def read_events_from_offset(event_file: str, offset: int) -> Tuple[List[OffsetEvent], int, int]:
+    """
+    Read the complete events appended to ``event_file`` after ``offset``.
+
+    A trailing partial line (a writer in the middle of an append) is left for
+    the next read.
+
+    Args:
+        event_file: Path of the JSONL event file
+        offset: Byte offset to start reading from
+
+    Returns:
+        (list of (end offset, event), new offset, file size seen by this read)
+    """
+    try:
+        with open_event_file(event_file) as f:
+            f.seek(offset)
+            data = f.read()
+    except FileNotFoundError:
+        return [], offset, offset
+
+    seen_size = offset + len(data)
+    last_newline = data.rfind(b"\n")
+    if last_newline < 0:
+        return [], offset, seen_size
+
+    events: List[OffsetEvent] = []
+    position = offset
+    for line in data[:last_newline + 1].splitlines(keepends=True):
+        position += len(line)
+        event = parse_event_line(line)
+        if event is not None:
+            events.append((position, event))
+    return events, position, seen_size
+
+
+def format_sse_event(offset: int, event: Event) -> str:
+    """
+    Format an event as an SSE frame.
+
+    The frame id is the byte offset right after the event's line, so the id a
+    browser sends back in ``Last-Event-ID`` is directly the position to resume
+    reading from.
+    """
+    return f"id: {offset}\ndata: {event.to_json()}\n\n"
+
+
+def format_sse_batch(batch: List[OffsetEvent], as_array: bool = False) -> str:
+    """
+    Format a batch of events as SSE text written in one chunk.
+
+    By default every event keeps its own frame. With ``as_array`` the whole
+    batch becomes a single frame whose data is a JSON array of the events and
+    whose id is the offset after the last one, so resuming still works.
+    """
+    if not as_array:
+        return "".join(format_sse_event(offset, event) for offset, event in batch)
+    data = ",".join(event.to_json() for _, event in batch)
+    return f"id: {batch[-1][0]}\ndata: [{data}]\n\n"
+
+
+def resolve_resume_offset(event_file: str, last_event_id: Optional[str]) -> int:
+    """
+    Turn a ``Last-Event-ID`` into the byte offset to resume ``event_file`` at.
+
+    The offset is its own index: a valid id always points right after a
+    newline, which is checked with a single one byte read instead of
+    re-parsing the events before it. Missing, malformed or stale ids (e.g.
+    from another event file) restart the stream from the beginning. An id
+    right after the final COMPLETION/ERROR event resumes at that event, so the
+    stream re-sends it and ends at once instead of waiting for events that
+    never come.
+
+    Args:
+        event_file: Path of the JSONL event file
+        last_event_id: Value of the Last-Event-ID header, if any
+
+    Returns:
+        Byte offset to start reading from
+    """
+    if not last_event_id:
+        return 0
+    try:
+        offset = int(last_event_id.strip())
+    except ValueError:
+        logger.warning(f"Ignoring invalid Last-Event-ID {last_event_id!r} for {event_file}")
+        return 0
+    if offset <= 0:
+        return 0
+
+    try:
+        with open_event_file(event_file) as f:
+            f.seek(offset - 1)
+            at_line_boundary = f.read(1) == b"\n"
+    except (OSError, EOFError):
+        at_line_boundary = False
+
+    if not at_line_boundary:
+        logger.warning(f"Last-Event-ID {offset} is not an event boundary of {event_file}, replaying from start")
+        return 0
+
+    # 已经收到最后的COMPLETION/ERROR之后重连时，后面不会再有事件，流会一直挂起；
+    # 从终止事件本身开始重放，客户端收到它后正常结束，而不是不断重连
+    terminal_start = _terminal_event_start(event_file, offset)
+    if terminal_start is not None:
+        return terminal_start
+    return offset
+
+
+def _line_start(f, end: int) -> int:
+    """Offset where the line ending at ``end`` (exclusive, after its newline) starts"""
+    position = end - 1
+    while position > 0:
+        block_start = max(0, position - _BACKWARD_READ_SIZE)
+        f.seek(block_start)
+        newline = f.read(position - block_start).rfind(b"\n")
+        if newline >= 0:
+            return block_start + newline + 1
+        position = block_start
+    return 0
+
+
+def _terminal_event_start(event_file: str, offset: int) -> Optional[int]:
+    """
+    Start offset of the event ending at ``offset`` if it is a COMPLETION/ERROR.
+
+    Events are only appended before the terminal event, so a client resuming
+    right after it has seen the whole stream. Found with a short backward read
+    instead of re-parsing the file.
+    """
+    try:
+        with open_event_file(event_file) as f:
+            start = _line_start(f, offset)
+            f.seek(start)
+            event = parse_event_line(f.read(offset - start))
+    except (OSError, EOFError):
+        return None
+    if event is not None and event.event_type in TERMINAL_EVENT_TYPES:
+        return start
+    return None
+
+
+class _EventFileHandler(FileSystemEventHandler):
+    """watchdog handler forwarding every file change to the tail service"""
+
+    def __init__(self, service: "EventTailService"):
+        super().__init__()
+        self.service = service
+
+    def dispatch(self, event):
+        if event.is_directory:
+            return
+        self.service._notify(os.path.abspath(event.src_path))
+        dest_path = getattr(event, "dest_path", None)
+        if dest_path:
+            self.service._notify(os.path.abspath(dest_path))
+
+
+class EventTailService:
+    """Wakes asyncio readers when event files grow"""
+
+    MIN_POLL_INTERVAL = 0.005
+    MAX_POLL_INTERVAL = 0.5
+    # Safety net in case a filesystem notification is lost
+    WATCH_TIMEOUT = 2.0
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiters: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]]] = {}
+        self._observer = None
+        self._observer_failed = False
+        self._watched_dirs = set()
+        # Only touched from the event loop thread
+        self._broadcasters: Dict[str, "EventBroadcaster"] = {}
+
+    def _ensure_watch(self, event_file: str) -> bool:
+        """Watch the directory of ``event_file``, returns False when falling back to polling"""
+        directory = os.path.dirname(event_file)
+        with self._lock:
+            if self._observer_failed:
+                return False
+            if directory in self._watched_dirs:
+                return True
+            try:
+                if self._observer is None:
+                    self._observer = Observer()
+                    self._observer.daemon = True
+                    self._observer.start()
+                os.makedirs(directory, exist_ok=True)
+                self._observer.schedule(_EventFileHandler(self), directory, recursive=False)
+                self._watched_dirs.add(directory)
+                return True
+            except Exception as e:
+                logger.warning(f"Cannot watch event directory {directory}, falling back to polling: {str(e)}")
+                self._observer_failed = True
+                return False
+
+    def _notify(self, path: str):
+        with self._lock:
+            waiters = self._waiters.pop(path, [])
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_resolve_future, future)
+            except RuntimeError:
+                # The waiter's loop is already closed
+                pass
+
+    async def _poll_for_data(self, event_file: str, seen_size: int, timeout: Optional[float]) -> bool:
+        interval = self.MIN_POLL_INTERVAL
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if _file_size(event_file) != seen_size:
+                return True
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                interval = min(interval, remaining)
+            await asyncio.sleep(interval)
+            interval = min(interval * 2, self.MAX_POLL_INTERVAL)
+
+    async def wait_for_data(self, event_file: str, seen_size: int, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until the size of ``event_file`` differs from ``seen_size``.
+
+        Args:
+            event_file: Path of the event file
+            seen_size: File size observed by the reader's last read
+            timeout: Maximum time to wait, None to wait until data arrives
+
+        Returns:
+            True if the file changed, False on timeout
+        """
+        event_file = os.path.abspath(event_file)
+        if not self._ensure_watch(event_file):
+            return await self._poll_for_data(event_file, seen_size, timeout)
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        loop = asyncio.get_running_loop()
+        while True:
+            future = loop.create_future()
+            with self._lock:
+                self._waiters.setdefault(event_file, []).append((loop, future))
+            try:
+                # Check after registering so that a write racing with the
+                # registration is never missed
+                if _file_size(event_file) != seen_size:
+                    return True
+                wait_time = self.WATCH_TIMEOUT
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    wait_time = min(wait_time, remaining)
+                try:
+                    await asyncio.wait_for(future, wait_time)
+                except asyncio.TimeoutError:
+                    pass
+                if _file_size(event_file) != seen_size:
+                    return True
+            finally:
+                with self._lock:
+                    waiters = self._waiters.get(event_file)
+                    if waiters is not None:
+                        waiters[:] = [w for w in waiters if w[1] is not future]
+                        if not waiters:
+                            del self._waiters[event_file]
+
+    async def read(self, event_file: str, offset: int) -> Tuple[List[OffsetEvent], int, int]:
+        """Read new events without blocking the loop on large deltas"""
+        size = _file_size(event_file)
+        if size < offset:
+            # The event file was truncated, start over
+            logger.warning(f"Event file {event_file} was truncated, restarting from the beginning")
+            offset = 0
+        if size - offset > INLINE_READ_LIMIT:
+            return await asyncio.to_thread(read_events_from_offset, event_file, offset)
+        return read_events_from_offset(event_file, offset)
+
+    async def follow(self, event_file: str, offset: int = 0,
+                     idle_timeout: Optional[float] = None) -> AsyncIterator[List[OffsetEvent]]:
+        """
+        Yield batches of new events from ``event_file`` forever.
+
+        Args:
+            event_file: Path of the event file
+            offset: Byte offset to start from, 0 for the beginning
+            idle_timeout: If set, an empty batch is yielded after this many
+                seconds without events so callers can run periodic checks
+        """
+        while True:
+            batch, offset, seen_size = await self.read(event_file, offset)
+            if batch:
+                yield batch
+                continue
+            if not await self.wait_for_data(event_file, seen_size, idle_timeout):
+                yield []
+
+    def subscribe(self, event_file: str, offset: int = 0) -> "Subscription":
+        """
+        Subscribe to ``event_file`` through its shared broadcaster.
+
+        Use as ``async with event_tail_service.subscribe(path) as subscription``;
+        the broadcaster is created for the first subscriber and torn down when
+        the last one leaves.
+        """
+        event_file = os.path.abspath(event_file)
+        broadcaster = self._broadcasters.get(event_file)
+        if broadcaster is None:
+            broadcaster = EventBroadcaster(self, event_file, offset)
+            self._broadcasters[event_file] = broadcaster
+        return broadcaster.add_subscriber(offset)
+
+    def _release_broadcaster(self, broadcaster: "EventBroadcaster"):
+        if self._broadcasters.get(broadcaster.event_file) is broadcaster:
+            del self._broadcasters[broadcaster.event_file]
+
+    def stop(self):
+        """Stop the filesystem observer"""
+        for broadcaster in list(self._broadcasters.values()):
+            broadcaster.close()
+        self._broadcasters.clear()
+        with self._lock:
+            observer = self._observer
+            self._observer = None
+            self._watched_dirs.clear()
+        if observer is not None:
+            observer.stop()
+            observer.join(timeout=1)
+
+
+class Subscription:
+    """
+    One reader of a broadcaster.
+
+    Live batches arrive through a bounded queue. A subscriber that starts
+    behind the broadcaster, or whose queue overflows, catches up by reading
+    the event file directly from its own offset and then rejoins the live
+    queue; events are de-duplicated by offset, so nothing is lost or repeated.
+    """
+
+    # Batches arriving closer together than this mark a busy stream
+    BUSY_INTERVAL = 0.05
+
+    def __init__(self, broadcaster: "EventBroadcaster", offset: int, max_queue_size: int):
+        self.broadcaster = broadcaster
+        self.offset = offset
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_size)
+        self.lagging = offset < broadcaster.position
+        self.closed = False
+        self._pending_error: Optional[BaseException] = None
+
+    async def __aenter__(self) -> "Subscription":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.broadcaster.remove_subscriber(self)
+
+    def _publish(self, batch: List[OffsetEvent]):
+        if self.lagging:
+            return
+        try:
+            self.queue.put_nowait(batch)
+        except asyncio.QueueFull:
+            # Too slow for the live stream, catch up from the file instead
+            self.lagging = True
+
+    def _fresh(self, batch: List[OffsetEvent]) -> List[OffsetEvent]:
+        fresh = [item for item in batch if item[0] > self.offset]
+        if fresh:
+            self.offset = fresh[-1][0]
+        return fresh
+
+    async def _catch_up(self) -> AsyncIterator[List[OffsetEvent]]:
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        # Rejoin the live stream before reading, anything published from now
+        # on is queued and the overlap is dropped by offset
+        self.lagging = False
+        service = self.broadcaster.service
+        while True:
+            batch, _, _ = await service.read(self.broadcaster.event_file, self.offset)
+            batch = self._fresh(batch)
+            if not batch:
+                return
+            yield batch
+
+    def _drain(self) -> List[OffsetEvent]:
+        """Take every batch already queued without waiting"""
+        merged: List[OffsetEvent] = []
+        while not self.queue.empty():
+            item = self.queue.get_nowait()
+            if isinstance(item, BaseException):
+                self._pending_error = item
+                break
+            merged.extend(self._fresh(item))
+        return merged
+
+    async def batches(self, idle_timeout: Optional[float] = None,
+                      coalesce: float = 0.0) -> AsyncIterator[List[OffsetEvent]]:
+        """
+        Yield batches of events after this subscription's offset.
+
+        Args:
+            idle_timeout: If set, an empty batch is yielded after this many
+                seconds without events so callers can run periodic checks
+            coalesce: While the stream is busy (batches less than
+                BUSY_INTERVAL apart), wait this many seconds after a batch and
+                merge everything that arrived meanwhile into it. The first
+                batch after a quiet period is never delayed.
+        """
+        last_batch_at = 0.0
+        while not self.closed:
+            if self._pending_error is not None:
+                raise self._pending_error
+            if self.lagging:
+                async for batch in self._catch_up():
+                    yield batch
+                continue
+            try:
+                item = await asyncio.wait_for(self.queue.get(), idle_timeout)
+            except asyncio.TimeoutError:
+                yield []
+                continue
+            if isinstance(item, BaseException):
+                raise item
+            batch = self._fresh(item)
+            if not batch:
+                continue
+            if coalesce > 0 and time.monotonic() - last_batch_at < self.BUSY_INTERVAL:
+                await asyncio.sleep(coalesce)
+                batch += self._drain()
+            last_batch_at = time.monotonic()
+            yield batch
+
+
+class EventBroadcaster:
+    """Reads and decodes one event file once and fans batches out to subscribers"""
+
+    MAX_QUEUE_SIZE = 256
+
+    def __init__(self, service: EventTailService, event_file: str, offset: int = 0):
+        self.service = service
+        self.event_file = event_file
+        self.position = offset
+        self.subscribers: List[Subscription] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def add_subscriber(self, offset: int = 0) -> Subscription:
+        subscription = Subscription(self, offset, self.MAX_QUEUE_SIZE)
+        self.subscribers.append(subscription)
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return subscription
+
+    def remove_subscriber(self, subscription: Subscription):
+        if subscription in self.subscribers:
+            self.subscribers.remove(subscription)
+        if not self.subscribers:
+            self.close()
+
+    def close(self):
+        self.service._release_broadcaster(self)
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        try:
+            async for batch in self.service.follow(self.event_file, self.position):
+                self.position = batch[-1][0]
+                for subscription in list(self.subscribers):
+                    subscription._publish(batch)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error broadcasting events of {self.event_file}: {str(e)}")
+            for subscription in list(self.subscribers):
+                subscription.lagging = False
+                while not subscription.queue.empty():
+                    subscription.queue.get_nowait()
+                subscription.queue.put_nowait(e)
+            self.service._release_broadcaster(self)
+
+
+def _resolve_future(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+event_tail_service = EventTailService()
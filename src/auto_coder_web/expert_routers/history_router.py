@@ -2,11 +2,10 @@ import os
 import re
 import asyncio
 from datetime import datetime
-from typing import Dict, List, Optional, Any
-from concurrent.futures import ThreadPoolExecutor
-import functools
+from typing import Dict, List, Optional, Any, Tuple
 
 from fastapi import APIRouter, HTTPException, Request, Depends, Query
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from loguru import logger
 import git
@@ -17,12 +16,15 @@ from loguru import logger
 from autocoder.events.event_manager_singleton import get_event_manager, get_event_file_path
 from autocoder.events.event_types import EventType
 from autocoder.common.action_yml_file_manager import ActionYmlFileManager
+from auto_coder_web.git_objects import get_object_reader
+from auto_coder_web.diff_cache import cached_response, get_diff_cache
+from auto_coder_web.git_service import (
+    AmbiguousCommitError, GitService, change_type_from_status, get_git_service, parse_name_status
+)
+from auto_coder_web.revert_index import get_revert_index
 
 router = APIRouter()
 
-# 创建线程池
-thread_pool = ThreadPoolExecutor(max_workers=4)
-
 
 class Query(BaseModel):
     query: str
@@ -59,12 +61,12 @@ async def get_project_path(request: Request) -> str:
     return request.app.state.project_path
 
 
-def get_repo(project_path: str) -> Repo:
+def get_git(project_path: str) -> GitService:
     """
-    获取Git仓库对象
+    获取项目共享的Git服务，Git操作都通过它在事件循环之外执行
     """
     try:
-        return Repo(project_path)
+        return get_git_service(project_path)
     except (git.NoSuchPathError, git.InvalidGitRepositoryError) as e:
         logger.error(f"Git repository error: {str(e)}")
         raise HTTPException(
@@ -73,6 +75,33 @@ def get_repo(project_path: str) -> Repo:
         )
 
 
+def get_repo(project_path: str) -> Repo:
+    """
+    获取当前线程缓存的Git仓库对象，只在 GitService.call 执行的函数中使用
+    """
+    return get_git(project_path).get_repo()
+
+
+async def resolve_commit(service: GitService, response_id: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    解析提交，返回 (提交SHA, 第一个父提交SHA)，找不到提交时返回 (None, None)
+
+    Raises:
+        AmbiguousCommitError: 简短哈希对应多个提交
+    """
+    commit_sha = await service.resolve_commit(response_id)
+    if commit_sha is None:
+        return None, None
+    return commit_sha, await service.first_parent(commit_sha)
+
+
+def ambiguous_commit_response(e: AmbiguousCommitError) -> JSONResponse:
+    return JSONResponse(
+        status_code=409,
+        content={"success": False, "message": f"提交哈希 {e.name} 对应多个提交: {', '.join(e.candidates)}"}
+    )
+
+
 @router.get("/api/history/validate-and-load", response_model=HistoryResponse)
 async def validate_and_load_history(
     project_path: str = Depends(get_project_path)
@@ -93,28 +122,11 @@ async def validate_and_load_history(
             action_manager = ActionYmlFileManager(project_path)
             chat_action_files = action_manager.get_action_files(limit=max_history_count)
             
-            # 获取Git仓库，用于检查提交是否被撤销
-            repo = get_repo(project_path)
-            
-            # 查找所有撤销提交
+            # 查找所有撤销提交（原提交 -> 撤销提交），覆盖整个历史；
+            # 索引持久化保存，每次只扫描上次索引的HEAD之后的新提交
             reverted_commits = {}
-
-            commit_inter_count = 0
             try:
-                # 遍历所有提交查找撤销提交
-                for commit in repo.iter_commits():
-                    message = commit.message.strip()
-                    if message.startswith("<revert>"):
-                        # 尝试从撤销提交消息中提取原始提交哈希值
-                        # <revert>原始消息\n原始提交哈希
-                        lines = message.split('\n')
-                        if len(lines) > 1:
-                            original_hash = lines[-1].strip()
-                            reverted_commits[original_hash] = True
-                            # logger.info(f"找到撤销提交 {commit.hexsha[:7]} 撤销了 {original_hash[:7]}")                            
-                    if commit_inter_count > 2*max_history_count:
-                        break
-                    commit_inter_count += 1
+                reverted_commits = get_revert_index(project_path).get_reverts()
             except Exception as e:
                 logger.error(f"获取撤销提交信息时出错: {str(e)}")
             
@@ -176,23 +188,22 @@ async def validate_and_load_history(
             logger.error(f"Error loading history: {str(e)}")
             return {"success": False, "message": f"加载历史记录失败: {str(e)}"}
     
-    # 使用线程池提交任务并等待结果
-    loop = asyncio.get_event_loop()
-    result = await loop.run_in_executor(
-        thread_pool,
-        functools.partial(load_history_task, project_path)
-    )
-    
-    return result
+    # 在Git线程池中执行任务并等待结果
+    try:
+        service = get_git(project_path)
+    except HTTPException as e:
+        return {"success": False, "message": f"加载历史记录失败: {e.detail}"}
+    return await service.call(load_history_task, project_path)
 
 
 @router.get("/api/history/commit-diff/{response_id}", response_model=DiffResponse)
 async def get_commit_diff(
     response_id: str,
+    request: Request,
     project_path: str = Depends(get_project_path)
 ):
     """
-    获取指定响应ID对应的提交差异
+    获取指定响应ID对应的提交差异，结果按 (父提交, 提交) 缓存并带有ETag
     
     Args:
         response_id: 响应ID，通常是提交哈希值
@@ -202,57 +213,72 @@ async def get_commit_diff(
         提交差异信息
     """
     try:
-        repo = get_repo(project_path)
+        service = get_git(project_path)
         
         # 尝试获取提交
         try:
-            commit = repo.commit(response_id)
-        except GitCommandError:
+            commit_sha, parent_sha = await resolve_commit(service, response_id)
+        except AmbiguousCommitError as e:
+            return ambiguous_commit_response(e)
+        if commit_sha is None:
             return {"success": False, "message": f"找不到提交: {response_id}"}
         
-        # 获取父提交
-        if not commit.parents:
-            # 如果没有父提交，这是第一个提交
-            diff = repo.git.show(commit.hexsha, format="")
-            file_changes = []
-            
-            # 解析diff获取文件变更
-            for file_path in commit.stats.files:
-                file_changes.append({
-                    "path": file_path,
-                    "change_type": "added"
-                })
-        else:
-            # 获取与父提交的差异
-            parent = commit.parents[0]
-            diff = repo.git.diff(parent.hexsha, commit.hexsha)
-            
-            # 获取文件变更列表
-            file_changes = []
-            for file_path, stats in commit.stats.files.items():
-                # 判断文件变更类型
-                if not os.path.exists(os.path.join(project_path, file_path)):
-                    change_type = "deleted"
-                elif file_path not in parent.stats.files:
-                    change_type = "added"
-                else:
-                    change_type = "modified"
-                
-                file_changes.append({
-                    "path": file_path,
-                    "change_type": change_type
-                })
-        
-        return {
-            "success": True,
-            "diff": diff,
-            "file_changes": file_changes
-        }
+        diff_cache = get_diff_cache(project_path)
+        key = diff_cache.make_key(parent_sha, commit_sha, "", "history-commit-diff")
+        entry = await diff_cache.get_or_compute(
+            key, lambda: compute_commit_diff(service, commit_sha, parent_sha))
+        return cached_response(request, entry)
     except Exception as e:
         logger.error(f"Error getting commit diff: {str(e)}")
         return {"success": False, "message": f"获取差异失败: {str(e)}"}
 
 
+async def compute_commit_diff(service: GitService, commit_sha: str, parent_sha: Optional[str]) -> Dict[str, Any]:
+    """
+    计算提交相对第一个父提交的差异和文件变更列表
+
+    所有文件的变更类型来自一次 git diff-tree --name-status -M，与文件数量无关；
+    变更类型只由两个提交决定（不依赖工作区），结果可以长期缓存
+
+    Args:
+        service: Git服务
+        commit_sha: 提交的完整SHA
+        parent_sha: 第一个父提交的SHA，首次提交为None
+
+    Returns:
+        DiffResponse 格式的差异信息
+    """
+    if parent_sha is None:
+        # 如果没有父提交，这是第一个提交，所有文件都是新增
+        diff, name_status = await asyncio.gather(
+            service.run("show", commit_sha, "--format="),
+            service.run("diff-tree", "-r", "-z", "--name-status", "--root", "--no-commit-id",
+                        commit_sha, strip_newline=False),
+        )
+    else:
+        # 获取与父提交的差异，-M 检测重命名
+        diff, name_status = await asyncio.gather(
+            service.run("diff", parent_sha, commit_sha),
+            service.run("diff-tree", "-r", "-z", "--name-status", "-M", parent_sha, commit_sha,
+                        strip_newline=False),
+        )
+    
+    # 获取文件变更列表
+    file_changes = []
+    for status, old_path, new_path in parse_name_status(name_status):
+        file_changes.append({
+            "path": new_path,
+            "change_type": change_type_from_status(status)
+        })
+    
+    return {
+        "success": True,
+        "message": None,
+        "diff": diff,
+        "file_changes": file_changes
+    }
+
+
 @router.get("/api/history/file-diff/{response_id}", response_model=FileDiffResponse)
 async def get_file_diff(
     response_id: str,
@@ -271,12 +297,14 @@ async def get_file_diff(
         文件差异详情
     """
     try:
-        repo = get_repo(project_path)
+        service = get_git(project_path)
         
         # 尝试获取提交
         try:
-            commit = repo.commit(response_id)
-        except GitCommandError:
+            commit_sha, parent_sha = await resolve_commit(service, response_id)
+        except AmbiguousCommitError as e:
+            return ambiguous_commit_response(e)
+        if commit_sha is None:
             return {"success": False, "message": f"找不到提交: {response_id}"}
         
         # 获取文件差异信息
@@ -284,40 +312,32 @@ async def get_file_diff(
         before_content = ""
         after_content = ""
         diff_content = ""
+        # 文件内容通过常驻的 git cat-file 进程读取，并按blob SHA缓存
+        reader = get_object_reader(project_path)
         
         # 处理父提交
-        if not commit.parents:
+        if parent_sha is None:
             # 如果没有父提交，这是第一个提交
             try:
                 # 检查文件是否在提交中
-                blob = commit.tree[file_path]
-                after_content = blob.data_stream.read().decode('utf-8', errors='replace')
-                diff_content = repo.git.show(f"{commit.hexsha} -- {file_path}")
+                after_content = await reader.read_text(commit_sha, file_path)
+                if after_content is None:
+                    raise KeyError(file_path)
+                diff_content = await service.run("show", commit_sha, "--", file_path)
                 file_status = "added"
             except (KeyError, UnicodeDecodeError, git.GitCommandError) as e:
                 logger.error(f"Error getting file content: {str(e)}")
                 return {"success": False, "message": f"获取文件内容失败: {str(e)}"}
         else:
             # 有父提交，获取差异
-            parent = commit.parents[0]
+            # 检查文件在当前提交和父提交中是否存在
+            after_content = await reader.read_text(commit_sha, file_path)
+            file_in_current = after_content is not None
+            after_content = after_content or ""
             
-            # 检查文件在当前提交中是否存在
-            file_in_current = False
-            try:
-                blob = commit.tree[file_path]
-                after_content = blob.data_stream.read().decode('utf-8', errors='replace')
-                file_in_current = True
-            except (KeyError, UnicodeDecodeError):
-                after_content = ""
-            
-            # 检查文件在父提交中是否存在
-            file_in_parent = False
-            try:
-                blob = parent.tree[file_path]
-                before_content = blob.data_stream.read().decode('utf-8', errors='replace')
-                file_in_parent = True
-            except (KeyError, UnicodeDecodeError):
-                before_content = ""
+            before_content = await reader.read_text(parent_sha, file_path)
+            file_in_parent = before_content is not None
+            before_content = before_content or ""
             
             # 确定文件状态
             if file_in_current and file_in_parent:
@@ -329,7 +349,7 @@ async def get_file_diff(
             
             # 获取文件差异
             try:
-                diff_content = repo.git.diff(f"{parent.hexsha}..{commit.hexsha}", "--", file_path)
+                diff_content = await service.run("diff", f"{parent_sha}..{commit_sha}", "--", file_path)
             except git.GitCommandError as e:
                 logger.error(f"Error getting file diff: {str(e)}")
                 diff_content = ""
@@ -0,0 +1,261 @@
+"""
+Long-lived ``git cat-file`` coprocesses for reading git objects.
+
+The diff endpoints used to fork one ``git show`` per file version. An
+``ObjectReader`` keeps a ``git cat-file --batch-check`` process (resolves
+``<rev>:<path>`` to a blob SHA) and a ``git cat-file --batch`` process
+(reads objects by SHA) per repository. Requests are pipelined: each one is
+written to the process's stdin right away and a single reader task matches
+the responses in order, so concurrent requests do not wait for each other's
+round trip. A process that exits or breaks the protocol fails its pending
+requests and is restarted on the next request.
+
+Blob contents are cached in an LRU keyed by blob SHA; a SHA always names the
+same content, so entries never need to be invalidated.
+"""
+import asyncio
+import threading
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Deque, Dict, Optional, Tuple
+
+from loguru import logger
+
+# Total size of cached blobs, and the largest blob that is cached at all
+BLOB_CACHE_BYTES = 64 * 1024 * 1024
+MAX_CACHED_BLOB_BYTES = 4 * 1024 * 1024
+
+
+class GitObjectError(Exception):
+    """The cat-file process failed while serving a request"""
+
+
+class AmbiguousObjectName(Exception):
+    """A short SHA matches more than one object"""
+
+
+@dataclass(frozen=True)
+class ObjectInfo:
+    sha: str
+    type: str
+    size: int
+
+
+class CatFileProcess:
+    """One ``git cat-file --batch`` or ``--batch-check`` coprocess driven from the event loop"""
+
+    def __init__(self, project_path: str, mode: str):
+        self.project_path = project_path
+        self.mode = mode
+        self._process: Optional[asyncio.subprocess.Process] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        # Requests written to the process whose responses have not been read yet
+        self._pending: Deque[asyncio.Future] = deque()
+        self._start_lock: Optional[asyncio.Lock] = None
+
+    @property
+    def with_content(self) -> bool:
+        return self.mode == "--batch"
+
+    async def _ensure_started(self) -> asyncio.subprocess.Process:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # 子进程的管道绑定在创建它的事件循环上
+            self._discard()
+            self._loop = loop
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self._process is not None and self._process.returncode is None:
+                return self._process
+            # 旧进程未响应的请求不能与新进程的响应对应
+            self._fail_pending(GitObjectError(f"git cat-file {self.mode} restarted"))
+            self._process = await asyncio.create_subprocess_exec(
+                "git", "cat-file", self.mode,
+                cwd=self.project_path,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL,
+            )
+            self._reader_task = loop.create_task(self._read_responses(self._process))
+            return self._process
+
+    def _fail_pending(self, error: Exception):
+        pending, self._pending = self._pending, deque()
+        for future in pending:
+            if not future.done():
+                future.set_exception(error)
+
+    def _discard(self):
+        """Forget the process, e.g. after the event loop it was created on went away"""
+        if self._process is not None and self._process.returncode is None:
+            try:
+                self._process.kill()
+            except ProcessLookupError:
+                pass
+        self._process = None
+        self._reader_task = None
+        self._pending.clear()
+
+    async def _read_responses(self, process: asyncio.subprocess.Process):
+        try:
+            while True:
+                header = await process.stdout.readline()
+                if not header:
+                    raise GitObjectError(f"git cat-file {self.mode} exited")
+                text = header.decode("utf-8", errors="replace").rstrip("\n")
+                # 不存在的对象回显请求的名称，名称中可能包含空格
+                parts = text.split(" ")
+                if text.endswith(" missing"):
+                    result = None
+                elif text.endswith(" ambiguous"):
+                    result = AmbiguousObjectName(text[:-len(" ambiguous")])
+                elif len(parts) == 3 and parts[2].isdigit():
+                    info = ObjectInfo(parts[0], parts[1], int(parts[2]))
+                    if self.with_content:
+                        data = await process.stdout.readexactly(info.size + 1)
+                        result = (info, data[:-1])
+                    else:
+                        result = (info, None)
+                else:
+                    raise GitObjectError(f"Unexpected git cat-file output: {header!r}")
+                if self._pending:
+                    future = self._pending.popleft()
+                    if future.done():
+                        pass
+                    elif isinstance(result, AmbiguousObjectName):
+                        future.set_exception(result)
+                    else:
+                        future.set_result(result)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if not isinstance(e, GitObjectError):
+                logger.warning(f"git cat-file {self.mode} failed: {str(e)}")
+            error = e if isinstance(e, GitObjectError) else GitObjectError(str(e))
+            if self._process is process:
+                try:
+                    process.kill()
+                except ProcessLookupError:
+                    pass
+                self._process = None
+                self._fail_pending(error)
+
+    async def request(self, name: str) -> Optional[Tuple[ObjectInfo, Optional[bytes]]]:
+        """
+        Look up one object
+
+        Args:
+            name: Anything ``git cat-file`` accepts, e.g. a SHA or ``<rev>:<path>``
+
+        Returns:
+            (info, content) with content None in --batch-check mode, None if the object does not exist
+
+        Raises:
+            AmbiguousObjectName: name is a short SHA matching several objects
+        """
+        if "\n" in name:
+            return None
+        process = await self._ensure_started()
+        if process is not self._process:
+            raise GitObjectError(f"git cat-file {self.mode} exited")
+        future = self._loop.create_future()
+        # 写入和登记在同一步完成（中间没有await），保证响应与请求顺序一致
+        self._pending.append(future)
+        try:
+            process.stdin.write(name.encode("utf-8") + b"\n")
+            await process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError) as e:
+            if future in self._pending:
+                self._pending.remove(future)
+            raise GitObjectError(f"git cat-file {self.mode} is not running: {str(e)}")
+        return await future
+
+    async def aclose(self):
+        """Stop the process and wait for it, so its pipes are closed on the event loop"""
+        process = self._process
+        self._discard()
+        if process is not None:
+            try:
+                await process.wait()
+            except Exception:
+                pass
+
+
+class ObjectReader:
+    """Blob reads of one repository through persistent cat-file processes"""
+
+    def __init__(self, project_path: str, cache_bytes: int = BLOB_CACHE_BYTES):
+        self.project_path = project_path
+        self._check = CatFileProcess(project_path, "--batch-check")
+        self._batch = CatFileProcess(project_path, "--batch")
+        self.cache_bytes = cache_bytes
+        self._cache: "OrderedDict[str, bytes]" = OrderedDict()
+        self._cached_size = 0
+
+    async def _request(self, process: CatFileProcess, name: str):
+        try:
+            return await process.request(name)
+        except GitObjectError:
+            # 进程崩溃时重启一次再试
+            return await process.request(name)
+
+    async def resolve(self, name: str) -> Optional[ObjectInfo]:
+        """Resolve an object name such as ``<rev>:<path>`` without reading its content, see CatFileProcess.request"""
+        result = await self._request(self._check, name)
+        return result[0] if result else None
+
+    async def read_blob(self, rev: str, path: str) -> Optional[bytes]:
+        """Content of ``path`` at ``rev``, None if it does not exist there or is not a file"""
+        info = await self.resolve(f"{rev}:{path}")
+        if info is None or info.type != "blob":
+            return None
+        data = self._cache.get(info.sha)
+        if data is not None:
+            self._cache.move_to_end(info.sha)
+            return data
+        result = await self._request(self._batch, info.sha)
+        if result is None:
+            return None
+        data = result[1]
+        self._remember(info.sha, data)
+        return data
+
+    async def read_text(self, rev: str, path: str) -> Optional[str]:
+        data = await self.read_blob(rev, path)
+        return data.decode("utf-8", errors="replace") if data is not None else None
+
+    def _remember(self, sha: str, data: bytes):
+        if len(data) > MAX_CACHED_BLOB_BYTES or sha in self._cache:
+            return
+        self._cache[sha] = data
+        self._cached_size += len(data)
+        while self._cached_size > self.cache_bytes and self._cache:
+            _, evicted = self._cache.popitem(last=False)
+            self._cached_size -= len(evicted)
+
+    async def aclose(self):
+        await self._check.aclose()
+        await self._batch.aclose()
+
+
+_readers: Dict[str, ObjectReader] = {}
+_readers_lock = threading.Lock()
+
+
+def get_object_reader(project_path: str) -> ObjectReader:
+    """The shared object reader of a project"""
+    with _readers_lock:
+        reader = _readers.get(project_path)
+        if reader is None:
+            reader = _readers[project_path] = ObjectReader(project_path)
+        return reader
+
+
+async def close_object_readers():
+    """Stop all cat-file processes, called on shutdown"""
+    with _readers_lock:
+        readers = list(_readers.values())
+        _readers.clear()
+    for reader in readers:
+        await reader.aclose()
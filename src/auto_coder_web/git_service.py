@@ -0,0 +1,260 @@
+"""
+Async git layer for the commit and history endpoints.
+
+Git must never run on the event loop thread: a slow ``git log`` or a large
+diff would stall every other request, terminal I/O included. ``GitService``
+offers two ways to run git work off the loop:
+
+* ``run()`` executes the ``git`` CLI through ``asyncio.create_subprocess_exec``.
+  Use it for reads whose output is parsed directly. At most
+  ``max_concurrency`` such processes run per project, and a process that
+  exceeds its timeout is killed.
+* ``call()`` runs a blocking function, typically GitPython code, on
+  ``git_executor``. This small dedicated pool does not compete with the
+  default executor that other routers use.
+
+Commit names (full or short SHAs, branches, ``HEAD~n``) are resolved by
+``resolve_commit()`` through the persistent ``cat-file`` process of
+``git_objects``. That uses git's own pack-index lookup, costs one pipe
+round trip and never walks the history. A short SHA that matches several
+commits raises ``AmbiguousCommitError``.
+
+GitPython ``Repo`` objects keep persistent ``cat-file`` processes and are not
+safe to share between threads. ``get_repo()`` therefore caches one ``Repo``
+per thread instead of opening a new one per request; the executor is
+bounded, so the number of cached repos is bounded too.
+"""
+import asyncio
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from git import GitCommandError, Repo
+from loguru import logger
+
+from auto_coder_web.git_objects import AmbiguousObjectName, get_object_reader
+
+# Seconds a single git read may take
+GIT_TIMEOUT = 30.0
+# git subprocesses running at the same time per project
+MAX_CONCURRENT_GIT = 8
+GIT_EXECUTOR_WORKERS = 4
+
+# Shortest SHA prefix git accepts
+SHA_PREFIX_PATTERN = re.compile(r'^[0-9a-fA-F]{4,40}$')
+
+git_executor = ThreadPoolExecutor(max_workers=GIT_EXECUTOR_WORKERS, thread_name_prefix="git")
+
+
+class GitTimeoutError(GitCommandError):
+    """A git operation did not finish within its timeout"""
+
+
+class AmbiguousCommitError(Exception):
+    """A short SHA matches more than one commit"""
+
+    def __init__(self, name: str, candidates: List[str]):
+        super().__init__(f"Short commit hash {name} is ambiguous: {', '.join(candidates)}")
+        self.name = name
+        self.candidates = candidates
+
+
+def parse_name_status(output: str) -> List[Tuple[str, str, str]]:
+    """
+    Parse the output of ``git diff --name-status -z``
+
+    Returns:
+        (status letter, old path, new path) per file; the paths only differ for renames and copies
+    """
+    fields = output.split("\0")
+    changes = []
+    i = 0
+    while i < len(fields) and fields[i]:
+        status = fields[i][0]
+        if status in ("R", "C") and i + 2 < len(fields):
+            changes.append((status, fields[i + 1], fields[i + 2]))
+            i += 3
+        elif i + 1 < len(fields):
+            changes.append((status, fields[i + 1], fields[i + 1]))
+            i += 2
+        else:
+            break
+    return changes
+
+
+def change_type_from_status(status: str) -> str:
+    """
+    Map a name-status letter to the change types used by the endpoints
+
+    Returns:
+        added(新增), deleted(删除), renamed(重命名) 或 modified(修改)
+    """
+    return {"A": "added", "D": "deleted", "R": "renamed"}.get(status[:1], "modified")
+
+
+class GitService:
+    """Git access of one repository without blocking the event loop"""
+
+    def __init__(self, project_path: str, max_concurrency: int = MAX_CONCURRENT_GIT,
+                 timeout: float = GIT_TIMEOUT):
+        self.project_path = project_path
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._local = threading.local()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        # 创建时验证仓库，不是Git仓库时抛出异常
+        self.get_repo()
+
+    def get_repo(self) -> Repo:
+        """The Repo of the calling thread, opened once per thread"""
+        repo = getattr(self._local, "repo", None)
+        if repo is None:
+            repo = self._local.repo = Repo(self.project_path)
+        return repo
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def run(self, *args: str, input: Optional[str] = None, timeout: Optional[float] = None,
+                  strip_newline: bool = True) -> str:
+        """
+        Run a git command and return its stdout
+
+        Args:
+            args: git的参数，例如 "diff", "--name-status", sha
+            input: 写入stdin的内容
+            timeout: 超时时间（秒），默认 GIT_TIMEOUT
+            strip_newline: 与GitPython一致，去掉输出末尾的一个换行符
+
+        Returns:
+            命令输出
+
+        Raises:
+            GitCommandError: 命令返回非0
+            GitTimeoutError: 命令超时，进程已被终止
+        """
+        timeout = self.timeout if timeout is None else timeout
+        command = ["git", *args]
+        async with self._get_semaphore():
+            process = await asyncio.create_subprocess_exec(
+                *command,
+                cwd=self.project_path,
+                stdin=asyncio.subprocess.PIPE if input is not None else asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+            try:
+                stdout, stderr = await asyncio.wait_for(
+                    process.communicate(input.encode("utf-8") if input is not None else None), timeout)
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+                logger.warning(f"git command timed out after {timeout}s: {' '.join(command)}")
+                raise GitTimeoutError(command, "timeout", f"timed out after {timeout}s")
+            except asyncio.CancelledError:
+                # 请求被取消（例如客户端断开）时不要留下git进程
+                process.kill()
+                raise
+        if process.returncode != 0:
+            raise GitCommandError(command, process.returncode, stderr.decode("utf-8", errors="replace"))
+        output = stdout.decode("utf-8", errors="replace")
+        if strip_newline and output.endswith("\n"):
+            output = output[:-1]
+        return output
+
+    async def resolve_commit(self, name: str) -> Optional[str]:
+        """
+        Full SHA of a commit
+
+        Args:
+            name: 完整或简短的SHA、分支、标签、HEAD~n 等任何git能解析的名称
+
+        Returns:
+            提交的完整SHA，不存在时返回None
+
+        Raises:
+            AmbiguousCommitError: 简短SHA对应多个提交
+        """
+        reader = get_object_reader(self.project_path)
+        if SHA_PREFIX_PATTERN.match(name):
+            # 先不带 ^{commit} 查询，否则git不会报告前缀有歧义
+            try:
+                info = await reader.resolve(name)
+            except AmbiguousObjectName:
+                candidates = await self.find_commits_by_prefix(name)
+                if len(candidates) == 1:
+                    # 前缀同时匹配到树或文件对象，但只对应一个提交
+                    return candidates[0]
+                raise AmbiguousCommitError(name, candidates)
+            if info is not None and info.type == "commit":
+                return info.sha
+        info = await reader.resolve(f"{name}^{{commit}}")
+        return info.sha if info is not None else None
+
+    async def find_commits_by_prefix(self, prefix: str) -> List[str]:
+        """All commits whose SHA starts with prefix (at least 4 hex digits)"""
+        output = await self.run("rev-parse", f"--disambiguate={prefix}")
+        shas = output.split()
+        reader = get_object_reader(self.project_path)
+        infos = await asyncio.gather(*[reader.resolve(sha) for sha in shas])
+        return sorted(info.sha for info in infos if info is not None and info.type == "commit")
+
+    async def first_parent(self, commit_sha: str) -> Optional[str]:
+        """SHA of the first parent of a commit, None for a root commit"""
+        info = await get_object_reader(self.project_path).resolve(f"{commit_sha}^")
+        return info.sha if info is not None else None
+
+    async def call(self, func: Callable[..., Any], *args: Any, timeout: Optional[float] = None) -> Any:
+        """
+        Run a blocking function on the git executor
+
+        Args:
+            func: 要执行的函数，通常通过 get_repo() 使用GitPython
+            args: 函数参数
+            timeout: 超时时间（秒），默认 GIT_TIMEOUT；0 表示不限时，用于不能中途放弃的写操作
+
+        Returns:
+            函数返回值
+
+        Raises:
+            GitTimeoutError: 超时。线程中的操作无法中断，只是不再等待它
+        """
+        timeout = self.timeout if timeout is None else timeout
+        future = asyncio.get_running_loop().run_in_executor(git_executor, lambda: func(*args))
+        if not timeout:
+            return await future
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            name = getattr(func, "__name__", repr(func))
+            logger.warning(f"git operation {name} timed out after {timeout}s")
+            raise GitTimeoutError([name], "timeout", f"timed out after {timeout}s")
+
+
+_services: Dict[str, GitService] = {}
+_services_lock = threading.Lock()
+
+
+def get_git_service(project_path: str) -> GitService:
+    """
+    The shared git service of a project
+
+    Raises:
+        git.NoSuchPathError, git.InvalidGitRepositoryError: project_path is not a git repository
+    """
+    with _services_lock:
+        service = _services.get(project_path)
+        if service is None:
+            service = _services[project_path] = GitService(project_path)
+        return service
+
+
+def shutdown_git_executor():
+    """Stop accepting git work, called on shutdown"""
+    git_executor.shutdown(wait=False, cancel_futures=True)
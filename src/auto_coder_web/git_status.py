@@ -0,0 +1,457 @@
+"""
+Cached working-tree status for ``/api/git/status`` and its badge stream.
+
+``git status`` has to look at every file of the working tree, which is too
+slow to run whenever the UI wants to show modified/untracked badges.
+``GitStatusModel`` runs one full ``git status --porcelain=v2`` and then
+keeps the result up to date:
+
+* a watchdog observer marks only the changed paths dirty. After a short
+  debounce, one ``git status -- <paths>`` refreshes just those paths
+* changes of ``.git/index``, ``HEAD`` or refs (commits, checkouts, staging)
+  and too many dirty paths at once trigger a full reconciliation. A full
+  reconciliation also runs every ``RECONCILE_INTERVAL`` seconds as a safety
+  net for lost notifications and for paths that are not watched (``.git``
+  internals and ``.auto-coder``). Without a working observer every refresh
+  is a full one, run every ``POLL_INTERVAL`` seconds
+
+Every change bumps the model's ``version``. Entries remember the version
+they last changed at, and removed paths leave a tombstone, so a client that
+knows a version gets only the delta (``since``). If the tombstones of a delta
+were already dropped, the client gets a full snapshot instead. Clients see
+versions as ``"<epoch>:<n>"`` cursors: the epoch is random per model, so a
+cursor from before a server restart never matches and yields a full snapshot.
+
+Status runs with ``--no-optional-locks`` so it never takes the index lock
+that commits made by running tasks need. git's untracked cache and
+fsmonitor are used whenever they are enabled in the repository config
+(``core.untrackedCache``, ``core.fsmonitor``).
+"""
+import asyncio
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from loguru import logger
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+from auto_coder_web.git_service import get_git_service
+
+# Delay to collect a burst of file events into one refresh
+DEBOUNCE = 0.2
+# Seconds between full reconciliations
+RECONCILE_INTERVAL = 60.0
+# Seconds between full refreshes when the working tree cannot be watched
+POLL_INTERVAL = 5.0
+# More dirty paths than this are refreshed with a full status
+MAX_TARGETED_PATHS = 256
+# Removed paths remembered for deltas
+MAX_TOMBSTONES = 4096
+# Paths of the project that are not watched
+IGNORED_DIRS = (".git", ".auto-coder")
+
+STATUS_ARGS = ["--no-optional-locks", "--literal-pathspecs", "status",
+               "--porcelain=v2", "-z", "--branch", "--untracked-files=all"]
+
+
+@dataclass(frozen=True)
+class FileStatus:
+    """Status of one path as reported by ``git status --porcelain=v2``"""
+    path: str
+    # 索引（暂存区）和工作区的状态字母，未修改为 "."
+    index: str
+    worktree: str
+    orig_path: Optional[str] = None
+    conflicted: bool = False
+
+    @property
+    def status(self) -> str:
+        """untracked, conflicted, renamed, added, deleted 或 modified"""
+        if self.index == "?":
+            return "untracked"
+        if self.conflicted:
+            return "conflicted"
+        if self.index in ("R", "C"):
+            return "renamed"
+        if self.index == "A":
+            return "added"
+        if "D" in (self.index, self.worktree):
+            return "deleted"
+        return "modified"
+
+    @property
+    def tracked(self) -> bool:
+        return self.index != "?"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "status": self.status,
+            "index": self.index,
+            "worktree": self.worktree,
+            "staged": self.index not in (".", "?"),
+            "unstaged": self.worktree not in (".", "?"),
+            "orig_path": self.orig_path,
+        }
+
+
+def parse_porcelain_v2(output: str) -> Tuple[Dict[str, FileStatus], Dict[str, Any]]:
+    """
+    Parse the output of ``git status --porcelain=v2 -z --branch``
+
+    Returns:
+        (path -> status, branch info with head, oid, upstream, ahead and behind)
+    """
+    files: Dict[str, FileStatus] = {}
+    branch: Dict[str, Any] = {"head": None, "oid": None, "upstream": None, "ahead": 0, "behind": 0}
+    records = iter(output.split("\0"))
+    for record in records:
+        if not record:
+            continue
+        kind = record[0]
+        if kind == "#":
+            key, _, value = record[2:].partition(" ")
+            if key == "branch.oid":
+                branch["oid"] = None if value == "(initial)" else value
+            elif key == "branch.head":
+                branch["head"] = None if value == "(detached)" else value
+            elif key == "branch.upstream":
+                branch["upstream"] = value
+            elif key == "branch.ab":
+                ahead, _, behind = value.partition(" ")
+                branch["ahead"], branch["behind"] = int(ahead), -int(behind)
+        elif kind == "1":
+            # 1 XY sub mH mI mW hH hI path
+            fields = record.split(" ", 8)
+            files[fields[8]] = FileStatus(fields[8], fields[1][0], fields[1][1])
+        elif kind == "2":
+            # 2 XY sub mH mI mW hH hI Xscore path，原路径是下一条记录
+            fields = record.split(" ", 9)
+            files[fields[9]] = FileStatus(fields[9], fields[1][0], fields[1][1], orig_path=next(records, None))
+        elif kind == "u":
+            # u XY sub m1 m2 m3 mW h1 h2 h3 path
+            fields = record.split(" ", 10)
+            files[fields[10]] = FileStatus(fields[10], fields[1][0], fields[1][1], conflicted=True)
+        elif kind == "?":
+            files[record[2:]] = FileStatus(record[2:], "?", "?")
+    return files, branch
+
+
+def _in_scope(path: str, scope: Set[str]) -> bool:
+    """Whether path is one of the refreshed paths or lies below one of them"""
+    if path in scope:
+        return True
+    parts = path.split("/")
+    return any("/".join(parts[:i]) in scope for i in range(1, len(parts)))
+
+
+class _WorkTreeHandler(FileSystemEventHandler):
+    """watchdog handler forwarding every change of the working tree to the model"""
+
+    def __init__(self, model: "GitStatusModel"):
+        super().__init__()
+        self.model = model
+
+    def dispatch(self, event):
+        if event.is_directory and event.event_type == "modified":
+            # 目录本身的修改时间变化，其中的文件会有各自的事件
+            return
+        self.model._on_file_event(event.src_path)
+        dest_path = getattr(event, "dest_path", None)
+        if dest_path:
+            self.model._on_file_event(dest_path)
+
+
+class GitStatusModel:
+    """Cached ``git status`` of one repository"""
+
+    def __init__(self, project_path: str):
+        self.project_path = project_path
+        self.root = os.path.abspath(project_path)
+        self.version = 0
+        # 版本号只在本进程内有效，对外的游标带上随机的epoch
+        self.epoch = uuid.uuid4().hex[:12]
+        self.branch: Dict[str, Any] = {}
+        # Guards the dirty state, it is written by the watchdog thread
+        self._lock = threading.Lock()
+        self._dirty: Set[str] = set()
+        self._full_needed = True
+        self._files: Dict[str, FileStatus] = {}
+        self._versions: Dict[str, int] = {}
+        self._removed: Dict[str, int] = {}
+        # Deltas are available for versions >= _floor
+        self._floor = 0
+        self._loaded = False
+        self._last_full = 0.0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._changed: Optional[asyncio.Event] = None
+        self._refresh_lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+        self._observer = None
+        self._watching = False
+
+    def _start(self):
+        """Start watching and the refresh task on the running loop"""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        self._changed = asyncio.Event()
+        self._refresh_lock = asyncio.Lock()
+        self._last_full = time.monotonic()
+        if self._observer is None:
+            try:
+                self._observer = Observer()
+                self._observer.daemon = True
+                self._observer.schedule(_WorkTreeHandler(self), self.root, recursive=True)
+                self._observer.start()
+                self._watching = True
+            except Exception as e:
+                logger.warning(f"Cannot watch {self.project_path}, falling back to polling git status: {str(e)}")
+                self._observer = None
+                self._watching = False
+        self._task = loop.create_task(self._run())
+
+    def _on_file_event(self, path: str):
+        """Called on the watchdog thread"""
+        rel_path = os.path.relpath(os.path.abspath(path), self.root).replace(os.sep, "/")
+        if rel_path == "." or rel_path.startswith("../"):
+            return
+        top = rel_path.split("/", 1)[0]
+        if top == ".git":
+            # 提交、切换分支、暂存都会改变索引或引用，影响所有路径
+            name = rel_path[len(".git/"):]
+            if name not in ("index", "HEAD", "packed-refs") and not name.startswith("refs/"):
+                return
+            with self._lock:
+                self._full_needed = True
+        elif top in IGNORED_DIRS:
+            return
+        elif rel_path.rsplit("/", 1)[-1] == ".gitignore":
+            # 忽略规则变化会影响任意多个未跟踪文件
+            with self._lock:
+                self._full_needed = True
+        else:
+            with self._lock:
+                self._dirty.add(rel_path)
+        loop, wakeup = self._loop, self._wakeup
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(wakeup.set)
+            except RuntimeError:
+                # The loop is already closed
+                pass
+
+    async def _run(self):
+        while True:
+            interval = RECONCILE_INTERVAL if self._watching else POLL_INTERVAL
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), max(interval - (time.monotonic() - self._last_full), 0))
+            except asyncio.TimeoutError:
+                with self._lock:
+                    self._full_needed = True
+            self._wakeup.clear()
+            await asyncio.sleep(DEBOUNCE)
+            try:
+                with self._lock:
+                    full = self._full_needed or not self._watching or len(self._dirty) > MAX_TARGETED_PATHS
+                if full:
+                    await self.reconcile()
+                else:
+                    await self._refresh_dirty()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Could not refresh git status of {self.project_path}: {str(e)}")
+                with self._lock:
+                    self._full_needed = True
+                await asyncio.sleep(POLL_INTERVAL)
+
+    async def _status(self, paths: Optional[List[str]] = None) -> Tuple[Dict[str, FileStatus], Dict[str, Any]]:
+        args = list(STATUS_ARGS)
+        if paths is not None:
+            args += ["--", *paths]
+        output = await get_git_service(self.project_path).run(*args, strip_newline=False)
+        return parse_porcelain_v2(output)
+
+    async def reconcile(self):
+        """Replace the model with a full ``git status``"""
+        self._start()
+        async with self._refresh_lock:
+            # 清除之前的标记；运行期间发生的变化会留到下一轮刷新
+            with self._lock:
+                self._dirty.clear()
+                self._full_needed = False
+            started = time.monotonic()
+            try:
+                files, branch = await self._status()
+            except BaseException:
+                with self._lock:
+                    self._full_needed = True
+                raise
+            self._last_full = started
+            self._loaded = True
+            self._apply(files, branch, None)
+
+    async def _refresh_dirty(self):
+        async with self._refresh_lock:
+            with self._lock:
+                scope, self._dirty = self._dirty, set()
+            if not scope:
+                return
+            # 重命名的两个路径一起刷新，否则只看到其中一个时会被识别为新增或删除
+            for path, status in self._files.items():
+                if status.orig_path and (path in scope or status.orig_path in scope):
+                    scope.update((path, status.orig_path))
+            try:
+                files, branch = await self._status(sorted(scope))
+            except BaseException:
+                with self._lock:
+                    self._dirty |= scope
+                raise
+            self._apply(files, branch, scope)
+
+    def _apply(self, files: Dict[str, FileStatus], branch: Dict[str, Any], scope: Optional[Set[str]]):
+        """Merge a status result, scope None means the result covers the whole tree"""
+        version = self.version + 1
+        changed = False
+        for path in list(self._files):
+            if path not in files and (scope is None or _in_scope(path, scope)):
+                del self._files[path]
+                del self._versions[path]
+                self._removed[path] = version
+                changed = True
+        for path, status in files.items():
+            if self._files.get(path) != status:
+                self._files[path] = status
+                self._versions[path] = version
+                self._removed.pop(path, None)
+                changed = True
+        if branch != self.branch:
+            self.branch = branch
+            changed = True
+        if len(self._removed) > MAX_TOMBSTONES:
+            self._removed.clear()
+            self._floor = version
+        if changed:
+            self.version = version
+            # 唤醒所有等待变化的订阅者
+            self._changed.set()
+            self._changed = asyncio.Event()
+
+    async def ensure_loaded(self):
+        """Start the model, running the first full status if needed"""
+        self._start()
+        if not self._loaded:
+            await self.reconcile()
+
+    def cursor(self, version: Optional[int] = None) -> str:
+        """Client visible cursor of a version, the current one by default"""
+        return f"{self.epoch}:{self.version if version is None else version}"
+
+    def parse_cursor(self, cursor: Optional[str]) -> Optional[int]:
+        """
+        Version of a cursor returned by this model
+
+        Returns:
+            版本号；游标为空、格式错误或来自其他epoch（例如服务重启之前）时返回None
+        """
+        if not cursor:
+            return None
+        epoch, _, version = cursor.partition(":")
+        if epoch != self.epoch:
+            return None
+        try:
+            return int(version)
+        except ValueError:
+            return None
+
+    def snapshot(self, since: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Status of the working tree
+
+        Args:
+            since: 客户端已知的版本游标，只返回之后的变化
+
+        Returns:
+            version、branch、files（有变化的路径）和 removed（恢复干净或被删除的路径）；
+            full 为true时 files 是完整列表，客户端应丢弃旧状态
+        """
+        since = self.parse_cursor(since)
+        full = since is None or since < self._floor or since > self.version
+        if full:
+            files = [status.to_dict() for status in self._files.values()]
+            removed = []
+        else:
+            files = [status.to_dict() for path, status in self._files.items() if self._versions[path] > since]
+            removed = [path for path, version in self._removed.items() if version > since]
+        files.sort(key=lambda f: f["path"])
+        return {
+            "version": self.cursor(),
+            "full": full,
+            "branch": self.branch,
+            "files": files,
+            "removed": sorted(removed),
+        }
+
+    def has_tracked_changes(self) -> bool:
+        """Whether tracked files are modified in the index or the working tree"""
+        return any(status.tracked for status in self._files.values())
+
+    async def wait_for_change(self, version: int, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until the model moves past version
+
+        Returns:
+            True if it changed, False on timeout
+        """
+        self._start()
+        if self.version != version:
+            return True
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        if self._observer is not None:
+            observer, self._observer = self._observer, None
+            observer.stop()
+            await asyncio.to_thread(observer.join)
+        self._loop = None
+
+
+_models: Dict[str, GitStatusModel] = {}
+_models_lock = threading.Lock()
+
+
+def get_git_status_model(project_path: str) -> GitStatusModel:
+    """The shared status model of a project"""
+    with _models_lock:
+        model = _models.get(os.path.abspath(project_path))
+        if model is None:
+            model = _models[os.path.abspath(project_path)] = GitStatusModel(project_path)
+        return model
+
+
+async def close_git_status_models():
+    """Stop the watchers and refresh tasks, called on shutdown"""
+    with _models_lock:
+        models = list(_models.values())
+        _models.clear()
+    for model in models:
+        await model.close()
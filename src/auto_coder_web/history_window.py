@@ -0,0 +1,244 @@
+"""
+Token-budgeted history windowing for chat/coding prompts.
+
+Long sessions used to be inlined verbatim into ``chat_prompt`` and
+``coding_prompt``. This module selects the newest messages that fit in a
+token budget, truncates oversized tool outputs according to a per-tool
+policy and reports how much of the history was included.
+
+Token counts are computed with the tokenizer loaded in ``proxy.main``
+(``VariableHolder.TOKENIZER_MODEL``) and cached per message content, so
+re-reading the same session for every command only tokenizes new messages.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field, asdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+# conf key used to override the default budget, e.g. `/conf history_token_budget:16000`
+HISTORY_TOKEN_BUDGET_CONF_KEY = "history_token_budget"
+DEFAULT_HISTORY_TOKEN_BUDGET = 32000
+
+# Any single message above this size is truncated, tool output or not
+DEFAULT_MESSAGE_TOKEN_LIMIT = 8000
+DEFAULT_TOOL_OUTPUT_TOKEN_LIMIT = 2000
+
+# Per-tool token limits for tool outputs stored in the chat history
+TOOL_OUTPUT_TOKEN_LIMITS: Dict[str, int] = {
+    "ReadFileTool": 1500,
+    "ExecuteCommandTool": 1500,
+    "SearchFilesTool": 1000,
+    "ListFilesTool": 500,
+    "ListCodeDefinitionNamesTool": 500,
+    "ListPackageInfoTool": 500,
+    "UseMcpTool": 1500,
+    "UseRAGTool": 1500,
+    "WriteToFileTool": 300,
+    "ReplaceInFileTool": 300,
+}
+
+_TOKEN_CACHE_MAX_SIZE = 50000
+_token_cache: "OrderedDict[str, int]" = OrderedDict()
+_token_cache_lock = threading.Lock()
+
+
+@dataclass
+class HistoryWindow:
+    """The selected messages plus statistics about what was left out."""
+    messages: List[Dict[str, Any]] = field(default_factory=list)
+    budget: int = DEFAULT_HISTORY_TOKEN_BUDGET
+    total_count: int = 0
+    included_count: int = 0
+    included_tokens: int = 0
+    truncated_count: int = 0
+
+    @property
+    def dropped_count(self) -> int:
+        return self.total_count - self.included_count
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Statistics only, without the messages themselves"""
+        stats = asdict(self)
+        stats.pop("messages")
+        stats["dropped_count"] = self.dropped_count
+        return stats
+
+
+def _content_to_text(content: Any) -> str:
+    if isinstance(content, str):
+        return content
+    if content is None:
+        return ""
+    try:
+        return json.dumps(content, ensure_ascii=False)
+    except (TypeError, ValueError):
+        return str(content)
+
+
+def count_text_tokens(text: str) -> int:
+    """
+    Count tokens of a text, using the per-content cache.
+
+    Falls back to a character based estimate when the tokenizer has not been
+    loaded (``count_tokens`` returns -1 in that case).
+    """
+    if not text:
+        return 0
+
+    key = hashlib.blake2b(text.encode("utf-8", errors="replace"), digest_size=16).hexdigest()
+    with _token_cache_lock:
+        cached = _token_cache.get(key)
+        if cached is not None:
+            _token_cache.move_to_end(key)
+            return cached
+
+    from autocoder.rag.token_counter import count_tokens
+    tokens = count_tokens(text)
+    if tokens < 0:
+        tokens = len(text) // 4 + 1
+
+    with _token_cache_lock:
+        _token_cache[key] = tokens
+        if len(_token_cache) > _TOKEN_CACHE_MAX_SIZE:
+            _token_cache.popitem(last=False)
+    return tokens
+
+
+def _truncate_text(text: str, tokens: int, limit: int) -> str:
+    """Cut text proportionally so that it roughly fits in ``limit`` tokens"""
+    keep_chars = max(0, int(len(text) * limit / max(tokens, 1)))
+    return text[:keep_chars] + f"\n...[truncated {tokens - limit} tokens]"
+
+
+def apply_truncation_policy(message: Dict[str, Any],
+                            max_tokens: Optional[int] = None) -> Tuple[Dict[str, Any], int, bool]:
+    """
+    Truncate a message whose content exceeds its per-type token limit.
+
+    Tool outputs are recognised by a JSON content carrying ``tool_name`` and
+    are limited by ``TOOL_OUTPUT_TOKEN_LIMITS``; only their ``content`` field
+    is cut so the message keeps its structure for the message parsers.
+
+    Args:
+        message: The chat message
+        max_tokens: Cap applied on top of the per-type limit
+
+    Returns:
+        (message, token count, whether the message was truncated)
+    """
+    text = _content_to_text(message.get("content", ""))
+    tokens = count_text_tokens(text)
+
+    content_obj = None
+    limit = DEFAULT_MESSAGE_TOKEN_LIMIT
+    if text.startswith("{"):
+        try:
+            content_obj = json.loads(text)
+        except ValueError:
+            content_obj = None
+        if isinstance(content_obj, dict) and "tool_name" in content_obj:
+            limit = TOOL_OUTPUT_TOKEN_LIMITS.get(
+                content_obj["tool_name"], DEFAULT_TOOL_OUTPUT_TOKEN_LIMIT)
+        else:
+            content_obj = None
+    if max_tokens is not None:
+        limit = min(limit, max_tokens)
+
+    if tokens <= limit:
+        return message, tokens, False
+
+    processed_message = message.copy()
+    inner = content_obj.get("content") if content_obj is not None else None
+    if isinstance(inner, str) and inner:
+        inner_tokens = count_text_tokens(inner)
+        overhead = tokens - inner_tokens
+        content_obj["content"] = _truncate_text(inner, inner_tokens, max(limit - overhead, 0))
+        new_text = json.dumps(content_obj, ensure_ascii=False)
+    else:
+        new_text = _truncate_text(text, tokens, limit)
+
+    processed_message["content"] = new_text
+    return processed_message, count_text_tokens(new_text), True
+
+
+def _fit_newest_message(message: Dict[str, Any], budget: int) -> Tuple[Dict[str, Any], int]:
+    """
+    Truncate the newest message until it fits in ``budget`` on its own.
+
+    Truncation is proportional to characters, so the limit is tightened by
+    the remaining overshoot a few times; as a last resort the plain text is cut.
+    """
+    limit = budget
+    for _ in range(4):
+        processed, tokens, _ = apply_truncation_policy(message, limit)
+        if tokens <= budget:
+            return processed, tokens
+        limit -= tokens - budget
+        if limit <= 0:
+            break
+    text = _content_to_text(message.get("content", ""))
+    processed = message.copy()
+    processed["content"] = text[:max(budget, 0)]
+    tokens = count_text_tokens(processed["content"])
+    while tokens > budget and processed["content"]:
+        processed["content"] = processed["content"][:len(processed["content"]) // 2]
+        tokens = count_text_tokens(processed["content"])
+    return processed, tokens
+
+
+def get_history_token_budget(conf: Optional[Dict[str, Any]]) -> int:
+    """Read the history token budget from the auto-coder conf"""
+    if conf:
+        value = conf.get(HISTORY_TOKEN_BUDGET_CONF_KEY)
+        if value is not None:
+            try:
+                budget = int(value)
+                if budget > 0:
+                    return budget
+            except (TypeError, ValueError):
+                logger.warning(f"Invalid {HISTORY_TOKEN_BUDGET_CONF_KEY}: {value}, using default")
+    return DEFAULT_HISTORY_TOKEN_BUDGET
+
+
+def build_history_window(messages: List[Dict[str, Any]],
+                         budget: int = DEFAULT_HISTORY_TOKEN_BUDGET) -> HistoryWindow:
+    """
+    Select the newest messages that fit in ``budget`` tokens.
+
+    Messages are walked from newest to oldest and selection stops at the
+    first message that no longer fits, so the window is always a contiguous
+    suffix of the conversation in chronological order. Older messages are
+    never tokenized once the budget is exhausted. The newest message is
+    always included, truncated further if it does not fit on its own.
+
+    Args:
+        messages: Chat messages ordered from oldest to newest
+        budget: Maximum number of tokens for the selected messages
+
+    Returns:
+        HistoryWindow with the selected messages and statistics
+    """
+    window = HistoryWindow(budget=budget, total_count=len(messages))
+    selected: List[Dict[str, Any]] = []
+
+    for message in reversed(messages):
+        processed, tokens, truncated = apply_truncation_policy(message)
+        if not selected and tokens > budget:
+            # 最新的消息单独也超出预算时截断到预算内，避免提示词中完全没有历史
+            processed, tokens = _fit_newest_message(message, budget)
+            truncated = True
+        if window.included_tokens + tokens > budget:
+            break
+        selected.append(processed)
+        window.included_tokens += tokens
+        if truncated:
+            window.truncated_count += 1
+
+    selected.reverse()
+    window.messages = selected
+    window.included_count = len(selected)
+    return window
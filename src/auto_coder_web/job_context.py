@@ -0,0 +1,117 @@
+"""
+Per-job configuration overlay for the auto-coder runner.
+
+``autocoder.auto_coder_runner`` keeps its configuration in the module level
+``memory["conf"]`` and every command reads it from there. Background jobs
+used to set their ``event_file`` with ``configure`` which writes the shared
+dict and ``memory.json``, so two jobs running at the same time could pick up
+each other's event file.
+
+``install_job_config_overlay`` swaps the runner's ``memory`` for a
+``JobScopedMemory``. Inside ``job_config_context()`` (entered by the job
+scheduler for every job), ``memory["conf"]`` and ``memory.get("conf")``
+return the shared configuration merged with the job's own overrides, which
+live in a ``ContextVar`` and are never persisted. Writes through the merged
+view still reach the shared configuration, so ``/conf`` keeps working.
+
+The overlay follows the job's thread; threads started by the runner itself
+do not inherit it, which is fine as long as they receive their settings
+through the ``AutoCoderArgs`` built in the job thread.
+"""
+import contextvars
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+_job_conf_overlay: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar(
+    "auto_coder_web_job_conf_overlay", default=None)
+
+_install_lock = threading.Lock()
+
+
+class _MergedConf(dict):
+    """Shared conf merged with the job overlay; writes go to the shared conf"""
+
+    def __init__(self, base: Dict[str, Any], overlay: Dict[str, Any]):
+        super().__init__(base)
+        self.update(overlay)
+        self._base = base
+
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, value)
+        self._base[key] = value
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        self._base.pop(key, None)
+
+
+class JobScopedMemory(dict):
+    """
+    The runner's memory dict with a per-job view of ``conf``.
+
+    Only ``conf`` lookups are intercepted; iteration, ``items()`` and thus
+    ``json.dump`` in ``save_memory`` still see the shared data, so job
+    overrides never end up in ``memory.json``.
+    """
+
+    def _conf_view(self, base: Dict[str, Any]) -> Dict[str, Any]:
+        overlay = _job_conf_overlay.get()
+        if not overlay:
+            return base
+        return _MergedConf(base, overlay)
+
+    def __getitem__(self, key):
+        value = dict.__getitem__(self, key)
+        if key == "conf" and isinstance(value, dict):
+            return self._conf_view(value)
+        return value
+
+    def get(self, key, default=None):
+        if key == "conf":
+            if dict.__contains__(self, key):
+                return self["conf"]
+            if _job_conf_overlay.get():
+                return self._conf_view(dict.setdefault(self, "conf", {}))
+        return dict.get(self, key, default)
+
+
+def install_job_config_overlay():
+    """Replace the runner's ``memory`` with a ``JobScopedMemory``, once"""
+    import autocoder.auto_coder_runner as auto_coder_runner
+    with _install_lock:
+        if not isinstance(auto_coder_runner.memory, JobScopedMemory):
+            auto_coder_runner.memory = JobScopedMemory(auto_coder_runner.memory)
+
+
+@contextmanager
+def job_config_context() -> Iterator[Dict[str, Any]]:
+    """Run the enclosed code with its own, initially empty, conf overlay"""
+    token = _job_conf_overlay.set({})
+    try:
+        yield _job_conf_overlay.get()
+    finally:
+        _job_conf_overlay.reset(token)
+
+
+def in_job_context() -> bool:
+    return _job_conf_overlay.get() is not None
+
+
+def get_job_conf() -> Dict[str, Any]:
+    """The overrides of the current job, empty outside of a job"""
+    return dict(_job_conf_overlay.get() or {})
+
+
+def set_job_conf(key: str, value: Any):
+    """Override a conf value for the current job only"""
+    overlay = _job_conf_overlay.get()
+    if overlay is None:
+        raise RuntimeError("set_job_conf called outside of a job context")
+    overlay[key] = value
+
+
+def unset_job_conf(key: str):
+    overlay = _job_conf_overlay.get()
+    if overlay is not None:
+        overlay.pop(key, None)
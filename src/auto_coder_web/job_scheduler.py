@@ -0,0 +1,586 @@
+"""
+Bounded scheduler for background commands.
+
+chat/coding/auto commands, chat resets, rule analysis, index builds and todo
+execution used to each start their own daemon ``Thread``, so a burst of
+requests could run any number of LLM pipelines at once against the shared
+auto-coder memory and config. Every background command is now submitted to
+``job_scheduler`` instead:
+
+- each kind of job has its own concurrency limit, plus a global cap on the
+  number of running jobs;
+- jobs that cannot start yet wait in a per-kind queue ordered by priority,
+  FIFO within the same priority, and their queue position is written to the
+  job's event file so the SSE stream shows it;
+- when a queue is full the request is rejected with 429 and a Retry-After
+  estimated from the recent run time of that kind of job;
+- on shutdown queued jobs are dropped, running jobs are asked to cancel and
+  are given a grace period to finish.
+
+The scheduler is also the registry of background jobs: it keeps running,
+queued and recently finished jobs with their kind, owning panel, timings,
+current phase and token usage (read incrementally from the job's event
+file), and it is the single place where jobs are cancelled.
+"""
+import heapq
+import itertools
+import math
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from loguru import logger
+from autocoder.common.global_cancel import global_cancel
+from autocoder.events import event_content as EventContentCreator
+from autocoder.events.event_manager_singleton import get_event_manager
+from autocoder.events.event_types import EventType
+from auto_coder_web.event_tail import read_events_from_offset
+from auto_coder_web.job_context import job_config_context
+
+# Maximum number of concurrently running jobs per kind
+DEFAULT_CONCURRENCY_LIMITS: Dict[str, int] = {
+    "chat": 2,
+    "coding": 2,
+    "auto": 2,
+    "reset_chat": 1,
+    "rules": 1,
+    "index": 1,
+    "todo": 1,
+}
+# Used for kinds missing from the limits above
+DEFAULT_KIND_LIMIT = 1
+# Maximum number of running jobs over all kinds
+DEFAULT_MAX_RUNNING_JOBS = 4
+# Maximum number of waiting jobs per kind before new submissions get a 429
+DEFAULT_MAX_QUEUED_JOBS = 16
+
+# Retry-After used before any job of a kind has finished, and its bounds
+DEFAULT_RETRY_AFTER = 30
+MIN_RETRY_AFTER = 1
+MAX_RETRY_AFTER = 600
+
+# Higher runs first
+PRIORITY_HIGH = 10
+PRIORITY_NORMAL = 0
+
+QUEUE_EVENT_PATH = "/jobs/queue"
+# content_type of queue position events; clients show them as a status
+# indicator, they are never chat messages or part of a prompt
+QUEUE_CONTENT_TYPE = "job_status"
+
+# Number of finished jobs kept for introspection
+MAX_FINISHED_JOBS = 100
+
+_current_job = threading.local()
+
+
+def get_current_job() -> Optional["Job"]:
+    """The job run by the calling worker thread, if any"""
+    return getattr(_current_job, "job", None)
+
+
+class JobQueueFullError(HTTPException):
+    """Raised by ``submit`` when a job cannot be admitted; rendered as a 429"""
+
+    def __init__(self, kind: str, retry_after: int, reason: str = "queue is full"):
+        self.kind = kind
+        self.retry_after = retry_after
+        super().__init__(
+            status_code=429,
+            detail=f"Too many {kind} jobs: {reason}, retry after {retry_after}s",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
+@dataclass
+class Job:
+    """A background command and its scheduling state"""
+    job_id: str
+    kind: str
+    target: Callable[[], Any]
+    event_file: Optional[str] = None
+    priority: int = PRIORITY_NORMAL
+    panel_id: Optional[str] = None
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    # queued / running / completed / failed / cancelled
+    status: str = "queued"
+    error: Optional[str] = None
+    # Latest activity: the newer of the step set by the job and the last event
+    phase: str = "queued"
+    # Phase set by the job itself via set_phase (e.g. the current todo task)
+    step: Optional[str] = None
+    input_tokens: int = 0
+    output_tokens: int = 0
+    # Timestamp of the first STREAM event, for startup-to-first-token latency
+    first_token_at: Optional[float] = None
+    cancel_requested: bool = False
+    # Last queue position written to the event file, None if never queued
+    reported_position: Optional[int] = None
+    thread: Optional[threading.Thread] = field(default=None, repr=False)
+    # Offset up to which the event file has been scanned for progress
+    _progress_offset: int = field(default=0, repr=False)
+    # When step was set; older events do not replace it as the phase
+    _step_at: float = field(default=0.0, repr=False)
+    _progress_lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds since the job started, 0 while queued"""
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    @property
+    def first_token_latency(self) -> Optional[float]:
+        """Seconds from the job start to its first streamed token"""
+        if self.first_token_at is None or self.started_at is None:
+            return None
+        return max(0.0, self.first_token_at - self.started_at)
+
+    def refresh_progress(self):
+        """
+        Update phase and token usage from the events appended to the job's
+        event file since the previous refresh.
+        """
+        with self._progress_lock:
+            self._refresh_progress_locked()
+
+    def set_phase(self, phase: str):
+        """
+        Set the phase from the job itself, e.g. the step of a multi-step job.
+
+        It is kept as ``step`` and reported as the phase until an event newer
+        than this call shows other activity.
+        """
+        with self._progress_lock:
+            self.step = self.phase = phase
+            self._step_at = time.time()
+
+    def attach_event_file(self, event_file: str):
+        """Switch to the event file of the next step of a multi-step job"""
+        with self._progress_lock:
+            self._refresh_progress_locked()
+            self.event_file = event_file
+            self._progress_offset = 0
+
+    def _refresh_progress_locked(self):
+        if not self.event_file:
+            return
+        events, self._progress_offset, _ = read_events_from_offset(self.event_file, self._progress_offset)
+        for _, event in events:
+            if event.event_type == EventType.STREAM and self.first_token_at is None:
+                self.first_token_at = event.timestamp
+            content = event.content if isinstance(event.content, dict) else {}
+            inner = content.get("content")
+            if event.event_type == EventType.RESULT and isinstance(inner, dict) \
+                    and "input_tokens" in inner and "output_tokens" in inner:
+                self.input_tokens += int(inner.get("input_tokens") or 0)
+                self.output_tokens += int(inner.get("output_tokens") or 0)
+                continue
+            path = (event.metadata or {}).get("path")
+            if self.status != "running" or path == QUEUE_EVENT_PATH or event.timestamp < self._step_at:
+                continue
+            if event.event_type == EventType.ASK_USER:
+                self.phase = "waiting_for_user"
+            elif event.event_type == EventType.STREAM:
+                self.phase = "streaming"
+            else:
+                self.phase = path or event.event_type.name.lower()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "panel_id": self.panel_id,
+            "event_file": self.event_file,
+            "priority": self.priority,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "elapsed": round(self.elapsed, 3),
+            "status": self.status,
+            "phase": self.phase,
+            "step": self.step,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "first_token_latency": None if self.first_token_latency is None else round(self.first_token_latency, 3),
+            "cancel_requested": self.cancel_requested,
+            "error": self.error,
+        }
+
+
+class JobScheduler:
+    """Admits, queues and runs background jobs within the configured limits"""
+
+    def __init__(self,
+                 limits: Optional[Dict[str, int]] = None,
+                 max_running: int = DEFAULT_MAX_RUNNING_JOBS,
+                 max_queued: int = DEFAULT_MAX_QUEUED_JOBS):
+        self._lock = threading.Condition()
+        self._limits: Dict[str, int] = dict(DEFAULT_CONCURRENCY_LIMITS)
+        if limits:
+            self._limits.update(limits)
+        self._max_running = max_running
+        self._max_queued = max_queued
+        # kind -> heap of (-priority, sequence, job)
+        self._queues: Dict[str, List[Tuple[int, int, Job]]] = {}
+        self._running: Dict[str, Job] = {}
+        self._finished: Deque[Job] = deque(maxlen=MAX_FINISHED_JOBS)
+        self._sequence = itertools.count()
+        # kind -> moving average of the run time in seconds
+        self._avg_duration: Dict[str, float] = {}
+        # kind -> moving average of the startup-to-first-token latency in seconds
+        self._avg_first_token_latency: Dict[str, float] = {}
+        self._accepting = True
+
+    def configure(self,
+                  limits: Optional[Dict[str, int]] = None,
+                  max_running: Optional[int] = None,
+                  max_queued: Optional[int] = None):
+        """
+        Change the limits at runtime; raising a limit starts waiting jobs.
+
+        Args:
+            limits: Per-kind concurrency limits to override
+            max_running: Maximum number of running jobs over all kinds
+            max_queued: Maximum number of waiting jobs per kind
+        """
+        with self._lock:
+            if limits:
+                for kind, limit in limits.items():
+                    self._limits[kind] = max(1, int(limit))
+            if max_running is not None:
+                self._max_running = max(1, int(max_running))
+            if max_queued is not None:
+                self._max_queued = max(0, int(max_queued))
+            started = self._dispatch_locked()
+        self._after_dispatch(started)
+        logger.info(f"Job scheduler limits: {self._limits}, max_running={self._max_running}, "
+                    f"max_queued={self._max_queued}")
+
+    def submit(self, kind: str, target: Callable[[], Any],
+               event_file: Optional[str] = None,
+               job_id: Optional[str] = None,
+               priority: int = PRIORITY_NORMAL,
+               panel_id: Optional[str] = None) -> Job:
+        """
+        Run ``target`` in the background as soon as the limits allow.
+
+        Args:
+            kind: Job kind, selects the concurrency limit and queue
+            target: Function run in a worker thread
+            event_file: Event file of the job, used to report queue position
+                and to skip jobs cancelled while waiting
+            job_id: Identifier of the job, defaults to a new uuid
+            priority: Higher priority jobs leave the queue first
+            panel_id: Chat panel that started the job
+
+        Returns:
+            The submitted job
+
+        Raises:
+            JobQueueFullError: The server is shutting down or the queue of
+                this kind of job is full
+        """
+        job = Job(job_id=job_id or str(uuid.uuid4()), kind=kind, target=target,
+                  event_file=event_file, priority=priority, panel_id=panel_id)
+        with self._lock:
+            if not self._accepting:
+                raise JobQueueFullError(kind, DEFAULT_RETRY_AFTER, "server is shutting down")
+            queue = self._queues.setdefault(kind, [])
+            if not self._can_start_locked(kind) and len(queue) >= self._max_queued:
+                raise JobQueueFullError(kind, self._retry_after_locked(kind))
+            heapq.heappush(queue, (-priority, next(self._sequence), job))
+            started = self._dispatch_locked()
+        self._after_dispatch(started, {kind})
+        if job.status == "queued":
+            logger.info(f"Queued {kind} job {job.job_id}")
+        return job
+
+    def cancel(self, job_id: str, event_file: Optional[str] = None,
+               error_content: Optional[Dict[str, Any]] = None) -> Optional[Job]:
+        """
+        Cancel a job.
+
+        A waiting job is removed from its queue. A running job is cancelled
+        cooperatively: its ``global_cancel`` token is set and it is marked
+        ``cancel_requested`` so jobs running several steps stop between them.
+        ``event_file`` lets callers cancel tasks the registry does not know
+        about, e.g. ones started before a restart.
+
+        Args:
+            job_id: Identifier of the job, the event file id for command jobs
+            event_file: Event file of the job, defaults to the job's own
+            error_content: Error event written to the event file, if given
+
+        Returns:
+            The cancelled job, None if the registry does not know it
+        """
+        job: Optional[Job] = None
+        changed_kinds = set()
+        with self._lock:
+            for kind, queue in self._queues.items():
+                for index, (_, _, queued_job) in enumerate(queue):
+                    if queued_job.job_id == job_id:
+                        queue.pop(index)
+                        heapq.heapify(queue)
+                        job = queued_job
+                        job.status = job.phase = "cancelled"
+                        job.finished_at = time.time()
+                        self._finished.append(job)
+                        changed_kinds.add(kind)
+                        break
+                if job is not None:
+                    break
+            if job is None:
+                job = self._running.get(job_id)
+            if job is not None:
+                job.cancel_requested = True
+                event_file = event_file or job.event_file
+
+        if event_file and (job is None or job.status == "running"):
+            global_cancel.set(token=event_file)
+        if event_file and error_content is not None:
+            try:
+                get_event_manager(event_file).write_error(error_content)
+            except Exception as e:
+                logger.warning(f"Could not write cancel event for job {job_id}: {str(e)}")
+        if changed_kinds:
+            self._after_dispatch([], changed_kinds)
+        if job is not None:
+            logger.info(f"Cancel requested for {job.kind} job {job_id} ({job.status})")
+        return job
+
+    def get_job(self, job_id: str) -> Optional[Job]:
+        """Look up a running, queued or recently finished job"""
+        with self._lock:
+            for job in self._all_jobs_locked():
+                if job.job_id == job_id:
+                    return job
+        return None
+
+    def list_jobs(self) -> List[Job]:
+        """Running, queued and recently finished jobs, newest first"""
+        with self._lock:
+            jobs = self._all_jobs_locked()
+        return sorted(jobs, key=lambda job: job.submitted_at, reverse=True)
+
+    def active_jobs(self) -> List[Job]:
+        """Running and queued jobs"""
+        with self._lock:
+            jobs = list(self._running.values())
+            jobs += [job for queue in self._queues.values() for _, _, job in queue]
+        return jobs
+
+    def _all_jobs_locked(self) -> List[Job]:
+        jobs = list(self._running.values())
+        jobs += [job for queue in self._queues.values() for _, _, job in queue]
+        jobs += list(self._finished)
+        return jobs
+
+    def stats(self) -> Dict[str, Any]:
+        """Running and queued job counts per kind together with the limits"""
+        with self._lock:
+            running: Dict[str, int] = {}
+            for job in self._running.values():
+                running[job.kind] = running.get(job.kind, 0) + 1
+            return {
+                "limits": dict(self._limits),
+                "max_running": self._max_running,
+                "max_queued": self._max_queued,
+                "running": running,
+                "queued": {kind: len(queue) for kind, queue in self._queues.items() if queue},
+                "accepting": self._accepting,
+                "avg_duration": {kind: round(value, 3) for kind, value in self._avg_duration.items()},
+                "avg_first_token_latency": {kind: round(value, 3)
+                                            for kind, value in self._avg_first_token_latency.items()},
+            }
+
+    def shutdown(self, timeout: float = 10.0):
+        """
+        Stop accepting jobs, drop the waiting ones and wait for running jobs.
+
+        Running jobs are asked to stop through their ``global_cancel`` token
+        and get ``timeout`` seconds to finish; worker threads are daemons so a
+        job that ignores cancellation does not block the process exit.
+        """
+        with self._lock:
+            self._accepting = False
+            dropped = [job for queue in self._queues.values() for _, _, job in queue]
+            self._queues.clear()
+            running = list(self._running.values())
+
+        for job in dropped:
+            job.status = job.phase = "cancelled"
+            job.finished_at = time.time()
+            self._finished.append(job)
+            if job.event_file:
+                self._write_event_safely(job, lambda manager: manager.write_error(
+                    EventContentCreator.create_error(
+                        error_code="503", error_message="Server is shutting down, job was not started",
+                        details={}).to_dict()))
+        for job in running:
+            job.cancel_requested = True
+            if job.event_file:
+                global_cancel.set(token=job.event_file)
+
+        if dropped or running:
+            logger.info(f"Draining job scheduler: {len(dropped)} queued jobs dropped, "
+                        f"waiting for {len(running)} running jobs")
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while self._running:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logger.warning(f"Job scheduler shutdown timed out with {len(self._running)} jobs still running")
+                    break
+                self._lock.wait(remaining)
+
+    def _can_start_locked(self, kind: str) -> bool:
+        if not self._accepting or len(self._running) >= self._max_running:
+            return False
+        running_of_kind = sum(1 for job in self._running.values() if job.kind == kind)
+        return running_of_kind < self._limits.get(kind, DEFAULT_KIND_LIMIT)
+
+    def _dispatch_locked(self) -> List[Job]:
+        """Start waiting jobs while the limits allow, best priority first"""
+        started: List[Job] = []
+        while True:
+            best: Optional[Tuple[int, int, Job]] = None
+            for kind, queue in self._queues.items():
+                if queue and self._can_start_locked(kind) and (best is None or queue[0][:2] < best[:2]):
+                    best = queue[0]
+            if best is None:
+                return started
+            job = best[2]
+            heapq.heappop(self._queues[job.kind])
+            job.status = "running"
+            job.phase = "starting"
+            job.started_at = time.time()
+            self._running[job.job_id] = job
+            started.append(job)
+
+    def _positions_locked(self, kind: str) -> List[Tuple[Job, int]]:
+        """Queued jobs of ``kind`` with their 1-based position"""
+        return [(job, index + 1) for index, (_, _, job) in enumerate(sorted(self._queues.get(kind, [])))]
+
+    def _retry_after_locked(self, kind: str) -> int:
+        avg = self._avg_duration.get(kind)
+        if avg is None:
+            return DEFAULT_RETRY_AFTER
+        limit = self._limits.get(kind, DEFAULT_KIND_LIMIT)
+        waiting = len(self._queues.get(kind, [])) + 1
+        estimate = math.ceil(avg * waiting / limit)
+        return max(MIN_RETRY_AFTER, min(MAX_RETRY_AFTER, estimate))
+
+    def _after_dispatch(self, started: List[Job], changed_kinds: Optional[set] = None):
+        """Start threads and report queue positions, outside of the lock"""
+        for job in started:
+            job.thread = threading.Thread(target=self._run, args=(job,), daemon=True,
+                                          name=f"auto-coder-{job.kind}-job")
+            job.thread.start()
+            logger.info(f"Started {job.kind} job {job.job_id}")
+
+        kinds = set(changed_kinds or ()) | {job.kind for job in started}
+        with self._lock:
+            positions = [item for kind in kinds for item in self._positions_locked(kind)]
+        for job, position in positions:
+            if job.reported_position != position:
+                self._report_position(job, position)
+
+    def _run(self, job: Job):
+        _current_job.job = job
+        try:
+            if job.event_file and global_cancel.is_requested(token=job.event_file):
+                # 排队期间已被取消，取消事件已由cancel接口写入
+                logger.info(f"Skipping {job.kind} job {job.job_id}, cancelled while queued")
+                global_cancel.reset_token(job.event_file)
+                job.status = "cancelled"
+            else:
+                if job.reported_position:
+                    self._report_position(job, 0)
+                # 每个任务有自己的配置覆盖层，configure_wrapper 不会影响并发运行的其他任务
+                with job_config_context():
+                    job.target()
+                job.status = "cancelled" if job.cancel_requested else "completed"
+        except Exception as e:
+            logger.error(f"Unhandled error in {job.kind} job {job.job_id}: {str(e)}")
+            logger.exception(e)
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            _current_job.job = None
+            job.finished_at = time.time()
+            try:
+                job.refresh_progress()
+            except Exception as e:
+                logger.warning(f"Could not read progress of job {job.job_id}: {str(e)}")
+            job.phase = job.status
+            if job.first_token_latency is not None:
+                logger.info(f"{job.kind} job {job.job_id}: first token after {job.first_token_latency:.3f}s")
+            if job.cancel_requested and job.event_file:
+                global_cancel.reset_token(job.event_file)
+            with self._lock:
+                self._running.pop(job.job_id, None)
+                self._finished.append(job)
+                if job.status != "cancelled":
+                    duration = job.finished_at - (job.started_at or job.finished_at)
+                    previous = self._avg_duration.get(job.kind)
+                    self._avg_duration[job.kind] = duration if previous is None else previous * 0.7 + duration * 0.3
+                latency = job.first_token_latency
+                if latency is not None:
+                    previous = self._avg_first_token_latency.get(job.kind)
+                    self._avg_first_token_latency[job.kind] = latency if previous is None else previous * 0.7 + latency * 0.3
+                started = self._dispatch_locked()
+                self._lock.notify_all()
+            self._after_dispatch(started)
+
+    def _report_position(self, job: Job, position: int):
+        """Write the queue position of a job to its event stream; 0 means started"""
+        if (position > 0) != (job.status == "queued"):
+            return
+        job.reported_position = position
+        if not job.event_file:
+            return
+        status = "running" if position == 0 else "queued"
+        content = {"job_id": job.job_id, "kind": job.kind, "status": status, "position": position}
+        result = EventContentCreator.create_result(content=content, metadata={"path": QUEUE_EVENT_PATH}).to_dict()
+        result["content_type"] = QUEUE_CONTENT_TYPE
+        self._write_event_safely(job, lambda manager: manager.write_result(
+            result, metadata={"path": QUEUE_EVENT_PATH}))
+
+    @staticmethod
+    def _write_event_safely(job: Job, write: Callable[[Any], Any]):
+        try:
+            write(get_event_manager(job.event_file))
+        except Exception as e:
+            logger.warning(f"Could not write queue event for job {job.job_id}: {str(e)}")
+
+
+def is_queue_status_message(message: Dict[str, Any]) -> bool:
+    """Whether a saved chat message is a queue position update rather than conversation"""
+    metadata = message.get("metadata") or {}
+    return message.get("contentType") == QUEUE_CONTENT_TYPE or metadata.get("path") == QUEUE_EVENT_PATH
+
+
+def parse_job_limits(value: str) -> Dict[str, int]:
+    """Parse ``chat=2,coding=1`` style limits given on the command line"""
+    limits: Dict[str, int] = {}
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        kind, sep, limit = item.partition("=")
+        if not sep:
+            raise ValueError(f"Invalid job limit '{item}', expected kind=limit")
+        limits[kind.strip()] = int(limit)
+    return limits
+
+
+job_scheduler = JobScheduler()
@@ -9,6 +9,7 @@ from fastapi import WebSocket
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import uvicorn
+import asyncio
 import httpx
 import uuid
 import os
@@ -16,10 +17,19 @@ import argparse
 import aiofiles
 import pkg_resources
 import sys
+from typing import Optional
 from auto_coder_web.terminal import terminal_manager
+from auto_coder_web.terminal_recording import recording_writer
+from auto_coder_web.git_objects import close_object_readers
+from auto_coder_web.git_service import shutdown_git_executor
+from auto_coder_web.git_status import close_git_status_models
+from auto_coder_web.event_tail import event_tail_service
+from auto_coder_web.event_channel import handle_event_channel
+from auto_coder_web.job_scheduler import job_scheduler, parse_job_limits
+from auto_coder_web.retention import RetentionJanitor, RetentionPolicy, parse_retention_policy
 from autocoder.common import AutoCoderArgs
 from auto_coder_web.auto_coder_runner_wrapper import AutoCoderRunnerWrapper
-from auto_coder_web.routers import todo_router, settings_router, auto_router, commit_router, chat_router, coding_router, index_router, config_router, upload_router, rag_router, editable_preview_router, mcp_router, direct_chat_router, rules_router, chat_panels_router, code_editor_tabs_router, file_command_router
+from auto_coder_web.routers import todo_router, settings_router, auto_router, commit_router, chat_router, coding_router, index_router, config_router, upload_router, rag_router, editable_preview_router, mcp_router, direct_chat_router, rules_router, chat_panels_router, code_editor_tabs_router, file_command_router, jobs_router, retention_router, terminal_router, git_status_router
 from auto_coder_web.expert_routers import history_router
 from auto_coder_web.common_router import completions_router, file_router, auto_coder_conf_router, chat_list_router, file_group_router, model_router, compiler_router, lib_router
 from auto_coder_web.common_router import active_context_router
@@ -28,13 +38,18 @@ from loguru import logger
 from auto_coder_web.lang import get_message
 
 class ProxyServer:
-    def __init__(self, project_path: str, quick: bool = False, product_mode: str = "pro"):    
+    def __init__(self, project_path: str, quick: bool = False, product_mode: str = "pro",
+                 retention_policy: Optional[RetentionPolicy] = None, record_terminals: bool = False):    
         self.app = FastAPI()                        
         self.setup_middleware()        
 
         self.setup_static_files()
         self.project_path = project_path
         self.product_mode = product_mode
+        self.retention_janitor = RetentionJanitor(project_path, retention_policy)
+        terminal_manager.configure_recording(
+            os.path.join(project_path, ".auto-coder", "auto-coder.web", "terminal-recordings"),
+            record_all=record_terminals)
         self.auto_coder_runner = None                
         # Check if project is initialized
         self.is_initialized = self.check_project_initialization()
@@ -87,6 +102,8 @@ class ProxyServer:
         # self.app.state.file_cacher = FileCacher(self.project_path)
         # Store initialization status
         self.app.state.is_initialized = self.is_initialized
+        # Store retention janitor for retention_router
+        self.app.state.retention_janitor = self.retention_janitor
         # Store memory for lib_router
         if self.auto_coder_runner:
             self.app.state.memory = self.auto_coder_runner.get_memory_wrapper()
@@ -118,11 +135,28 @@ class ProxyServer:
         self.app.include_router(code_editor_tabs_router.router)
         self.app.include_router(file_command_router.router)
         self.app.include_router(lib_router.router)
+        self.app.include_router(jobs_router.router)
+        self.app.include_router(retention_router.router)
+        self.app.include_router(terminal_router.router)
+        self.app.include_router(git_status_router.router)
+
+        @self.app.on_event("startup")
+        async def startup_event():
+            # 后台定期压缩和清理事件文件、任务记录等
+            self.retention_janitor.start()
 
         @self.app.on_event("shutdown")
         async def shutdown_event():
+            self.retention_janitor.stop()
+            # 先停止接收新任务并等待正在运行的任务结束
+            await asyncio.to_thread(job_scheduler.shutdown)
             if self.auto_coder_runner:
                 self.auto_coder_runner.stop()
+            event_tail_service.stop()
+            await asyncio.to_thread(recording_writer.stop)
+            await close_git_status_models()
+            await close_object_readers()
+            shutdown_git_executor()
             await self.client.aclose()
 
         @self.app.websocket("/ws/terminal")
@@ -130,6 +164,11 @@ class ProxyServer:
             session_id = str(uuid.uuid4())
             await terminal_manager.handle_websocket(websocket, session_id)
 
+        @self.app.websocket("/ws/events")
+        async def events_websocket(websocket: WebSocket):
+            # 单个连接上订阅多个任务的事件流，并发送用户响应和取消请求
+            await handle_event_channel(websocket, self.project_path)
+
         @self.app.get("/", response_class=HTMLResponse)
         async def read_root():
             if os.path.exists(self.index_html_path):
@@ -280,6 +319,36 @@ def main():
         action="store_true",
         help="Run in pro mode (equivalent to --product_mode pro)",
     )
+    parser.add_argument(
+        "--job_limits",
+        type=str,
+        default="",
+        help="Per-kind concurrency limits of background jobs, e.g. chat=2,coding=1,auto=2",
+    )
+    parser.add_argument(
+        "--max_running_jobs",
+        type=int,
+        default=None,
+        help="Maximum number of background jobs running at the same time (default: 4)",
+    )
+    parser.add_argument(
+        "--max_queued_jobs",
+        type=int,
+        default=None,
+        help="Maximum number of waiting jobs per kind before requests are rejected with 429 (default: 16)",
+    )
+    parser.add_argument(
+        "--retention",
+        type=str,
+        default="",
+        help="Retention of event files, tasks, uploads and index status, e.g. "
+             "events.max_age_days=7,events.max_total_mb=512,uploads.max_count=none,compress_after=1800,interval=3600",
+    )
+    parser.add_argument(
+        "--record_terminals",
+        action="store_true",
+        help="Record all terminal sessions in asciicast v2 format to .auto-coder/auto-coder.web/terminal-recordings",
+    )
     args = parser.parse_args()
 
     # Handle lite/pro flags
@@ -288,7 +357,15 @@ def main():
     elif args.pro:
         args.product_mode = "pro"
 
-    proxy_server = ProxyServer(quick=args.quick, project_path=os.getcwd(), product_mode=args.product_mode)
+    job_scheduler.configure(
+        limits=parse_job_limits(args.job_limits),
+        max_running=args.max_running_jobs,
+        max_queued=args.max_queued_jobs,
+    )
+
+    proxy_server = ProxyServer(quick=args.quick, project_path=os.getcwd(), product_mode=args.product_mode,
+                               retention_policy=parse_retention_policy(args.retention),
+                               record_terminals=args.record_terminals)
     uvicorn.run(proxy_server.app, host=args.host, port=args.port)
 
 
@@ -0,0 +1,371 @@
+"""
+Retention janitor for event files and web artifacts.
+
+Without cleanup ``.auto-coder/events`` and ``.auto-coder/auto-coder.web``
+(task JSONs, uploads, index status) grow forever. ``RetentionJanitor``
+periodically:
+
+* compresses event files that have been idle for ``compress_after`` seconds
+  into ``<id>.jsonl.gz``; ``event_tail`` reads archives transparently, so the
+  replay endpoints keep working
+* deletes the oldest files of each category beyond its ``RetentionRule``
+  (maximum age, count and total size)
+* removes stale ``.tmp`` files left behind by interrupted atomic writes
+
+The diff cache (``.auto-coder/cache/diffs``) is trimmed the same way under
+the ``diffs`` category; entries can always be recomputed.
+
+Files belonging to queued or running jobs (their event file, their task file
+and the index status while an index build runs) are never touched.
+"""
+import asyncio
+import glob
+import gzip
+import os
+import shutil
+import threading
+import time
+from dataclasses import dataclass, field, asdict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from loguru import logger
+
+from auto_coder_web.diff_cache import DISK_SUFFIX as DIFF_CACHE_SUFFIX
+from auto_coder_web.event_tail import ARCHIVE_SUFFIX
+from auto_coder_web.job_scheduler import job_scheduler
+
+CATEGORIES = ("events", "tasks", "uploads", "index_status", "diffs")
+# gzip records the uncompressed size modulo 2**32, which event_tail relies on
+MAX_ARCHIVE_SOURCE_SIZE = 2 ** 32 - 1
+STALE_TMP_AGE = 3600
+# Shared default event file of the auto-coder CLI, never compressed or deleted
+DEFAULT_EVENT_FILE = "events.jsonl"
+
+
+@dataclass
+class RetentionRule:
+    """Limits of one file category, None disables a limit"""
+    max_age_days: Optional[float] = None
+    max_count: Optional[int] = None
+    max_total_mb: Optional[float] = None
+
+
+@dataclass
+class RetentionPolicy:
+    events: RetentionRule = field(default_factory=lambda: RetentionRule(30, 2000, 1024))
+    tasks: RetentionRule = field(default_factory=lambda: RetentionRule(180, 5000, None))
+    uploads: RetentionRule = field(default_factory=lambda: RetentionRule(90, None, 1024))
+    index_status: RetentionRule = field(default_factory=lambda: RetentionRule(30, None, None))
+    diffs: RetentionRule = field(default_factory=lambda: RetentionRule(30, None, 256))
+    # Idle time in seconds before an event file is compressed, None disables compression
+    compress_after: Optional[float] = 3600
+    # Seconds between two sweeps, 0 disables the background janitor
+    interval: float = 6 * 3600
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def parse_retention_policy(spec: str) -> RetentionPolicy:
+    """
+    Parse retention overrides like ``events.max_age_days=7,uploads.max_total_mb=256,interval=3600``.
+
+    A value of ``none`` disables a limit.
+    """
+    policy = RetentionPolicy()
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        key, _, value = item.partition("=")
+        key, value = key.strip(), value.strip()
+        parsed = None if value.lower() == "none" else float(value)
+        if "." in key:
+            category, _, name = key.partition(".")
+            rule = getattr(policy, category, None) if category in CATEGORIES else None
+            if rule is None or not hasattr(rule, name):
+                raise ValueError(f"Unknown retention setting: {key}")
+            if name == "max_count" and parsed is not None:
+                parsed = int(parsed)
+            setattr(rule, name, parsed)
+        elif key in ("compress_after", "interval"):
+            setattr(policy, key, parsed if key == "compress_after" else (parsed or 0))
+        else:
+            raise ValueError(f"Unknown retention setting: {key}")
+    return policy
+
+
+@dataclass
+class CategoryReport:
+    scanned: int = 0
+    deleted: int = 0
+    compressed: int = 0
+    skipped_active: int = 0
+    reclaimed_bytes: int = 0
+    remaining_bytes: int = 0
+    errors: int = 0
+
+
+@dataclass
+class RetentionReport:
+    started_at: float
+    dry_run: bool
+    duration: float = 0.0
+    categories: Dict[str, CategoryReport] = field(default_factory=dict)
+
+    @property
+    def reclaimed_bytes(self) -> int:
+        return sum(report.reclaimed_bytes for report in self.categories.values())
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["reclaimed_bytes"] = self.reclaimed_bytes
+        return data
+
+
+# (path, size, mtime)
+FileInfo = Tuple[str, int, float]
+
+
+def _stat_files(paths: List[str]) -> List[FileInfo]:
+    files = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        if os.path.isfile(path):
+            files.append((path, stat.st_size, stat.st_mtime))
+    return files
+
+
+def select_expired(files: List[FileInfo], rule: RetentionRule, now: float,
+                   kept: List[FileInfo] = ()) -> List[FileInfo]:
+    """
+    Files to delete under ``rule``, keeping the newest ones.
+
+    Args:
+        files: Candidate files
+        rule: Limits of the category
+        now: Current time
+        kept: Files that are always kept but count towards the limits
+
+    Returns:
+        The expired files
+    """
+    count = len(kept)
+    total = sum(size for _, size, _ in kept)
+    max_bytes = None if rule.max_total_mb is None else rule.max_total_mb * 1024 * 1024
+    expired = []
+    for info in sorted(files, key=lambda info: info[2], reverse=True):
+        _, size, mtime = info
+        if ((rule.max_age_days is not None and now - mtime > rule.max_age_days * 86400)
+                or (rule.max_count is not None and count >= rule.max_count)
+                or (max_bytes is not None and total + size > max_bytes)):
+            expired.append(info)
+            continue
+        count += 1
+        total += size
+    return expired
+
+
+class RetentionJanitor:
+    """Applies a RetentionPolicy to one project"""
+
+    def __init__(self, project_path: str, policy: Optional[RetentionPolicy] = None):
+        self.project_path = project_path
+        self.policy = policy or RetentionPolicy()
+        self.events_dir = os.path.join(project_path, ".auto-coder", "events")
+        self.web_dir = os.path.join(project_path, ".auto-coder", "auto-coder.web")
+        self.diffs_dir = os.path.join(project_path, ".auto-coder", "cache", "diffs")
+        self.last_report: Optional[RetentionReport] = None
+        self._sweep_lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def _protected(self) -> Tuple[Set[str], Set[str], bool]:
+        """Event files and job ids of active jobs, and whether an index build is active"""
+        event_files, job_ids, indexing = set(), set(), False
+        for job in job_scheduler.active_jobs():
+            job_ids.add(job.job_id)
+            if job.event_file:
+                event_files.add(os.path.abspath(job.event_file))
+            if job.kind == "index":
+                indexing = True
+        return event_files, job_ids, indexing
+
+    def sweep(self, dry_run: bool = False) -> RetentionReport:
+        """
+        Run one compaction and retention pass.
+
+        Args:
+            dry_run: Only report what would be compressed or deleted
+
+        Returns:
+            What was (or would be) reclaimed per category
+        """
+        with self._sweep_lock:
+            now = time.time()
+            report = RetentionReport(started_at=now, dry_run=dry_run)
+            active_event_files, active_job_ids, indexing = self._protected()
+
+            report.categories["events"] = self._sweep_events(now, dry_run, active_event_files)
+
+            task_files = glob.glob(os.path.join(self.web_dir, "tasks", "*.json"))
+            report.categories["tasks"] = self._apply_rule(
+                task_files, self.policy.tasks, now, dry_run,
+                lambda path: os.path.basename(path)[:-len(".json")] in active_job_ids)
+
+            upload_files = glob.glob(os.path.join(self.web_dir, "uploads", "*"))
+            report.categories["uploads"] = self._apply_rule(
+                upload_files, self.policy.uploads, now, dry_run, lambda path: False)
+
+            status_files = glob.glob(os.path.join(self.web_dir, "index-status*.json"))
+            report.categories["index_status"] = self._apply_rule(
+                status_files, self.policy.index_status, now, dry_run, lambda path: indexing)
+
+            diff_files = glob.glob(os.path.join(self.diffs_dir, "*", "*" + DIFF_CACHE_SUFFIX))
+            report.categories["diffs"] = self._apply_rule(
+                diff_files, self.policy.diffs, now, dry_run, lambda path: False)
+
+            # Leftovers of interrupted atomic writes (task files, task index, archives)
+            self._remove_stale_tmp(self.events_dir, now, dry_run, report.categories["events"])
+            for directory in (os.path.join(self.web_dir, "tasks"), self.web_dir):
+                self._remove_stale_tmp(directory, now, dry_run, report.categories["tasks"])
+            for directory in glob.glob(os.path.join(self.diffs_dir, "*")):
+                self._remove_stale_tmp(directory, now, dry_run, report.categories["diffs"])
+
+            report.duration = time.time() - now
+            self.last_report = report
+            if report.reclaimed_bytes or any(c.deleted or c.compressed for c in report.categories.values()):
+                logger.info(f"Retention sweep {'(dry run) ' if dry_run else ''}reclaimed "
+                            f"{report.reclaimed_bytes} bytes in {report.duration:.2f}s: "
+                            + ", ".join(f"{name}: -{c.deleted} files, {c.compressed} compressed"
+                                        for name, c in report.categories.items()))
+            return report
+
+    def _sweep_events(self, now: float, dry_run: bool, active_event_files: Set[str]) -> CategoryReport:
+        category = CategoryReport()
+        patterns = ("*.jsonl", "*.jsonl" + ARCHIVE_SUFFIX)
+        paths = [path for pattern in patterns for path in glob.glob(os.path.join(self.events_dir, pattern))
+                 if os.path.basename(path) != DEFAULT_EVENT_FILE]
+
+        def is_active(path: str) -> bool:
+            if path.endswith(ARCHIVE_SUFFIX):
+                path = path[:-len(ARCHIVE_SUFFIX)]
+            return os.path.abspath(path) in active_event_files
+
+        files = []
+        for info in _stat_files(paths):
+            category.scanned += 1
+            path, size, mtime = info
+            if is_active(path):
+                category.skipped_active += 1
+                continue
+            if (self.policy.compress_after is not None and not path.endswith(ARCHIVE_SUFFIX)
+                    and now - mtime > self.policy.compress_after):
+                compressed = self._compress_event_file(info, dry_run, category)
+                if compressed is not None:
+                    info = compressed
+            files.append(info)
+
+        kept = [info for info in _stat_files(paths) if is_active(info[0])]
+        expired = select_expired(files, self.policy.events, now, kept)
+        self._delete(expired, dry_run, category)
+        deleted = {path for path, _, _ in expired}
+        category.remaining_bytes = sum(size for path, size, _ in files + kept if path not in deleted)
+        return category
+
+    def _compress_event_file(self, info: FileInfo, dry_run: bool,
+                             category: CategoryReport) -> Optional[FileInfo]:
+        """gzip an idle event file, returns the archive's FileInfo"""
+        path, size, mtime = info
+        archive = path + ARCHIVE_SUFFIX
+        if size == 0 or size > MAX_ARCHIVE_SOURCE_SIZE:
+            return None
+        if os.path.exists(archive):
+            # Written to again after it was archived; readers prefer the plain file
+            logger.warning(f"Event file {path} exists next to its archive, leaving both")
+            return None
+        if dry_run:
+            category.compressed += 1
+            return None
+
+        tmp_file = archive + ".tmp"
+        try:
+            with open(path, "rb") as src, gzip.open(tmp_file, "wb", compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            if os.stat(path).st_mtime != mtime:
+                # Appended to while compressing, try again next sweep
+                os.remove(tmp_file)
+                return None
+            # Keep the original mtime so age based retention still applies
+            os.utime(tmp_file, (mtime, mtime))
+            os.replace(tmp_file, archive)
+            os.remove(path)
+        except OSError as e:
+            logger.error(f"Error compressing event file {path}: {str(e)}")
+            category.errors += 1
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            return None
+
+        archived_size = os.path.getsize(archive)
+        category.compressed += 1
+        category.reclaimed_bytes += size - archived_size
+        return archive, archived_size, mtime
+
+    def _apply_rule(self, paths: List[str], rule: RetentionRule, now: float, dry_run: bool,
+                    is_protected) -> CategoryReport:
+        category = CategoryReport()
+        files, kept = [], []
+        for info in _stat_files(paths):
+            category.scanned += 1
+            if is_protected(info[0]):
+                category.skipped_active += 1
+                kept.append(info)
+            else:
+                files.append(info)
+        expired = select_expired(files, rule, now, kept)
+        self._delete(expired, dry_run, category)
+        deleted = {path for path, _, _ in expired}
+        category.remaining_bytes = sum(size for path, size, _ in files + kept if path not in deleted)
+        return category
+
+    def _delete(self, files: List[FileInfo], dry_run: bool, category: CategoryReport):
+        for path, size, _ in files:
+            if not dry_run:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    continue
+                except OSError as e:
+                    logger.error(f"Error deleting {path}: {str(e)}")
+                    category.errors += 1
+                    continue
+            category.deleted += 1
+            category.reclaimed_bytes += size
+
+    def _remove_stale_tmp(self, directory: str, now: float, dry_run: bool, category: CategoryReport):
+        stale = [info for info in _stat_files(glob.glob(os.path.join(directory, "*.tmp")))
+                 if now - info[2] > STALE_TMP_AGE]
+        self._delete(stale, dry_run, category)
+
+    async def _run_periodically(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.sweep)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Retention sweep failed: {str(e)}")
+            await asyncio.sleep(self.policy.interval)
+
+    def start(self):
+        """Start the periodic sweep on the running event loop"""
+        if self._task is None and self.policy.interval > 0:
+            self._task = asyncio.get_running_loop().create_task(self._run_periodically())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
@@ -0,0 +1,134 @@
+"""
+Persistent index of revert commits for the history endpoints.
+
+A revert commit created by ``/api/commits/{hash}/revert`` has the message
+``<revert>original message\\n<original sha>``. ``RevertIndex`` maps each
+original SHA to the SHA of the commit that reverted it, for the whole
+history of HEAD, and stores the map with the HEAD it was computed for in
+``.auto-coder/cache/revert-map.json``.
+
+When HEAD moves forward only the new commits (``<head> --not <indexed head>``)
+are scanned. If HEAD was rewritten or another branch was checked out, the
+map is rebuilt from scratch. Both scans let ``git log --grep`` filter the
+commits, so Python only sees the revert commits themselves.
+"""
+import json
+import os
+import subprocess
+import threading
+from typing import Dict, List, Optional
+
+from git import GitCommandError
+from loguru import logger
+
+REVERT_PREFIX = "<revert>"
+_RECORD_SEP = "\x1e"
+_FIELD_SEP = "\x00"
+_REVERT_LOG_FORMAT = "%H%x00%B%x1e"
+
+
+def parse_revert_log(output: str) -> Dict[str, str]:
+    """Parse ``git log --format=%H%x00%B%x1e`` output into original SHA -> revert SHA"""
+    reverts = {}
+    for record in output.split(_RECORD_SEP):
+        sha, _, message = record.strip().partition(_FIELD_SEP)
+        message = message.strip()
+        if not sha or not message.startswith(REVERT_PREFIX):
+            continue
+        # <revert>原始消息\n原始提交哈希
+        lines = message.split("\n")
+        if len(lines) > 1:
+            reverts.setdefault(lines[-1].strip(), sha)
+    return reverts
+
+
+class RevertIndex:
+    """Original commit -> revert commit map of one repository"""
+
+    def __init__(self, project_path: str):
+        self.project_path = project_path
+        self.index_file = os.path.join(project_path, ".auto-coder", "cache", "revert-map.json")
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._head: Optional[str] = None
+        self._reverts: Dict[str, str] = {}
+
+    def _git(self, args: List[str]) -> subprocess.CompletedProcess:
+        return subprocess.run(
+            ["git", *args], cwd=self.project_path,
+            capture_output=True, encoding="utf-8", errors="replace",
+        )
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if not os.path.exists(self.index_file):
+            return
+        try:
+            with open(self.index_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self._head = data.get("head")
+            self._reverts = dict(data.get("reverts", {}))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read revert index {self.index_file}: {str(e)}")
+
+    def _persist(self):
+        tmp_file = self.index_file + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.index_file), exist_ok=True)
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump({"head": self._head, "reverts": self._reverts}, f)
+            os.replace(tmp_file, self.index_file)
+        except OSError as e:
+            logger.warning(f"Could not write revert index {self.index_file}: {str(e)}")
+
+    def _scan(self, revisions: List[str]) -> Dict[str, str]:
+        args = ["log", f"--grep=^{REVERT_PREFIX}", f"--format={_REVERT_LOG_FORMAT}", *revisions]
+        result = self._git(args)
+        if result.returncode != 0:
+            raise GitCommandError(["git", *args], result.returncode, result.stderr)
+        return parse_revert_log(result.stdout)
+
+    def get_reverts(self) -> Dict[str, str]:
+        """
+        Revert map of the current HEAD, brought up to date first
+
+        Returns:
+            原提交SHA -> 撤销它的提交SHA
+        """
+        with self._lock:
+            self._ensure_loaded()
+            result = self._git(["rev-parse", "--verify", "--quiet", "HEAD"])
+            head = result.stdout.strip() if result.returncode == 0 else None
+            if head is None:
+                # 还没有任何提交
+                return {}
+            if head == self._head:
+                return dict(self._reverts)
+
+            incremental = self._head is not None and self._git(
+                ["merge-base", "--is-ancestor", self._head, head]).returncode == 0
+            if incremental:
+                # HEAD 只是向前移动，只扫描新提交；较新的撤销覆盖较旧的
+                self._reverts.update(self._scan([head, "--not", self._head]))
+            else:
+                # 首次建立索引，或历史被改写、切换了分支
+                logger.info(f"Building revert index for {head[:7]}")
+                self._reverts = self._scan([head])
+            self._head = head
+            self._persist()
+            return dict(self._reverts)
+
+
+_indexes: Dict[str, RevertIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_revert_index(project_path: str) -> RevertIndex:
+    """The shared revert index of a project"""
+    with _indexes_lock:
+        index = _indexes.get(project_path)
+        if index is None:
+            index = _indexes[project_path] = RevertIndex(project_path)
+        return index
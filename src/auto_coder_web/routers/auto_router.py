@@ -2,13 +2,13 @@ import asyncio
 import json
 import os
 from contextlib import contextmanager
-from threading import Thread
-from concurrent.futures import ThreadPoolExecutor
-from fastapi import APIRouter, HTTPException, Request, Depends
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, HTTPException, Request, Depends, Query
 from pydantic import BaseModel
 from typing import Dict, Any, Optional, List
 from auto_coder_web.auto_coder_runner_wrapper import AutoCoderRunnerWrapper
+from auto_coder_web.job_scheduler import job_scheduler, is_queue_status_message
+from auto_coder_web.event_tail import event_tail_service, resolve_resume_offset
+from auto_coder_web.sse_stream import SSEEventStream
 from autocoder.events.event_manager_singleton import get_event_manager,gengerate_event_file_path,get_event_file_path
 from autocoder.events import event_content as EventContentCreator
 from autocoder.events.event_types import EventType
@@ -20,12 +20,11 @@ import byzerllm
 # 导入聊天会话和聊天列表管理器
 from auto_coder_web.common_router.chat_session_manager import read_session_name_sync
 from auto_coder_web.common_router.chat_list_manager import get_chat_list_sync
+from auto_coder_web.history_window import build_history_window, get_history_token_budget
+from auto_coder_web.task_history_store import get_task_history_store, get_history_page, InvalidTaskIdError, ALL_TYPES
 
 router = APIRouter()
 
-# 创建线程池
-cancel_thread_pool = ThreadPoolExecutor(max_workers=5)
-
 class AutoCommandRequest(BaseModel):
     command: str
     include_conversation_history: bool = True
@@ -61,12 +60,6 @@ async def get_project_path(request: Request) -> str:
     return request.app.state.project_path
 
 
-def ensure_task_dir(project_path: str) -> str:
-    """确保任务历史目录存在"""
-    task_dir = os.path.join(project_path, ".auto-coder", "auto-coder.web", "tasks")
-    os.makedirs(task_dir, exist_ok=True)
-    return task_dir
-
 @byzerllm.prompt()
 def coding_prompt(messages: List[Dict[str, Any]], query: str):
     '''        
@@ -145,11 +138,21 @@ async def auto_command(request: AutoCommandRequest, project_path: str = Depends(
                             #     continue     
                             if msg.get("contentType","") in ["token_stat"]:
                                 continue                                                                
+                            # 排队位置更新只是状态提示，不属于对话内容
+                            if is_queue_status_message(msg):
+                                continue
                             messages.append(msg)
                     except Exception as e:                                                       
                         logger.error(f"Error reading chat history: {str(e)}")
                         logger.exception(e) 
                                                 
+                # 按token预算选取最新的历史消息，避免提示词无限增长
+                if messages:
+                    history_window = build_history_window(
+                        messages, get_history_token_budget(wrapper.get_conf_wrapper()))
+                    logger.info(f"History window for {file_id}: {history_window.to_dict()}")
+                    messages = history_window.messages
+
                 if messages:
                     # 调用coding_prompt生成包含历史消息的提示
                     prompt_text = coding_prompt.prompt(messages, request.command)                                    
@@ -171,38 +174,34 @@ async def auto_command(request: AutoCommandRequest, project_path: str = Depends(
                 EventContentCreator.create_error(error_code="500", error_message=str(e), details={}).to_dict()
             )
     
-    # 创建并启动线程
-    thread = Thread(target=run_command_in_thread)
-    thread.daemon = True  # 设置为守护线程，这样当主程序退出时，线程也会退出
-    thread.start()
+    # 交给任务调度器执行，超出并发上限时排队，队列已满时返回429
+    job_scheduler.submit("auto", run_command_in_thread, event_file=event_file, job_id=file_id,
+                         panel_id=request.panel_id)
     
-    logger.info(f"Started command {file_id} in background thread")
+    logger.info(f"Submitted command {file_id} to job scheduler")
     return {"event_file_id": file_id}
 
 
 @router.get("/api/auto-command/events")
-async def poll_auto_command_events(event_file_id: str, project_path: str = Depends(get_project_path)):
+async def poll_auto_command_events(event_file_id: str, request: Request, last_event_id: Optional[str] = None,
+                                   batch: bool = False, compress: bool = False,
+                                   project_path: str = Depends(get_project_path)):
+    # batch=true时每个SSE帧的data为事件数组；compress=true且客户端支持时使用gzip
+    stream = SSEEventStream(request, f"auto:{event_file_id}", batch=batch, compress=compress)
+
     async def event_stream():
-        event_file = get_event_file_path(event_file_id,project_path)
-        event_manager = get_event_manager(event_file)           
-        while True:                                 
-            try:                
-                events = await asyncio.to_thread(event_manager.read_events, block=False)                
-                
-                if not events:
-                    await asyncio.sleep(0.1)  # 减少休眠时间，更频繁地检查
-                    continue    
-                
-                current_event = None                
-                for event in events:
-                    current_event = event
-                    # Convert event to JSON string
-                    event_json = event.to_json()
-                    # Format as SSE
-                    yield f"data: {event_json}\n\n"                    
-                    
-                # 防止current_event为None导致的错误
-                if current_event is not None:
+        event_file = get_event_file_path(event_file_id, project_path)
+        # 同一事件文件的多个订阅者共享一个读取器，由文件变更推送唤醒
+        # 断线重连时从Last-Event-ID（事件结束处的字节偏移）继续，EventSource无法自定义header时可用last_event_id参数
+        offset = resolve_resume_offset(event_file, request.headers.get("last-event-id") or last_event_id)
+        async with event_tail_service.subscribe(event_file, offset) as subscription:
+            try:
+                # 高频输出时短暂等待，把几毫秒内到达的事件合并为一次写出
+                async for batch_events in subscription.batches(coalesce=stream.coalesce):
+                    # Format as SSE, the ids let the client resume after the last event
+                    yield stream.frame(batch_events)
+                    current_event = batch_events[-1][1]
+
                     if current_event.event_type == EventType.ERROR:
                         logger.info("Breaking loop due to ERROR event")
                         break
@@ -212,20 +211,9 @@ async def poll_auto_command_events(event_file_id: str, project_path: str = Depen
                         break
             except Exception as e:
                 logger.error(f"Error in SSE stream: {str(e)}")
-                yield f"data: {{\"error\": \"{str(e)}\"}}\n\n"                
-                break
-
-    return StreamingResponse(
-        event_stream(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache, no-transform",
-            "Connection": "keep-alive",
-            "Content-Type": "text/event-stream",
-            "X-Accel-Buffering": "no",
-            "Transfer-Encoding": "chunked",
-        },
-    )
+                yield f"data: {{\"error\": \"{str(e)}\"}}\n\n"
+
+    return stream.response(event_stream())
 
 
 @router.post("/api/auto-command/response")
@@ -282,13 +270,11 @@ async def save_task_history(request: TaskHistoryRequest, project_path: str = Dep
         保存结果
     """
     try:
-        task_dir = ensure_task_dir(project_path)
-        task_file = os.path.join(task_dir, f"{request.event_file_id}.json")
         task_data = request.model_dump()
         
-        # 写入文件
-        with open(task_file, 'w', encoding='utf-8') as f:
-            json.dump(task_data, f, ensure_ascii=False, indent=2)
+        # 写入任务文件并更新历史索引
+        store = get_task_history_store(project_path)
+        await asyncio.to_thread(store.save, request.event_file_id, task_data)
         
         return {
             "status": "success",
@@ -302,41 +288,27 @@ async def save_task_history(request: TaskHistoryRequest, project_path: str = Dep
 
 
 @router.get("/api/auto-command/history")
-async def get_task_history(project_path: str = Depends(get_project_path)):
+async def get_task_history(limit: Optional[int] = Query(None, ge=1), before: Optional[int] = None,
+                           before_id: Optional[str] = None,
+                           project_path: str = Depends(get_project_path)):
     """
     获取任务历史列表
 
-    从本地文件系统读取所有保存的任务历史，返回原始JSON文件内容
+    按时间倒序返回。传入limit时从历史索引分页返回摘要（不含消息），
+    完整消息通过任务详情接口获取；不传limit时返回完整的原始JSON数据（兼容旧版前端）
 
     Args:
+        limit: 每页条数
+        before: 只返回timestamp小于该值的任务，取上一页返回的next_before
+        before_id: 取上一页返回的next_before_id，与before一起定位游标，时间戳相同的任务不会被跳过
         project_path: 项目路径
 
     Returns:
-        任务历史列表，包含完整的原始数据
+        任务历史列表，分页时还包含has_more、next_before和next_before_id
     """
     try:
-        task_dir = ensure_task_dir(project_path)
-        task_files = []
-        
-        # 扫描目录下所有json文件
-        for filename in os.listdir(task_dir):
-            if filename.endswith('.json'):
-                file_path = os.path.join(task_dir, filename)
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        task_data = json.load(f)
-                        # 只添加文件名作为ID (不含扩展名)
-                        task_id = os.path.splitext(filename)[0]
-                        # 返回完整的原始数据，只添加ID
-                        task_data["id"] = task_id
-                        task_files.append(task_data)
-                except Exception as e:
-                    logger.error(f"Error reading task file {filename}: {str(e)}")
-        
-        # 按时间戳排序，最新的在前
-        task_files.sort(key=lambda x: x.get("timestamp", 0), reverse=True)
-        
-        return {"tasks": task_files}
+        return await asyncio.to_thread(get_history_page, project_path, ALL_TYPES, limit, before,
+                                       before_id=before_id, with_id=True)
     except Exception as e:
         logger.error(f"Error getting task history: {str(e)}")
         raise HTTPException(
@@ -356,16 +328,13 @@ async def get_task_detail(task_id: str, project_path: str = Depends(get_project_
         任务详细信息
     """
     try:
-        task_dir = ensure_task_dir(project_path)
-        task_file = os.path.join(task_dir, f"{task_id}.json")
-        
-        if not os.path.exists(task_file):
+        task_data = await asyncio.to_thread(get_task_history_store(project_path).get, task_id)
+        if task_data is None:
             raise HTTPException(status_code=404, detail=f"Task {task_id} not found")
         
-        with open(task_file, 'r', encoding='utf-8') as f:
-            task_data = json.load(f)
-        
         return task_data
+    except InvalidTaskIdError:
+        raise HTTPException(status_code=400, detail=f"Invalid task id: {task_id}")
     except HTTPException:
         raise
     except Exception as e:
@@ -374,6 +343,48 @@ async def get_task_detail(task_id: str, project_path: str = Depends(get_project_
             status_code=500, detail=f"Failed to get task detail: {str(e)}")
 
 
+def cancel_auto_task(event_file_id: str, project_path: str) -> bool:
+    """
+    取消auto任务：通过任务注册表取消，撤销本次任务的文件修改，再写入取消事件
+
+    供 /api/auto-command/cancel 和 /ws/events 的取消消息使用，需在线程中调用
+
+    Returns:
+        是否成功取消
+    """
+    try:                        
+        # 获取事件文件路径和事件管理器
+        event_file = get_event_file_path(file_id=event_file_id, project_path=project_path)
+        # 通过任务注册表取消，取消事件在撤销修改之后再写入
+        job_scheduler.cancel(event_file_id, event_file)
+        event_manager = get_event_manager(event_file)
+        file_change_manager = FileChangeManager(project_dir=project_path,
+        backup_dir=os.path.join(project_path,".auto-coder","checkpoint"),
+        store_dir=os.path.join(project_path,".auto-coder","checkpoint_store"),
+        max_history=50)
+        undo_result = file_change_manager.undo_change_group(group_id=event_file)
+        if not undo_result.success:
+            logger.error(f"Error in undo change group: {undo_result.errors}")
+            raise Exception(f"Error in undo change group: {undo_result.errors}")
+        else:
+            logger.info(f"Undo change group {event_file} successfully {undo_result.restored_files}")
+        
+        # 向事件流写入取消事件
+        event_manager.write_error(
+            EventContentCreator.create_error(
+                error_code="USER_CANCELLED", 
+                error_message="Task was cancelled by the user",
+                details={"message": "Task was cancelled by the user"}
+            ).to_dict()
+        )
+        
+        logger.info(f"Task {event_file_id} cancelled by user")
+        return True
+    except Exception as e:
+        logger.error(f"Error in cancel thread for task {event_file_id}: {str(e)}")
+        return False
+
+
 @router.post("/api/auto-command/cancel")
 async def cancel_task(request: CancelTaskRequest, project_path: str = Depends(get_project_path)):
     """
@@ -386,50 +397,14 @@ async def cancel_task(request: CancelTaskRequest, project_path: str = Depends(ge
     Returns:
         取消操作的结果
     """
-    # 定义在线程中执行的取消任务函数
-    def cancel_task_thread(event_file_id: str, project_path: str):
-        try:                        
-            # 获取事件文件路径和事件管理器
-            event_file = get_event_file_path(file_id=event_file_id, project_path=project_path)
-            global_cancel.set(token=event_file)
-            event_manager = get_event_manager(event_file)
-            file_change_manager = FileChangeManager(project_dir=project_path,
-            backup_dir=os.path.join(project_path,".auto-coder","checkpoint"),
-            store_dir=os.path.join(project_path,".auto-coder","checkpoint_store"),
-            max_history=50)
-            undo_result = file_change_manager.undo_change_group(group_id=event_file)
-            if not undo_result.success:
-                logger.error(f"Error in undo change group: {undo_result.errors}")
-                raise Exception(f"Error in undo change group: {undo_result.errors}")
-            else:
-                logger.info(f"Undo change group {event_file} successfully {undo_result.restored_files}")
-            
-            # 向事件流写入取消事件
-            event_manager.write_error(
-                EventContentCreator.create_error(
-                    error_code="USER_CANCELLED", 
-                    error_message="Task was cancelled by the user",
-                    details={"message": "Task was cancelled by the user"}
-                ).to_dict()
-            )
-            
-            logger.info(f"Task {event_file_id} cancelled by user")
-            return True
-        except Exception as e:
-            logger.error(f"Error in cancel thread for task {event_file_id}: {str(e)}")
-            return False
-    
     try:
-        # 在线程池中执行取消操作并获取 Future 对象
-        future = cancel_thread_pool.submit(
-            cancel_task_thread, 
-            request.event_file_id, 
+        # 在线程中执行取消操作，避免阻塞事件循环
+        result = await asyncio.to_thread(
+            cancel_auto_task,
+            request.event_file_id,
             project_path
         )
         
-        # 使用 asyncio 来等待线程完成
-        result = await asyncio.to_thread(future.result)
-        
         if result:
             # 线程成功完成
             return {
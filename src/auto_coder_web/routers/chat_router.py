@@ -2,13 +2,13 @@ import asyncio
 import json
 import os
 from contextlib import contextmanager
-from threading import Thread
-from concurrent.futures import ThreadPoolExecutor
-from fastapi import APIRouter, HTTPException, Request, Depends
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, HTTPException, Request, Depends, Query
 from pydantic import BaseModel
 from typing import Dict, Any, Optional, List
 from auto_coder_web.auto_coder_runner_wrapper import AutoCoderRunnerWrapper
+from auto_coder_web.job_scheduler import job_scheduler, PRIORITY_HIGH, is_queue_status_message
+from auto_coder_web.event_tail import event_tail_service, resolve_resume_offset
+from auto_coder_web.sse_stream import SSEEventStream
 from autocoder.events.event_manager_singleton import get_event_manager, gengerate_event_file_path, get_event_file_path
 from autocoder.events import event_content as EventContentCreator
 from autocoder.events.event_types import EventType
@@ -19,12 +19,11 @@ import byzerllm
 # 导入聊天会话和聊天列表管理器
 from auto_coder_web.common_router.chat_session_manager import read_session_name_sync
 from auto_coder_web.common_router.chat_list_manager import get_chat_list_sync
+from auto_coder_web.history_window import build_history_window, get_history_token_budget
+from auto_coder_web.task_history_store import get_task_history_store, get_history_page, InvalidTaskIdError
 
 router = APIRouter()
 
-# 创建线程池
-cancel_thread_pool = ThreadPoolExecutor(max_workers=5)
-
 class ChatCommandRequest(BaseModel):
     command: str
     panel_id: Optional[str] = None
@@ -57,12 +56,6 @@ async def get_project_path(request: Request) -> str:
     """
     return request.app.state.project_path
 
-def ensure_task_dir(project_path: str) -> str:
-    """确保任务历史目录存在"""
-    task_dir = os.path.join(project_path, ".auto-coder", "auto-coder.web", "tasks")
-    os.makedirs(task_dir, exist_ok=True)
-    return task_dir
-
 @byzerllm.prompt()
 def chat_prompt(messages: List[Dict[str, Any]], request: ChatCommandRequest):
     '''
@@ -124,11 +117,21 @@ async def chat_command(request: ChatCommandRequest, project_path: str = Depends(
 
                         if msg.get("contentType","") in ["token_stat"]:
                             continue                            
+                        # 排队位置更新只是状态提示，不属于对话内容
+                        if is_queue_status_message(msg):
+                            continue
                         
                         messages.append(msg)
                 except Exception as e:
                     logger.error(f"Error reading chat history: {str(e)}")
             
+            # 按token预算选取最新的历史消息，避免提示词无限增长
+            if messages:
+                history_window = build_history_window(
+                    messages, get_history_token_budget(wrapper.get_conf_wrapper()))
+                logger.info(f"History window for {file_id}: {history_window.to_dict()}")
+                messages = history_window.messages
+
             # 构建提示信息
             prompt_text = request.command
             if messages:
@@ -150,37 +153,33 @@ async def chat_command(request: ChatCommandRequest, project_path: str = Depends(
                 EventContentCreator.create_error(error_code="500", error_message=str(e), details={}).to_dict()
             )
     
-    # 创建并启动线程
-    thread = Thread(target=run_command_in_thread)
-    thread.daemon = True  # 设置为守护线程，这样当主程序退出时，线程也会退出
-    thread.start()
+    # 交给任务调度器执行，超出并发上限时排队，队列已满时返回429
+    job_scheduler.submit("chat", run_command_in_thread, event_file=event_file, job_id=file_id,
+                         panel_id=request.panel_id)
     
-    logger.info(f"Started chat command {file_id} in background thread")
+    logger.info(f"Submitted chat command {file_id} to job scheduler")
     return {"event_file_id": file_id}
 
 @router.get("/api/chat-command/events")
-async def poll_chat_command_events(event_file_id: str, project_path: str = Depends(get_project_path)):
+async def poll_chat_command_events(event_file_id: str, request: Request, last_event_id: Optional[str] = None,
+                                   batch: bool = False, compress: bool = False,
+                                   project_path: str = Depends(get_project_path)):
+    # batch=true时每个SSE帧的data为事件数组；compress=true且客户端支持时使用gzip
+    stream = SSEEventStream(request, f"chat:{event_file_id}", batch=batch, compress=compress)
+
     async def event_stream():
         event_file = get_event_file_path(event_file_id, project_path)
-        event_manager = get_event_manager(event_file)           
-        while True:                                 
-            try:                
-                events = await asyncio.to_thread(event_manager.read_events, block=False)                
-                
-                if not events:
-                    await asyncio.sleep(0.1)  # 减少休眠时间，更频繁地检查
-                    continue    
-                
-                current_event = None                
-                for event in events:
-                    current_event = event
-                    # Convert event to JSON string
-                    event_json = event.to_json()
-                    # Format as SSE
-                    yield f"data: {event_json}\n\n"                    
-                    
-                # 防止current_event为None导致的错误
-                if current_event is not None:
+        # 同一事件文件的多个订阅者共享一个读取器，由文件变更推送唤醒
+        # 断线重连时从Last-Event-ID（事件结束处的字节偏移）继续，EventSource无法自定义header时可用last_event_id参数
+        offset = resolve_resume_offset(event_file, request.headers.get("last-event-id") or last_event_id)
+        async with event_tail_service.subscribe(event_file, offset) as subscription:
+            try:
+                # 高频输出时短暂等待，把几毫秒内到达的事件合并为一次写出
+                async for batch_events in subscription.batches(coalesce=stream.coalesce):
+                    # Format as SSE, the ids let the client resume after the last event
+                    yield stream.frame(batch_events)
+                    current_event = batch_events[-1][1]
+
                     if current_event.event_type == EventType.ERROR:
                         logger.info("Breaking loop due to ERROR event")
                         break
@@ -190,20 +189,9 @@ async def poll_chat_command_events(event_file_id: str, project_path: str = Depen
                         break
             except Exception as e:
                 logger.error(f"Error in SSE stream: {str(e)}")
-                yield f"data: {{\"error\": \"{str(e)}\"}}\n\n"                
-                break
-
-    return StreamingResponse(
-        event_stream(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache, no-transform",
-            "Connection": "keep-alive",
-            "Content-Type": "text/event-stream",
-            "X-Accel-Buffering": "no",
-            "Transfer-Encoding": "chunked",
-        },
-    )
+                yield f"data: {{\"error\": \"{str(e)}\"}}\n\n"
+
+    return stream.response(event_stream())
 
 @router.post("/api/chat-command/response")
 async def response_user(request: UserResponseRequest, project_path: str = Depends(get_project_path)):
@@ -254,9 +242,6 @@ async def save_task_history(request: TaskHistoryRequest, project_path: str = Dep
         保存结果
     """
     try:
-        task_dir = ensure_task_dir(project_path)
-        task_file = os.path.join(task_dir, f"{request.event_file_id}.json")
-        
         # 过滤掉系统消息和空消息
         filtered_messages = []
         for msg in request.messages:
@@ -266,6 +251,9 @@ async def save_task_history(request: TaskHistoryRequest, project_path: str = Dep
             # 跳过token统计消息
             if msg.get("type") == "TOKEN_STAT":
                 continue
+            # 跳过排队状态消息
+            if is_queue_status_message(msg):
+                continue
             filtered_messages.append(msg)
             
         task_data = {
@@ -277,8 +265,9 @@ async def save_task_history(request: TaskHistoryRequest, project_path: str = Dep
             "type": "chat"  # 添加类型标识
         }
         
-        with open(task_file, "w", encoding="utf-8") as f:
-            json.dump(task_data, f, ensure_ascii=False, indent=2)
+        # 写入任务文件并更新历史索引
+        store = get_task_history_store(project_path)
+        await asyncio.to_thread(store.save, request.event_file_id, task_data)
             
         return {"status": "success", "message": "Task history saved successfully"}
     except Exception as e:
@@ -287,43 +276,33 @@ async def save_task_history(request: TaskHistoryRequest, project_path: str = Dep
             status_code=500, detail=f"Failed to save task history: {str(e)}")
 
 @router.get("/api/chat-command/history")
-async def get_task_history(project_path: str = Depends(get_project_path)):
+async def get_task_history(limit: Optional[int] = Query(None, ge=1), before: Optional[int] = None,
+                           before_id: Optional[str] = None,
+                           project_path: str = Depends(get_project_path)):
     """
     获取任务历史列表
 
-    从本地文件系统读取所有保存的任务历史，返回原始JSON文件内容
+    只包含类型为chat的任务，按时间倒序返回。传入limit时从历史索引分页返回摘要（不含消息），
+    完整消息通过任务详情接口获取；不传limit时返回完整的原始JSON数据（兼容旧版前端）
 
     Args:
+        limit: 每页条数
+        before: 只返回timestamp小于该值的任务，取上一页返回的next_before
+        before_id: 取上一页返回的next_before_id，与before一起定位游标，时间戳相同的任务不会被跳过
         project_path: 项目路径
 
     Returns:
-        任务历史列表，包含完整的原始数据
+        任务历史列表，分页时还包含has_more、next_before和next_before_id
     """
     try:
-        task_dir = ensure_task_dir(project_path)
-        task_files = [f for f in os.listdir(task_dir) if f.endswith(".json")]
-        
-        tasks = []
-        for file_name in task_files:
-            file_path = os.path.join(task_dir, file_name)
-            try:
-                with open(file_path, "r", encoding="utf-8") as f:
-                    task_data = json.load(f)
-                    # 只包含类型为chat的任务
-                    if task_data.get("type") == "chat":
-                        tasks.append(task_data)
-            except Exception as e:
-                logger.error(f"Error reading task file {file_name}: {str(e)}")
-                
-        # 按时间戳排序，最新的在前面
-        tasks.sort(key=lambda x: x.get("timestamp", 0), reverse=True)
-        
-        return {"tasks": tasks}
+        return await asyncio.to_thread(get_history_page, project_path, "chat", limit, before,
+                                       before_id=before_id)
     except Exception as e:
         logger.error(f"Error getting task history: {str(e)}")
         raise HTTPException(
             status_code=500, detail=f"Failed to get task history: {str(e)}")
 
+
 @router.get("/api/chat-command/task/{task_id}")
 async def get_task_detail(task_id: str, project_path: str = Depends(get_project_path)):
     """
@@ -337,16 +316,13 @@ async def get_task_detail(task_id: str, project_path: str = Depends(get_project_
         任务详细信息
     """
     try:
-        task_dir = ensure_task_dir(project_path)
-        task_file = os.path.join(task_dir, f"{task_id}.json")
-        
-        if not os.path.exists(task_file):
+        task_data = await asyncio.to_thread(get_task_history_store(project_path).get, task_id)
+        if task_data is None:
             raise HTTPException(status_code=404, detail="Task not found")
-            
-        with open(task_file, "r", encoding="utf-8") as f:
-            task_data = json.load(f)
-            
+        
         return task_data
+    except InvalidTaskIdError:
+        raise HTTPException(status_code=400, detail=f"Invalid task id: {task_id}")
     except HTTPException:
         raise
     except Exception as e:
@@ -375,11 +351,7 @@ async def reset_chat(request: ChatResetRequest, project_path: str = Depends(get_
     # 定义在线程中运行的函数
     def run_reset_in_thread():
         try:
-            # 加载tokenizer
-            from autocoder.auto_coder_runner import load_tokenizer
-            load_tokenizer()
-            
-            # 创建AutoCoderRunnerWrapper实例
+            # 创建AutoCoderRunnerWrapper实例（tokenizer已在进程内共享加载）
             wrapper = AutoCoderRunnerWrapper(project_path)
             wrapper.configure_wrapper(f"event_file:{event_file}")
             global_cancel.register_token(event_file)
@@ -400,12 +372,11 @@ async def reset_chat(request: ChatResetRequest, project_path: str = Depends(get_
                 EventContentCreator.create_error(error_code="500", error_message=str(e), details={}).to_dict()
             )
     
-    # 创建并启动线程
-    thread = Thread(target=run_reset_in_thread)
-    thread.daemon = True  # 设置为守护线程
-    thread.start()
+    # 交给任务调度器执行，超出并发上限时排队，队列已满时返回429
+    job_scheduler.submit("reset_chat", run_reset_in_thread, event_file=event_file, job_id=file_id,
+                         priority=PRIORITY_HIGH, panel_id=request.panel_id)
     
-    logger.info(f"Started chat reset {file_id} in background thread")
+    logger.info(f"Submitted chat reset {file_id} to job scheduler")
     return {"event_file_id": file_id, "session_id": request.session_id}
 
 @router.post("/api/chat-command/cancel")
@@ -422,27 +393,14 @@ async def cancel_task(request: CancelTaskRequest, project_path: str = Depends(ge
     """
     try:
         event_file = get_event_file_path(file_id=request.event_file_id, project_path=project_path)
-        
-        def cancel_in_thread():
-            try:                                
-                global_cancel.set(token=event_file)
-                
-                # 获取事件管理器
-                event_manager = get_event_manager(event_file)
-                
-                # 写入取消事件
-                event_manager.write_error(
-                    EventContentCreator.create_error(
-                        error_code="499", error_message="cancelled", details={}).to_dict()
-                )
-                
-                logger.info(f"Task {request.event_file_id} cancelled successfully")
-            except Exception as e:
-                logger.error(f"Error cancelling task: {str(e)}")
-        
-        # 在线程池中执行取消操作
-        cancel_thread_pool.submit(cancel_in_thread)
-        
+
+        # 通过任务注册表取消：排队中的任务移出队列，运行中的任务设置取消标志并写入取消事件
+        await asyncio.to_thread(
+            job_scheduler.cancel, request.event_file_id, event_file,
+            EventContentCreator.create_error(
+                error_code="499", error_message="cancelled", details={}).to_dict())
+        logger.info(f"Task {request.event_file_id} cancelled successfully")
+
         return {"status": "success", "message": "Cancel request sent"}
     except Exception as e:
         logger.error(f"Error sending cancel request: {str(e)}")
@@ -1,7 +1,7 @@
 import os
 import re
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 
 from fastapi import APIRouter, HTTPException, Request, Depends, Query
 from pydantic import BaseModel
@@ -10,9 +10,17 @@ import git
 from git import Repo, GitCommandError
 
 # 导入获取事件和action文件的相关模块
-from autocoder.events.event_manager_singleton import get_event_manager, get_event_file_path
+from autocoder.events.event_manager_singleton import get_event_file_path
 from autocoder.events.event_types import EventType
 from autocoder.common.action_yml_file_manager import ActionYmlFileManager
+from auto_coder_web.action_commits import get_action_commit_index
+from auto_coder_web.commit_cache import CommitMetadataCache, get_commit_metadata_cache
+from auto_coder_web.git_objects import get_object_reader
+from auto_coder_web.diff_cache import cached_response, get_diff_cache
+from auto_coder_web.git_status import get_git_status_model
+from auto_coder_web.git_service import (
+    AmbiguousCommitError, GitService, change_type_from_status, get_git_service, parse_name_status
+)
 
 router = APIRouter()
 
@@ -34,12 +42,53 @@ async def get_project_path(request: Request) -> str:
     return request.app.state.project_path
 
 
+def get_git(project_path: str) -> GitService:
+    """
+    获取项目共享的Git服务，Git操作都通过它在事件循环之外执行
+    """
+    try:
+        return get_git_service(project_path)
+    except (git.NoSuchPathError, git.InvalidGitRepositoryError) as e:
+        logger.error(f"Git repository error: {str(e)}")
+        raise HTTPException(
+            status_code=404, 
+            detail="No Git repository found in the project path"
+        )
+
+
 def get_repo(project_path: str) -> Repo:
     """
-    获取Git仓库对象
+    获取当前线程缓存的Git仓库对象，只在 GitService.call 执行的函数中使用
+    """
+    return get_git(project_path).get_repo()
+
+
+async def resolve_commit(project_path: str, commit_hash: str) -> Tuple[str, Optional[str]]:
+    """
+    解析完整或简短的哈希值（或分支名等），返回 (提交SHA, 第一个父提交SHA)，首次提交的父提交为None
+
+    Raises:
+        HTTPException: 找不到提交时返回404，简短哈希对应多个提交时返回409
+    """
+    service = get_git(project_path)
+    try:
+        commit_sha = await service.resolve_commit(commit_hash)
+    except AmbiguousCommitError as e:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Commit {commit_hash} is ambiguous, candidates: {', '.join(e.candidates)}"
+        )
+    if commit_sha is None:
+        raise HTTPException(status_code=404, detail=f"Commit {commit_hash} not found")
+    return commit_sha, await service.first_parent(commit_sha)
+
+
+def get_commit_cache(project_path: str) -> CommitMetadataCache:
+    """
+    获取项目共享的提交元数据缓存
     """
     try:
-        return Repo(project_path)
+        return get_commit_metadata_cache(project_path)
     except (git.NoSuchPathError, git.InvalidGitRepositoryError) as e:
         logger.error(f"Git repository error: {str(e)}")
         raise HTTPException(
@@ -66,35 +115,14 @@ async def get_commits(
         提交列表
     """
     try:
-        repo = get_repo(project_path)
-        commits = []
-        
-        # 获取提交列表
-        for i, commit in enumerate(repo.iter_commits()):
-            if i < skip:
-                continue
-            if len(commits) >= limit:
-                break
-                
-            # 获取提交统计信息
-            stats = commit.stats.total
-            
-            # 构建提交信息
-            commit_info = {
-                "hash": commit.hexsha,
-                "short_hash": commit.hexsha[:7],
-                "author": f"{commit.author.name} <{commit.author.email}>",
-                "date": datetime.fromtimestamp(commit.committed_date).isoformat(),
-                "message": commit.message.strip(),
-                "stats": {
-                    "insertions": stats["insertions"],
-                    "deletions": stats["deletions"],
-                    "files_changed": stats["files"]
-                }
-            }
-            commits.append(commit_info)
-        
-        return {"commits": commits, "total": len(list(repo.iter_commits()))}
+        cache = get_commit_cache(project_path)
+        service = get_git(project_path)
+        # 元数据按SHA缓存，总数按HEAD缓存，只有未缓存的提交需要一次批量的 git log --numstat
+        commits = await service.call(cache.list_commits, skip, limit)
+        total = await service.call(cache.count_commits)
+        return {"commits": [commit.to_dict() for commit in commits], "total": total}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting commits: {str(e)}")
         raise HTTPException(
@@ -106,10 +134,11 @@ async def get_commits(
 @router.get("/api/commits/{commit_hash}")
 async def get_commit_detail(
     commit_hash: str, 
+    request: Request,
     project_path: str = Depends(get_project_path)
 ):
     """
-    获取特定提交的详细信息
+    获取特定提交的详细信息，结果按 (父提交, 提交) 缓存并带有ETag
 
     Args:
         commit_hash: 提交哈希值
@@ -119,80 +148,16 @@ async def get_commit_detail(
         提交详情
     """
     try:
-        repo = get_repo(project_path)
-        
-        # 尝试获取指定的提交
-        try:
-            commit = repo.commit(commit_hash)
-        except ValueError:
-            # 如果是短哈希，尝试匹配
-            matching_commits = [c for c in repo.iter_commits() if c.hexsha.startswith(commit_hash)]
-            if not matching_commits:
-                raise HTTPException(status_code=404, detail=f"Commit {commit_hash} not found")
-            commit = matching_commits[0]
-        
-        # 获取提交统计信息
-        stats = commit.stats.total
-        
-        # 获取变更的文件列表
-        changed_files = []
-        diff_index = commit.diff(commit.parents[0] if commit.parents else git.NULL_TREE)
-        
-        for diff in diff_index:
-            file_path = diff.a_path if diff.a_path else diff.b_path
-            
-            # 确定文件状态
-            if diff.new_file:
-                status = "added"
-            elif diff.deleted_file:
-                status = "deleted"
-            elif diff.renamed:
-                status = "renamed"
-            else:
-                status = "modified"
-            
-            # 获取文件级别的变更统计
-            file_stats = None
-            for filename, file_stat in commit.stats.files.items():
-                norm_filename = filename.replace('/', os.sep)
-                if norm_filename == file_path or filename == file_path:
-                    file_stats = file_stat
-                    break
-            
-            file_info = {
-                "filename": file_path,
-                "status": status,
-            }
-            
-            if file_stats:
-                file_info["changes"] = {
-                    "insertions": file_stats["insertions"],
-                    "deletions": file_stats["deletions"],
-                }
-            
-            changed_files.append(file_info)
-        
-        # 构建详细的提交信息
-        commit_detail = {
-            "hash": commit.hexsha,
-            "short_hash": commit.hexsha[:7],
-            "author": f"{commit.author.name} <{commit.author.email}>",
-            "date": datetime.fromtimestamp(commit.committed_date).isoformat(),
-            "message": commit.message.strip(),
-            "stats": {
-                "insertions": stats["insertions"],
-                "deletions": stats["deletions"],
-                "files_changed": stats["files"]
-            },
-            "files": changed_files
-        }
-        
-        return commit_detail
+        service = get_git(project_path)
+        commit_sha, parent_sha = await resolve_commit(project_path, commit_hash)
+        
+        diff_cache = get_diff_cache(project_path)
+        key = diff_cache.make_key(parent_sha, commit_sha, "", "commit-detail")
+        entry = await diff_cache.get_or_compute(key, lambda: service.call(
+            lambda: build_commit_detail(get_repo(project_path).commit(commit_sha))))
+        return cached_response(request, entry)
     except HTTPException:
         raise
-    except IndexError:
-        # 处理没有父提交的情况（首次提交）
-        raise HTTPException(status_code=404, detail=f"Commit {commit_hash} has no parent commit")
     except Exception as e:
         logger.error(f"Error getting commit detail: {str(e)}")
         raise HTTPException(
@@ -201,6 +166,68 @@ async def get_commit_detail(
         )
 
 
+def build_commit_detail(commit: git.Commit) -> Dict[str, Any]:
+    """
+    计算提交详情：提交信息、总体统计以及每个文件的变更类型和增删行数
+
+    Args:
+        commit: 提交对象
+
+    Returns:
+        提交详情
+    """
+    # 获取提交统计信息（commit.stats 每次访问都会运行一次git，只取一次）
+    commit_stats = commit.stats
+    stats = commit_stats.total
+    
+    # 获取变更的文件列表（从父提交到当前提交）
+    changed_files = []
+    if commit.parents:
+        diff_index = commit.parents[0].diff(commit)
+    else:
+        diff_index = commit.diff(git.NULL_TREE)
+    
+    for diff in diff_index:
+        file_path = diff.a_path if diff.a_path else diff.b_path
+        status = get_file_status_from_diff(diff)
+        
+        # 获取文件级别的变更统计
+        file_stats = None
+        for filename, file_stat in commit_stats.files.items():
+            norm_filename = filename.replace('/', os.sep)
+            if norm_filename == file_path or filename == file_path:
+                file_stats = file_stat
+                break
+        
+        file_info = {
+            "filename": file_path,
+            "status": status,
+        }
+        
+        if file_stats:
+            file_info["changes"] = {
+                "insertions": file_stats["insertions"],
+                "deletions": file_stats["deletions"],
+            }
+        
+        changed_files.append(file_info)
+    
+    # 构建详细的提交信息
+    return {
+        "hash": commit.hexsha,
+        "short_hash": commit.hexsha[:7],
+        "author": f"{commit.author.name} <{commit.author.email}>",
+        "date": datetime.fromtimestamp(commit.committed_date).isoformat(),
+        "message": commit.message.strip(),
+        "stats": {
+            "insertions": stats["insertions"],
+            "deletions": stats["deletions"],
+            "files_changed": stats["files"]
+        },
+        "files": changed_files
+    }
+
+
 @router.get("/api/commit/action")
 async def get_action_from_commit_msg(
     commit_msg: str,
@@ -264,7 +291,7 @@ async def get_branches(project_path: str = Depends(get_project_path)):
     Returns:
         分支列表
     """
-    try:
+    def list_branches_task():
         repo = get_repo(project_path)
         branches = []
         
@@ -282,6 +309,11 @@ async def get_branches(project_path: str = Depends(get_project_path)):
             })
         
         return {"branches": branches, "current": current_branch}
+
+    try:
+        return await get_git(project_path).call(list_branches_task)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting branches: {str(e)}")
         raise HTTPException(
@@ -294,10 +326,11 @@ async def get_branches(project_path: str = Depends(get_project_path)):
 async def get_file_diff(
     commit_hash: str,
     file_path: str,
+    request: Request,
     project_path: str = Depends(get_project_path)
 ):
     """
-    获取特定提交中特定文件的变更前后内容和差异
+    获取特定提交中特定文件的变更前后内容和差异，结果按 (父提交, 提交, 文件) 缓存并带有ETag
     
     Args:
         commit_hash: 提交哈希值
@@ -308,91 +341,14 @@ async def get_file_diff(
         文件变更前后内容和差异
     """
     try:
-        repo = get_repo(project_path)
-        
-        # 尝试获取指定的提交
-        try:
-            commit = repo.commit(commit_hash)
-        except ValueError:
-            # 如果是短哈希，尝试匹配
-            matching_commits = [c for c in repo.iter_commits() if c.hexsha.startswith(commit_hash)]
-            if not matching_commits:
-                raise HTTPException(status_code=404, detail=f"Commit {commit_hash} not found")
-            commit = matching_commits[0]
-        
-        # 处理父提交，如果没有父提交（初始提交）
-        if not commit.parents:
-            # 如果是新增文件
-            if file_path in [item.path for item in commit.tree.traverse() if item.type == 'blob']:
-                file_content = repo.git.show(f"{commit.hexsha}:{file_path}")
-                return {
-                    "before_content": "",  # 初始提交前没有内容
-                    "after_content": file_content,
-                    "diff_content": repo.git.show(f"{commit.hexsha} -- {file_path}"),
-                    "file_status": "added"
-                }
-            else:
-                raise HTTPException(status_code=404, detail=f"File {file_path} not found in commit {commit_hash}")
+        service = get_git(project_path)
+        commit_sha, parent_sha = await resolve_commit(project_path, commit_hash)
         
-        # 获取父提交
-        parent = commit.parents[0]
-        
-        # 获取提交的差异索引
-        diff_index = parent.diff(commit)
-        
-        # 初始化变量
-        before_content = ""
-        after_content = ""
-        diff_content = ""
-        file_status = "unknown"
-        found_file = False
-        
-        # 查找匹配的文件差异
-        for diff_item in diff_index:
-            # 检查文件路径是否匹配当前或重命名后的文件
-            if diff_item.a_path == file_path or diff_item.b_path == file_path:
-                found_file = True
-                # 根据diff_item确定文件状态
-                file_status = get_file_status_from_diff(diff_item)
-                
-                # 根据文件状态获取内容
-                if file_status == "added":
-                    # 新增文件
-                    after_content = repo.git.show(f"{commit.hexsha}:{file_path}")
-                    diff_content = repo.git.diff(f"{parent.hexsha}..{commit.hexsha}", "--", file_path)
-                elif file_status == "deleted":
-                    # 删除文件
-                    before_content = repo.git.show(f"{parent.hexsha}:{file_path}")
-                    diff_content = repo.git.diff(f"{parent.hexsha}..{commit.hexsha}", "--", file_path)
-                elif file_status == "renamed":
-                    # 重命名文件
-                    if diff_item.a_path == file_path:
-                        # 查询的是原文件名
-                        before_content = repo.git.show(f"{parent.hexsha}:{diff_item.a_path}")
-                        after_content = repo.git.show(f"{commit.hexsha}:{diff_item.b_path}")
-                    else:
-                        # 查询的是新文件名
-                        before_content = repo.git.show(f"{parent.hexsha}:{diff_item.a_path}")
-                        after_content = repo.git.show(f"{commit.hexsha}:{diff_item.b_path}")
-                    diff_content = repo.git.diff(f"{parent.hexsha}..{commit.hexsha}", "--", diff_item.a_path, diff_item.b_path)
-                else:
-                    # 修改文件
-                    before_content = repo.git.show(f"{parent.hexsha}:{file_path}")
-                    after_content = repo.git.show(f"{commit.hexsha}:{file_path}")
-                    diff_content = repo.git.diff(f"{parent.hexsha}..{commit.hexsha}", "--", file_path)
-                
-                break
-        
-        # 如果没有找到匹配的文件
-        if not found_file:
-            raise HTTPException(status_code=404, detail=f"File {file_path} not found in commit {commit_hash} or its parent")
-        
-        return {
-            "before_content": before_content,
-            "after_content": after_content,
-            "diff_content": diff_content,
-            "file_status": file_status
-        }
+        diff_cache = get_diff_cache(project_path)
+        key = diff_cache.make_key(parent_sha, commit_sha, file_path, "file-diff")
+        entry = await diff_cache.get_or_compute(
+            key, lambda: compute_file_diff(project_path, commit_sha, parent_sha, file_path))
+        return cached_response(request, entry)
         
     except HTTPException:
         raise
@@ -404,6 +360,83 @@ async def get_file_diff(
         )
 
 
+async def compute_file_diff(project_path: str, commit_sha: str, parent_sha: Optional[str],
+                            file_path: str) -> Dict[str, str]:
+    """
+    计算提交中某个文件的变更前后内容和差异
+
+    Args:
+        project_path: 项目路径
+        commit_sha: 提交的完整SHA
+        parent_sha: 第一个父提交的SHA，首次提交为None
+        file_path: 文件路径
+
+    Returns:
+        文件变更前后内容和差异
+
+    Raises:
+        HTTPException: 文件不在提交或其父提交中时返回404
+    """
+    service = get_git(project_path)
+    # 文件内容通过常驻的 git cat-file 进程读取，并按blob SHA缓存
+    reader = get_object_reader(project_path)
+
+    # 处理父提交，如果没有父提交（初始提交）
+    if parent_sha is None:
+        # 如果是新增文件
+        file_content = await reader.read_text(commit_sha, file_path)
+        if file_content is not None:
+            return {
+                "before_content": "",  # 初始提交前没有内容
+                "after_content": file_content,
+                "diff_content": await service.run("show", commit_sha, "--", file_path),
+                "file_status": "added"
+            }
+        else:
+            raise HTTPException(status_code=404, detail=f"File {file_path} not found in commit {commit_sha}")
+
+    # 获取提交的文件变更列表（-M 检测重命名）
+    changes = parse_name_status(await service.run(
+        "diff-tree", "-r", "-z", "--name-status", "-M", parent_sha, commit_sha, strip_newline=False))
+
+    # 查找匹配的文件变更（当前文件名或重命名前的文件名）
+    for status, old_path, new_path in changes:
+        if file_path not in (old_path, new_path):
+            continue
+        file_status = change_type_from_status(status)
+        before_content = ""
+        after_content = ""
+        diff_paths = [file_path]
+
+        # 根据文件状态获取内容
+        if file_status == "added":
+            # 新增文件
+            after_content = await reader.read_text(commit_sha, file_path) or ""
+        elif file_status == "deleted":
+            # 删除文件
+            before_content = await reader.read_text(parent_sha, file_path) or ""
+        elif file_status == "renamed":
+            # 重命名文件（无论查询的是原文件名还是新文件名）
+            before_content = await reader.read_text(parent_sha, old_path) or ""
+            after_content = await reader.read_text(commit_sha, new_path) or ""
+            diff_paths = [old_path, new_path]
+        else:
+            # 修改文件
+            before_content = await reader.read_text(parent_sha, file_path) or ""
+            after_content = await reader.read_text(commit_sha, file_path) or ""
+
+        diff_content = await service.run("diff", f"{parent_sha}..{commit_sha}", "--", *diff_paths)
+        return {
+            "before_content": before_content,
+            "after_content": after_content,
+            "diff_content": diff_content,
+            "file_status": file_status
+        }
+
+    # 如果没有找到匹配的文件
+    raise HTTPException(status_code=404, detail=f"File {file_path} not found in commit {commit_sha} or its parent")
+
+
 def get_file_status_from_diff(diff_item) -> str:
     """
     根据Git diff对象确定文件变更类型
@@ -448,112 +481,57 @@ async def get_current_changes(
         提交哈希列表
     """
     logger.info(f"开始获取当前变更 - 参数: limit={limit}, hours_ago={hours_ago}, event_file_id={event_file_id}, project_path={project_path}")
+
+    # 读取事件文件和查询提交都是阻塞操作，在Git线程池中执行
+    def load_event_commits_task():
+        # 获取事件文件路径
+        event_file_path = get_event_file_path(event_file_id, project_path)                
+        
+        # action文件 -> 提交ID 的映射按事件文件缓存：只读取新追加的事件（已被清理任务压缩归档的事件文件同样可读），
+        # 所有action文件的提交通过一次 git log 查找
+        commit_ids_by_file = get_action_commit_index(project_path).get_commit_ids(event_file_path)
+        
+        # 所有提交的元数据通过一次 git log --no-walk --numstat 批量获取，并按SHA缓存
+        metadata = get_commit_cache(project_path).get(
+            commit_id for commit_ids in commit_ids_by_file.values() for commit_id in commit_ids)
+        
+        commits = []
+        for action_file, commit_ids in commit_ids_by_file.items():
+            if not commit_ids:
+                logger.warning(f"无法从action文件 {action_file} 获取提交ID")
+                continue
+            
+            # 如果有两个提交，检查是否有一个是revert提交
+            if len(commit_ids) == 2:
+                logger.info(f"检测到两个提交ID，可能存在revert操作: {commit_ids}")
+                revert_commit_ids = [cid for cid in commit_ids
+                                     if cid in metadata and metadata[cid].message.startswith("<revert>")]
+                # 如果找到revert提交，只处理这个提交
+                if revert_commit_ids:
+                    logger.info(f"找到revert提交: {revert_commit_ids[0]}")
+                    commit_ids = revert_commit_ids[:1]
+            
+            # 处理所有提交ID（或者只处理revert提交）
+            for commit_id in commit_ids:
+                commit = metadata.get(commit_id)
+                if commit is None:
+                    logger.warning(f"无法获取提交 {commit_id} 的详情")
+                    continue
+                commits.append(commit.to_dict())
+        
+        # 按提交时间戳排序（降序 - 最新的在前面）
+        commits.sort(key=lambda x: x['timestamp'], reverse=True)
+        return {"commits": commits, "total": len(commits)}
+
     try:
-        repo = get_repo(project_path)
+        service = get_git(project_path)
         logger.info(f"成功获取Git仓库: {project_path}")
         
         # 如果提供了事件文件ID，从事件中获取相关提交
         if event_file_id:
             logger.info(f"使用事件文件模式获取提交, event_file_id={event_file_id}")
             try:
-                # 获取事件文件路径
-                event_file_path = get_event_file_path(event_file_id, project_path)                
-                
-                # 获取事件管理器
-                event_manager = get_event_manager(event_file_path)                
-                
-                # 获取所有事件
-                all_events = event_manager.event_store.get_events()                
-                
-                # 创建ActionYmlFileManager实例
-                action_manager = ActionYmlFileManager(project_path)                                                                
-
-                action_files = set()
-                final_action_files = []
-                
-                # 记录事件中包含action_file字段的事件数量
-                action_file_count = 0
-                
-                for i, event in enumerate(all_events):                    
-                    # 检查元数据中是否有action_file字段
-                    if 'action_file' in event.metadata and event.metadata['action_file']:
-                        action_file_count += 1
-                        action_file = event.metadata['action_file']                        
-                        
-                        if action_file in action_files:                            
-                            continue
-                                                
-                        action_files.add(action_file)
-                        # 从action文件获取提交ID       
-                        # action_file 这里的值是 类似这样的 actions/000000000104_chat_action.yml
-                        if action_file.startswith("actions"):
-                            action_file = action_file[len("actions/"):]                            
-
-                        final_action_files.append(action_file)
-                                
-                
-                commits = []
-                for i, action_file in enumerate(final_action_files):                    
-                    commit_ids = action_manager.get_all_commit_id_from_file(action_file)                                        
-                                        
-                    
-                    if not commit_ids:
-                        logger.warning(f"无法从action文件 {action_file} 获取提交ID")
-                        continue
-                    
-                    # 如果有两个提交，检查是否有一个是revert提交
-                    if len(commit_ids) == 2:
-                        logger.info(f"检测到两个提交ID，可能存在revert操作: {commit_ids}")
-                        revert_commit_id = None
-                        
-                        # 检查每个提交是否是revert提交
-                        for cid in commit_ids:
-                            try:
-                                commit = repo.commit(cid)
-                                message = commit.message.strip()                                
-                                
-                                if message.startswith("<revert>"):
-                                    logger.info(f"找到revert提交: {cid}")
-                                    revert_commit_id = cid
-                                    break
-                            except Exception as e:
-                                logger.warning(f"检查提交 {cid} 时出错: {str(e)}")
-                        
-                        # 如果找到revert提交，只处理这个提交
-                        if revert_commit_id:                            
-                            commit_ids = [revert_commit_id]
-                    
-                    # 处理所有提交ID（或者只处理revert提交）
-                    for commit_id in commit_ids:
-                        # 验证提交ID是否存在于仓库中
-                        try:                            
-                            commit = repo.commit(commit_id)
-                            # 获取提交统计信息
-                            stats = commit.stats.total                            
-                            # 构建提交信息
-                            commit_info = {
-                                "hash": commit.hexsha,
-                                "short_hash": commit.hexsha[:7],
-                                "author": f"{commit.author.name} <{commit.author.email}>",
-                                "date": datetime.fromtimestamp(commit.committed_date).isoformat(),
-                                "timestamp": commit.committed_date,
-                                "message": commit.message.strip(),
-                                "stats": {
-                                    "insertions": stats["insertions"],
-                                    "deletions": stats["deletions"],
-                                    "files_changed": stats["files"]
-                                }
-                            }
-                            commits.append(commit_info)
-                        except Exception as e:
-                            logger.warning(f"无法获取提交 {commit_id} 的详情: {str(e)}")
-                
-                
-                # 按提交时间戳排序（降序 - 最新的在前面）
-                if commits:
-                    commits.sort(key=lambda x: x['timestamp'], reverse=True)
-                                                
-                return {"commits": commits, "total": len(commits)}
+                return await service.call(load_event_commits_task)
             
             except Exception as e:
                 logger.error(f"从事件文件获取提交失败: {str(e)}")
@@ -562,12 +540,9 @@ async def get_current_changes(
                 return {"commits": [], "total": 0}
         else:
             # 如果没有提供事件文件ID，返回最近的提交
-            logger.info("未提供event_file_id，应返回最近的提交，但当前实现返回空列表")
-            # 这里应该调用get_recent_commits函数获取最近的提交
-            # recent_commits = await get_recent_commits(repo, limit, hours_ago)
-            # logger.info(f"获取到 {len(recent_commits.get('commit_hashes', []))} 个最近的提交")
-            # return recent_commits
-            return {"commits": [], "total": 0}
+            recent_commits = await get_recent_commits(project_path, limit, hours_ago)
+            logger.info(f"获取到 {recent_commits['total']} 个最近的提交")
+            return recent_commits
             
     except Exception as e:
         logger.error(f"获取当前变更失败: {str(e)}")
@@ -578,46 +553,26 @@ async def get_current_changes(
             detail=f"获取当前变更失败: {str(e)}"
         )
 
-async def get_recent_commits(repo: Repo, limit: int, hours_ago: int):
+async def get_recent_commits(project_path: str, limit: int, hours_ago: int) -> Dict[str, Any]:
     """
     获取最近的提交
     
     Args:
-        repo: Git仓库对象
+        project_path: 项目路径
         limit: 最大提交数量
         hours_ago: 时间范围（小时）
         
     Returns:
-        最近的提交哈希列表，按时间降序排序
+        最近的提交列表，按时间降序排序
     """
     # 计算时间范围
     since_time = datetime.now() - timedelta(hours=hours_ago)
-    since_timestamp = since_time.timestamp()
-    
-    # 获取最近的提交，带时间戳
-    commit_data = []
-    
-    for commit in repo.iter_commits():
-        if commit.committed_date >= since_timestamp:
-            commit_data.append({
-                'hash': commit.hexsha,
-                'timestamp': commit.committed_date
-            })
-            if len(commit_data) >= limit:
-                break
-    
-    # 按时间戳排序（降序 - 最新的在前面）
-    commit_data.sort(key=lambda x: x['timestamp'], reverse=True)
-    
-    # 提取排序后的哈希值，并去重（保持顺序）
-    seen_hashes = set()
-    commit_hashes_list = []
-    for item in commit_data:
-        if item['hash'] not in seen_hashes:
-            seen_hashes.add(item['hash'])
-            commit_hashes_list.append(item['hash'])
     
-    return {"commit_hashes": commit_hashes_list}
+    # 与 /api/commits 相同：git log 列出SHA，元数据批量获取并按SHA缓存
+    cache = get_commit_cache(project_path)
+    commits = await get_git(project_path).call(
+        cache.list_commits, 0, limit, int(since_time.timestamp()))
+    return {"commits": [commit.to_dict() for commit in commits], "total": len(commits)}
 
 @router.post("/api/commits/{commit_hash}/revert")
 async def revert_commit(
@@ -634,25 +589,10 @@ async def revert_commit(
     Returns:
         新创建的 revert 提交信息
     """
-    try:
+    # revert 会修改工作区和索引，整个过程在Git线程池中执行且不设超时（不能中途放弃）
+    def revert_task():
         repo = get_repo(project_path)
-        
-        # 尝试获取指定的提交
-        try:
-            commit = repo.commit(commit_hash)
-        except ValueError:
-            # 如果是短哈希，尝试匹配
-            matching_commits = [c for c in repo.iter_commits() if c.hexsha.startswith(commit_hash)]
-            if not matching_commits:
-                raise HTTPException(status_code=404, detail=f"Commit {commit_hash} not found")
-            commit = matching_commits[0]
-        
-        # 检查工作目录是否干净
-        if repo.is_dirty():
-            raise HTTPException(
-                status_code=400, 
-                detail="Cannot revert: working directory has uncommitted changes"
-            )
+        commit = repo.commit(commit_sha)
         
         try:
             # 执行 git revert
@@ -703,7 +643,21 @@ async def revert_commit(
                     status_code=500, 
                     detail=f"Git error during revert: {str(e)}"
                 )
-            
+
+    try:
+        # 尝试获取指定的提交
+        commit_sha, _ = await resolve_commit(project_path, commit_hash)
+        
+        # 检查工作目录是否干净：一次 git status 同时检查索引和工作区，结果也会更新状态模型并推送给客户端
+        status_model = get_git_status_model(project_path)
+        await status_model.reconcile()
+        if status_model.has_tracked_changes():
+            raise HTTPException(
+                status_code=400, 
+                detail="Cannot revert: working directory has uncommitted changes"
+            )
+        
+        return await get_git(project_path).call(revert_task, timeout=0)
     except HTTPException:
         raise
     except Exception as e:
@@ -0,0 +1,119 @@
+import json
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Request, Depends, Query
+from loguru import logger
+import git
+
+from auto_coder_web.git_service import get_git_service
+from auto_coder_web.git_status import GitStatusModel, get_git_status_model
+from auto_coder_web.sse_stream import SSEEventStream
+
+router = APIRouter()
+
+# Seconds between keep-alive comments of an idle status stream
+KEEPALIVE_INTERVAL = 15.0
+
+
+async def get_project_path(request: Request) -> str:
+    """
+    从FastAPI请求上下文中获取项目路径
+    """
+    return request.app.state.project_path
+
+
+async def get_status_model(project_path: str) -> GitStatusModel:
+    """
+    获取项目共享的工作区状态模型，首次使用时执行一次完整的 git status
+    """
+    try:
+        get_git_service(project_path)
+    except (git.NoSuchPathError, git.InvalidGitRepositoryError) as e:
+        logger.error(f"Git repository error: {str(e)}")
+        raise HTTPException(
+            status_code=404,
+            detail="No Git repository found in the project path"
+        )
+    model = get_git_status_model(project_path)
+    try:
+        await model.ensure_loaded()
+    except git.GitCommandError as e:
+        logger.error(f"Error getting git status: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to get git status: {str(e)}")
+    return model
+
+
+@router.get("/api/git/status")
+async def get_git_status(
+    since: Optional[str] = Query(None, description="客户端已知的状态版本，只返回之后的变化"),
+    project_path: str = Depends(get_project_path)
+):
+    """
+    获取工作区状态（修改、暂存、未跟踪的文件），用于显示文件标记
+
+    状态由文件变化事件增量更新，不会每次请求都扫描整个工作区。
+
+    Args:
+        since: 上次响应中的 version，提供时只返回之后变化的文件
+        project_path: 项目路径
+
+    Returns:
+        version、branch、files 和 removed；full 为true时 files 是完整列表
+    """
+    model = await get_status_model(project_path)
+    return model.snapshot(since)
+
+
+@router.post("/api/git/status/refresh")
+async def refresh_git_status(project_path: str = Depends(get_project_path)):
+    """
+    立即执行一次完整的 git status 并返回完整状态
+    """
+    model = await get_status_model(project_path)
+    try:
+        await model.reconcile()
+    except git.GitCommandError as e:
+        logger.error(f"Error refreshing git status: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to refresh git status: {str(e)}")
+    return model.snapshot()
+
+
+@router.get("/api/git/status/events")
+async def stream_git_status(
+    request: Request,
+    since: Optional[str] = Query(None, description="客户端已知的状态版本"),
+    compress: bool = False,
+    project_path: str = Depends(get_project_path)
+):
+    """
+    以SSE推送工作区状态的变化
+
+    第一帧是完整状态（或 since / Last-Event-ID 之后的变化），之后每次状态变化推送一帧增量。
+    帧的id是状态版本，断线重连时浏览器通过 Last-Event-ID 只获取错过的变化；
+    服务重启之前的版本无效，此时重新发送完整状态。
+
+    Args:
+        since: 客户端已知的状态版本，Last-Event-ID 优先
+        compress: 为true且客户端支持时使用gzip压缩
+        project_path: 项目路径
+    """
+    model = await get_status_model(project_path)
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id:
+        since = last_event_id
+    stream = SSEEventStream(request, "git-status", compress=compress)
+
+    async def status_stream():
+        # 其他epoch的游标（例如服务重启之前的）视为没有，先发送完整状态
+        cursor = since if model.parse_cursor(since) is not None else None
+        while True:
+            if cursor is None or model.parse_cursor(cursor) != model.version:
+                snapshot = model.snapshot(cursor)
+                cursor = snapshot["version"]
+                yield f"id: {cursor}\ndata: {json.dumps(snapshot, ensure_ascii=False)}\n\n"
+            if await request.is_disconnected():
+                break
+            if not await model.wait_for_change(model.parse_cursor(cursor), KEEPALIVE_INTERVAL):
+                yield ": keep-alive\n\n"
+
+    return stream.response(status_stream())
@@ -1,11 +1,11 @@
 import os
 import json
-from threading import Thread
 import time as import_time
 from fastapi import APIRouter, HTTPException, Request, Depends
 from pydantic import BaseModel
 from typing import Optional, Any, Dict, Union, List
 from auto_coder_web.auto_coder_runner_wrapper import AutoCoderRunnerWrapper
+from auto_coder_web.job_scheduler import job_scheduler, JobQueueFullError, get_current_job
 from loguru import logger
 
 # 定义Pydantic模型
@@ -71,6 +71,9 @@ async def build_index(project_path: str = Depends(get_project_path)):
 
     # 定义在线程中运行的函数
     def run_index_build_in_thread():
+        job = get_current_job()
+        if job is not None:
+            job.set_phase("building_index")
         try:
             # 创建AutoCoderRunnerWrapper实例
             wrapper = AutoCoderRunnerWrapper(project_path)
@@ -117,6 +120,12 @@ async def build_index(project_path: str = Depends(get_project_path)):
             project_path, ".auto-coder", "auto-coder.web", "index-status.json")
         os.makedirs(os.path.dirname(status_file), exist_ok=True)
         
+        # 保留之前的状态，队列已满时恢复
+        previous_status = None
+        if os.path.exists(status_file):
+            with open(status_file, 'r') as f:
+                previous_status = f.read()
+        
         status_data = IndexStatusRunning(
             message="Index build started",
             timestamp=import_time.time()
@@ -125,16 +134,22 @@ async def build_index(project_path: str = Depends(get_project_path)):
         with open(status_file, 'w') as f:
             f.write(status_data.model_dump_json())
 
-        # 创建并启动线程
-        thread = Thread(target=run_index_build_in_thread)
-        thread.daemon = True  # 设置为守护线程，这样当主程序退出时，线程也会退出
-        thread.start()
+        # 交给任务调度器执行，同一时间只构建一个索引
+        job_scheduler.submit("index", run_index_build_in_thread)
 
-        logger.info("Started index build in background thread")
+        logger.info("Submitted index build to job scheduler")
         return IndexBuildResponse(
             status="started", 
             message="Index build started in background"
         )
+    except JobQueueFullError:
+        # 索引构建没有进入队列，恢复之前的状态后返回429
+        if previous_status is None:
+            os.remove(status_file)
+        else:
+            with open(status_file, 'w') as f:
+                f.write(previous_status)
+        raise
     except Exception as e:
         logger.error(f"Error starting index build thread: {str(e)}")
         raise HTTPException(
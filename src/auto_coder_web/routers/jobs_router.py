@@ -0,0 +1,106 @@
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, HTTPException
+from loguru import logger
+from autocoder.events import event_content as EventContentCreator
+from auto_coder_web.job_scheduler import job_scheduler
+from auto_coder_web.sse_stream import stream_monitor
+
+router = APIRouter()
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+def _refresh_running_jobs(jobs):
+    for job in jobs:
+        if job.status == "running":
+            try:
+                job.refresh_progress()
+            except Exception as e:
+                logger.warning(f"Could not read progress of job {job.job_id}: {str(e)}")
+
+
+@router.get("/api/jobs")
+async def list_jobs(status: Optional[str] = None, kind: Optional[str] = None):
+    """
+    列出正在运行、排队中以及最近结束的后台任务
+
+    Args:
+        status: 按状态过滤 (queued/running/completed/failed/cancelled)，"active" 表示排队中和运行中
+        kind: 按任务类型过滤 (chat/coding/auto/reset_chat/rules/index/todo)
+
+    Returns:
+        任务列表（最新的在前）以及调度器的并发限制和队列统计
+    """
+    jobs = job_scheduler.list_jobs()
+    if status == "active":
+        jobs = [job for job in jobs if job.status in ACTIVE_STATUSES]
+    elif status:
+        jobs = [job for job in jobs if job.status == status]
+    if kind:
+        jobs = [job for job in jobs if job.kind == kind]
+
+    # 从事件文件增量读取运行中任务的当前阶段和token用量
+    await asyncio.to_thread(_refresh_running_jobs, jobs)
+    return {"jobs": [job.to_dict() for job in jobs], "stats": job_scheduler.stats()}
+
+
+@router.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    获取单个后台任务的详情
+
+    Args:
+        job_id: 任务ID，对话类任务即event_file_id
+
+    Returns:
+        任务详情
+    """
+    job = job_scheduler.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    await asyncio.to_thread(_refresh_running_jobs, [job])
+    return job.to_dict()
+
+
+@router.delete("/api/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """
+    取消排队中或运行中的后台任务
+
+    排队中的任务直接移出队列；运行中的任务通过global_cancel协作式取消，
+    并向其事件流写入取消事件。
+
+    Args:
+        job_id: 任务ID，对话类任务即event_file_id
+
+    Returns:
+        取消操作的结果和任务详情
+    """
+    job = job_scheduler.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    if job.status not in ACTIVE_STATUSES:
+        raise HTTPException(status_code=409, detail=f"Job {job_id} is already {job.status}")
+
+    try:
+        error_content = EventContentCreator.create_error(
+            error_code="499", error_message="cancelled", details={}).to_dict()
+        await asyncio.to_thread(job_scheduler.cancel, job_id, None, error_content)
+    except Exception as e:
+        logger.error(f"Error cancelling job {job_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to cancel job: {str(e)}")
+
+    return {"status": "success", "message": "Cancel request sent", "job": job.to_dict()}
+
+
+@router.get("/api/event-streams")
+async def list_event_streams():
+    """
+    列出正在进行和最近结束的SSE事件流及其吞吐统计
+
+    Returns:
+        每个流的事件数、写出次数、原始/实际发送字节数、压缩率，
+        以及整体和最近10秒的events/sec、bytes/sec
+    """
+    return {"streams": [stats.to_dict() for stats in stream_monitor.list_streams()]}
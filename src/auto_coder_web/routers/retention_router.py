@@ -0,0 +1,48 @@
+import asyncio
+from fastapi import APIRouter, HTTPException, Request, Depends
+from loguru import logger
+from auto_coder_web.retention import RetentionJanitor
+
+router = APIRouter()
+
+
+async def get_retention_janitor(request: Request) -> RetentionJanitor:
+    """从FastAPI请求上下文中获取清理任务"""
+    return request.app.state.retention_janitor
+
+
+@router.get("/api/retention")
+async def get_retention_status(janitor: RetentionJanitor = Depends(get_retention_janitor)):
+    """
+    获取事件文件和Web产物的保留策略以及最近一次清理的结果
+
+    Returns:
+        保留策略和最近一次清理报告（尚未清理过时为null）
+    """
+    report = janitor.last_report
+    return {
+        "policy": janitor.policy.to_dict(),
+        "last_report": report.to_dict() if report else None,
+    }
+
+
+@router.post("/api/retention/sweep")
+async def run_retention_sweep(dry_run: bool = False,
+                              janitor: RetentionJanitor = Depends(get_retention_janitor)):
+    """
+    立即执行一次压缩和清理
+
+    正在运行或排队中的任务所使用的文件不会被压缩或删除。
+
+    Args:
+        dry_run: 为true时只统计将被压缩和删除的文件，不做实际修改
+
+    Returns:
+        各类文件的扫描、压缩、删除数量以及回收的空间
+    """
+    try:
+        report = await asyncio.to_thread(janitor.sweep, dry_run)
+    except Exception as e:
+        logger.error(f"Error running retention sweep: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to run retention sweep: {str(e)}")
+    return report.to_dict()
@@ -3,10 +3,7 @@ import json
 import os
 import fnmatch
 import pathspec
-from threading import Thread
-from concurrent.futures import ThreadPoolExecutor
 from fastapi import APIRouter, HTTPException, Request, Depends, Query
-from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from typing import Dict, Any, Optional, List
 
@@ -22,12 +19,13 @@ from autocoder.events.event_types import EventType
 from autocoder.common.global_cancel import global_cancel, CancelRequestedException
 # Add import for AutoCoderRunnerWrapper
 from auto_coder_web.auto_coder_runner_wrapper import AutoCoderRunnerWrapper
+from auto_coder_web.job_scheduler import job_scheduler
+from auto_coder_web.event_tail import event_tail_service, resolve_resume_offset
+from auto_coder_web.sse_stream import SSEEventStream
 from loguru import logger
 
 router = APIRouter()
 
-# Thread pool for cancellation, similar to coding_router
-cancel_thread_pool = ThreadPoolExecutor(max_workers=5)
 
 # --- Pydantic Models ---
 
@@ -347,11 +345,10 @@ async def analyze_rules(
                 EventContentCreator.create_error(error_code="500", error_message=str(e), details={}).to_dict()
             )
         finally:
-            global_cancel.unregister_token(event_file) # Clean up token
+            global_cancel.reset_token(event_file) # Clean up token
 
-    # Start the background thread
-    thread = Thread(target=run_analysis_in_thread, daemon=True)
-    thread.start()
+    # Run through the job scheduler, queued behind other rule analyses
+    job_scheduler.submit("rules", run_analysis_in_thread, event_file=event_file, job_id=file_id)
 
     return AsyncTaskResponse(event_file_id=file_id)
 
@@ -415,11 +412,10 @@ async def analyze_commit_rules(
                 EventContentCreator.create_error(error_code="500", error_message=str(e), details={}).to_dict()
             )
         finally:
-             global_cancel.unregister_token(event_file) # Clean up token
+             global_cancel.reset_token(event_file) # Clean up token
 
-    # Start the background thread
-    thread = Thread(target=run_commit_analysis_in_thread, daemon=True)
-    thread.start()
+    # Run through the job scheduler, queued behind other rule analyses
+    job_scheduler.submit("rules", run_commit_analysis_in_thread, event_file=event_file, job_id=file_id)
 
     return AsyncTaskResponse(event_file_id=file_id)
 
@@ -451,10 +447,17 @@ Available /rules API Endpoints:
 
 
 @router.get("/api/rules/events")
-async def poll_rule_events(event_file_id: str, project_path: str = Depends(get_project_path)):
+async def poll_rule_events(event_file_id: str, request: Request, last_event_id: Optional[str] = None,
+                           batch: bool = False, compress: bool = False,
+                           project_path: str = Depends(get_project_path)):
     """
     SSE endpoint to stream events for background rule tasks (analyze, commit).
+
+    batch=true sends each frame's data as a JSON array of events; compress=true
+    enables gzip when the client accepts it.
     """
+    stream = SSEEventStream(request, f"rules:{event_file_id}", batch=batch, compress=compress)
+
     async def event_stream():
         event_file = get_event_file_path(event_file_id, project_path)
         if not event_file or not os.path.exists(os.path.dirname(event_file)):
@@ -465,31 +468,26 @@ async def poll_rule_events(event_file_id: str, project_path: str = Depends(get_p
              return
 
         logger.info(f"Starting SSE stream for event file: {event_file}")
-        event_manager = get_event_manager(event_file)
-        while True:
+        # Wake up on file changes; the idle timeout lets us notice cancellations
+        # 断线重连时从Last-Event-ID（事件结束处的字节偏移）继续，EventSource无法自定义header时可用last_event_id参数
+        offset = resolve_resume_offset(event_file, request.headers.get("last-event-id") or last_event_id)
+        async with event_tail_service.subscribe(event_file, offset) as subscription:
             try:
-                # Use asyncio.to_thread for blocking read_events
-                events = await asyncio.to_thread(event_manager.read_events, block=False)
-
-                if not events:
-                    # Check if the task is globally cancelled
-                    if global_cancel.is_set(token=event_file):
-                         logger.info(f"SSE stream {event_file_id}: Task cancellation detected, closing stream.")
-                         # Send a final cancellation event if not already sent by the task thread
-                         cancel_event = EventContentCreator.create_error("499", "Task cancelled.").to_dict()
-                         yield f"data: {json.dumps(cancel_event)}\n\n"
-                         break
-                    await asyncio.sleep(0.2) # Slightly longer sleep if no events
-                    continue
-
-                current_event = None
-                for event in events:
-                    current_event = event
-                    event_json = event.to_json()
-                    yield f"data: {event_json}\n\n"
-                    await asyncio.sleep(0.01) # Small delay to allow client processing
+                async for batch_events in subscription.batches(idle_timeout=1.0, coalesce=stream.coalesce):
+                    if not batch_events:
+                        # Check if the task is globally cancelled
+                        if global_cancel.is_requested(token=event_file):
+                             logger.info(f"SSE stream {event_file_id}: Task cancellation detected, closing stream.")
+                             # Send a final cancellation event if not already sent by the task thread
+                             cancel_event = EventContentCreator.create_error("499", "Task cancelled.").to_dict()
+                             yield f"data: {json.dumps(cancel_event)}\n\n"
+                             break
+                        continue
+
+                    # Format as SSE, the ids let the client resume after the last event
+                    yield stream.frame(batch_events)
+                    current_event = batch_events[-1][1]
 
-                if current_event is not None:
                     if current_event.event_type in [EventType.ERROR, EventType.COMPLETION]:
                         logger.info(f"SSE stream {event_file_id}: Terminal event received ({current_event.event_type.name}), closing stream.")
                         break
@@ -501,7 +499,6 @@ async def poll_rule_events(event_file_id: str, project_path: str = Depends(get_p
             except CancelRequestedException:
                  logger.info(f"SSE stream {event_file_id}: Cancellation detected during event read, closing stream.")
                  yield f"data: {EventContentCreator.create_error('499', 'Task cancelled.').to_json()}\n\n"
-                 break
             except Exception as e:
                 logger.error(f"Error in SSE stream {event_file_id}: {str(e)}")
                 # Check if it's a file not found error after task completion/cleanup
@@ -511,19 +508,8 @@ async def poll_rule_events(event_file_id: str, project_path: str = Depends(get_p
                 else:
                      logger.exception(e) # Log full traceback for unexpected errors
                      yield f"data: {EventContentCreator.create_error('500', f'SSE stream error: {str(e)}').to_json()}\n\n"
-                break
-
-    return StreamingResponse(
-        event_stream(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache, no-transform",
-            "Connection": "keep-alive",
-            "Content-Type": "text/event-stream",
-            "X-Accel-Buffering": "no",
-            "Transfer-Encoding": "chunked",
-        },
-    )
+
+    return stream.response(event_stream())
 
 # Note: User response endpoint might not be directly applicable to analyze/commit unless they become interactive.
 # Including it for consistency with coding_router pattern.
@@ -558,34 +544,14 @@ async def cancel_rule_task(request: CancelTaskRequest, project_path: str = Depen
         if not event_file:
              raise HTTPException(status_code=404, detail=f"Event file ID {request.event_file_id} not found or invalid.")
 
-        # Check if the event file exists - indicates if the task might still be running or recently finished
-        event_manager = get_event_manager(event_file) # This implicitly checks existence somewhat
-
-        def cancel_in_thread():
-            try:
-                logger.info(f"Setting cancellation flag for token: {event_file}")
-                global_cancel.set(token=event_file)
-
-                # Attempt to write a cancel event immediately for faster feedback via SSE
-                # This might fail if the task already cleaned up the file, which is acceptable.
-                try:
-                     event_manager.write_error(
-                         EventContentCreator.create_error(
-                             error_code="499", error_message="Cancel request received", details={}
-                         ).to_dict()
-                     )
-                     logger.info(f"Cancellation event written for task {request.event_file_id}")
-                except Exception as write_err:
-                     logger.warning(f"Could not write immediate cancel event for task {request.event_file_id} (might be already finished): {write_err}")
-
-            except Exception as e:
-                # Log errors during the cancellation signaling process itself
-                logger.error(f"Error during cancellation signaling for task {request.event_file_id}: {str(e)}")
-                # Don't raise HTTPException here, as the request to cancel was received.
-                # The client will see the task end via SSE or timeout.
-
-        # Use the shared cancel thread pool
-        cancel_thread_pool.submit(cancel_in_thread)
+        # Cancel through the job registry: queued tasks leave the queue, running ones get
+        # their cancellation flag set. Writing the cancel event may fail if the task already
+        # cleaned up the file, which is acceptable.
+        await asyncio.to_thread(
+            job_scheduler.cancel, request.event_file_id, event_file,
+            EventContentCreator.create_error(
+                error_code="499", error_message="Cancel request received", details={}
+            ).to_dict())
 
         return {"status": "success", "message": "Cancel request sent. Task termination depends on the task's current state."}
     except Exception as e:
@@ -0,0 +1,80 @@
+import asyncio
+import os
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse
+from auto_coder_web.terminal import terminal_manager
+from auto_coder_web.terminal_recording import (
+    RECORDING_ID_PATTERN, RECORDING_SUFFIX, list_recordings, recording_writer
+)
+
+router = APIRouter()
+
+
+@router.get("/api/terminal/sessions")
+async def list_terminal_sessions():
+    """
+    列出存活的终端会话（包括已分离、仍在后台运行的会话）
+
+    Returns:
+        会话列表，会话数量及上限，所有会话回滚缓冲占用的内存及上限
+    """
+    return terminal_manager.stats()
+
+
+@router.delete("/api/terminal/sessions/{name}")
+async def close_terminal_session(name: str):
+    """
+    关闭终端会话并结束其shell进程
+
+    Args:
+        name: 会话名称
+
+    Returns:
+        操作结果
+    """
+    if name not in terminal_manager.sessions:
+        raise HTTPException(status_code=404, detail=f"Terminal session {name} not found")
+    await terminal_manager.close_session(name)
+    return {"status": "success", "name": name}
+
+
+def _recordings_dir() -> str:
+    if not terminal_manager.recordings_dir:
+        raise HTTPException(status_code=404, detail="Terminal recording is not configured")
+    return terminal_manager.recordings_dir
+
+
+@router.get("/api/terminal/recordings")
+async def list_terminal_recordings():
+    """
+    列出终端录制文件（asciicast v2），包括按大小轮转出的分段
+
+    Returns:
+        录制列表（最新的在前），active表示会话仍在录制中
+    """
+    recordings_dir = _recordings_dir()
+    recordings = await asyncio.to_thread(list_recordings, recordings_dir)
+    return {"recordings": recordings}
+
+
+@router.get("/api/terminal/recordings/{recording_id}")
+async def get_terminal_recording(recording_id: str):
+    """
+    以流的形式返回终端录制文件，可直接用 asciinema player 播放
+
+    Args:
+        recording_id: 录制ID（不含 .cast 后缀）
+
+    Returns:
+        asciicast v2 文件内容
+    """
+    recordings_dir = _recordings_dir()
+    if not RECORDING_ID_PATTERN.match(recording_id):
+        raise HTTPException(status_code=400, detail=f"Invalid recording id: {recording_id}")
+    path = os.path.join(recordings_dir, recording_id + RECORDING_SUFFIX)
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail=f"Recording {recording_id} not found")
+    if recording_writer.is_active(recording_id):
+        # 正在录制的会话先把写缓冲落盘
+        await asyncio.to_thread(recording_writer.flush)
+    return FileResponse(path, media_type="application/x-asciicast")
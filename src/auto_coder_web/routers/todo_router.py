@@ -9,10 +9,10 @@ from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 from pathlib import Path
-from threading import Thread
 from autocoder.events.event_manager_singleton import get_event_manager, gengerate_event_file_path, get_event_file_path
 from autocoder.events import event_content as EventContentCreator
 from auto_coder_web.auto_coder_runner_wrapper import AutoCoderRunnerWrapper
+from auto_coder_web.job_scheduler import job_scheduler, JobQueueFullError, get_current_job
 
 router = APIRouter()
 
@@ -458,6 +458,7 @@ async def execute_todo_tasks(todo_id: str, project_path: str = Depends(get_proje
     # 更新待办事项状态为正在执行
     todo_index = next(
         (i for i, t in enumerate(todos) if t.id == todo_id), None)
+    previous_status = todo.status
     if todo_index is not None:
         todos[todo_index].status = "developing"
         await save_todos(todos)
@@ -488,12 +489,21 @@ async def execute_todo_tasks(todo_id: str, project_path: str = Depends(get_proje
 
     # 定义线程中运行的函数
     def run_tasks_in_thread():
+        job = get_current_job()
         try:
             for i, task in enumerate(todo.tasks):
+                # 通过 DELETE /api/jobs/{id} 取消后不再执行后续任务
+                if job is not None and job.cancel_requested:
+                    logger.info(f"Task execution for todo {todo_id} cancelled before task {i+1}")
+                    break
                 try:
                     # 获取当前任务的信息
                     current_task, event_file, file_id = asyncio.run(
                         execute_single_task(i))
+                    if job is not None:
+                        # 取消和进度统计都作用于当前正在执行的子任务
+                        job.attach_event_file(event_file)
+                        job.set_phase(f"task {i+1}/{len(todo.tasks)}: {current_task.title}")
 
                     # 创建AutoCoderRunnerWrapper实例
                     wrapper = AutoCoderRunnerWrapper(project_path)
@@ -579,13 +589,17 @@ async def execute_todo_tasks(todo_id: str, project_path: str = Depends(get_proje
             logger.error(
                 f"Error in task execution thread for todo {todo_id}: {str(e)}")
 
-    # 创建并启动线程
-    thread = Thread(target=run_tasks_in_thread)
-    thread.daemon = True
-    thread.start()
+    # 交给任务调度器执行，队列已满时恢复待办事项状态并返回429
+    try:
+        job_scheduler.submit("todo", run_tasks_in_thread)
+    except JobQueueFullError:
+        if todo_index is not None:
+            todos[todo_index].status = previous_status
+            await save_todos(todos)
+        raise
 
     logger.info(
-        f"Started sequential task execution in background thread for todo {todo_id}")
+        f"Submitted sequential task execution to job scheduler for todo {todo_id}")
 
     # 返回响应
     return ExecuteTaskResponse(
@@ -0,0 +1,188 @@
+"""
+SSE responses for the event endpoints: batching, compression and metrics.
+
+``SSEEventStream`` turns the batches of an event ``Subscription`` into one
+HTTP chunk per batch instead of one per event. Clients can opt in to
+
+* ``batch=true``: one frame per batch whose data is a JSON array of events
+* ``compress=true``: gzip content-encoding, used only when the request's
+  ``Accept-Encoding`` allows it. Every chunk is sync-flushed so events are
+  still delivered immediately.
+
+Each stream counts its events, HTTP chunks and raw/sent bytes. Active and recently
+finished streams are listed by ``GET /api/event-streams``.
+"""
+import time
+import uuid
+import zlib
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+from auto_coder_web.event_tail import OffsetEvent, format_sse_batch
+
+# Linger applied to busy streams so bursts of token events share a frame
+COALESCE_WINDOW = 0.01
+# Window of the "recent" rates
+RATE_WINDOW = 10.0
+MAX_FINISHED_STREAMS = 50
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache, no-transform",
+    "Connection": "keep-alive",
+    "Content-Type": "text/event-stream",
+    "X-Accel-Buffering": "no",
+    "Transfer-Encoding": "chunked",
+}
+
+
+def accepts_gzip(request: Request) -> bool:
+    """Whether the client's Accept-Encoding allows gzip"""
+    for coding in request.headers.get("accept-encoding", "").split(","):
+        name, *params = [part.strip() for part in coding.split(";")]
+        if name.lower() not in ("gzip", "*"):
+            continue
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        return quality > 0
+    return False
+
+
+class StreamStats:
+    """Counters of one SSE stream"""
+
+    def __init__(self, name: str, batch: bool, encoding: Optional[str]):
+        self.stream_id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.batch = batch
+        self.encoding = encoding
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.events = 0
+        self.chunks = 0
+        self.raw_bytes = 0
+        self.sent_bytes = 0
+        # (monotonic time, events, sent bytes) of the chunks in the last RATE_WINDOW seconds
+        self._samples: Deque[Tuple[float, int, int]] = deque()
+
+    def record(self, events: int, raw_bytes: int, sent_bytes: int):
+        now = time.monotonic()
+        self.events += events
+        self.chunks += 1
+        self.raw_bytes += raw_bytes
+        self.sent_bytes += sent_bytes
+        self._samples.append((now, events, sent_bytes))
+        while self._samples and now - self._samples[0][0] > RATE_WINDOW:
+            self._samples.popleft()
+
+    def to_dict(self) -> Dict[str, Any]:
+        end = self.finished_at or time.time()
+        elapsed = max(end - self.started_at, 1e-6)
+        now = time.monotonic()
+        recent = [sample for sample in self._samples if now - sample[0] <= RATE_WINDOW]
+        recent_window = min(RATE_WINDOW, elapsed)
+        return {
+            "stream_id": self.stream_id,
+            "name": self.name,
+            "batch": self.batch,
+            "encoding": self.encoding,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "events": self.events,
+            "chunks": self.chunks,
+            "raw_bytes": self.raw_bytes,
+            "sent_bytes": self.sent_bytes,
+            "compression_ratio": round(self.sent_bytes / self.raw_bytes, 3) if self.raw_bytes else None,
+            "events_per_sec": round(self.events / elapsed, 2),
+            "bytes_per_sec": round(self.sent_bytes / elapsed, 2),
+            "recent_events_per_sec": None if self.finished_at else round(
+                sum(sample[1] for sample in recent) / recent_window, 2),
+            "recent_bytes_per_sec": None if self.finished_at else round(
+                sum(sample[2] for sample in recent) / recent_window, 2),
+        }
+
+
+class StreamMonitor:
+    """Registry of active and recently finished SSE streams"""
+
+    def __init__(self):
+        self._active: Dict[str, StreamStats] = {}
+        self._finished: Deque[StreamStats] = deque(maxlen=MAX_FINISHED_STREAMS)
+
+    def add(self, stats: StreamStats):
+        self._active[stats.stream_id] = stats
+
+    def finish(self, stats: StreamStats):
+        stats.finished_at = time.time()
+        if self._active.pop(stats.stream_id, None) is not None:
+            self._finished.append(stats)
+
+    def list_streams(self) -> List[StreamStats]:
+        """Active streams first, then finished ones, newest first"""
+        active = sorted(self._active.values(), key=lambda s: s.started_at, reverse=True)
+        return active + list(reversed(self._finished))
+
+
+stream_monitor = StreamMonitor()
+
+
+class SSEEventStream:
+    """
+    Encoder and response factory of one event stream.
+
+    Usage in an endpoint::
+
+        stream = SSEEventStream(request, f"chat:{event_file_id}", batch, compress)
+        async def event_stream():
+            async for batch in subscription.batches(coalesce=stream.coalesce):
+                yield stream.frame(batch)
+        return stream.response(event_stream())
+    """
+
+    coalesce = COALESCE_WINDOW
+
+    def __init__(self, request: Request, name: str, batch: bool = False, compress: bool = False):
+        self.batch = batch
+        self.gzip = compress and accepts_gzip(request)
+        self.stats = StreamStats(name, batch, "gzip" if self.gzip else None)
+        self._pending_events = 0
+
+    def frame(self, batch: List[OffsetEvent]) -> str:
+        """SSE text of a batch, written to the client as one chunk"""
+        self._pending_events += len(batch)
+        return format_sse_batch(batch, as_array=self.batch)
+
+    async def _encode(self, chunks: AsyncIterator[str]) -> AsyncIterator[bytes]:
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if self.gzip else None
+        stream_monitor.add(self.stats)
+        try:
+            async for chunk in chunks:
+                if not chunk:
+                    continue
+                raw = chunk.encode("utf-8")
+                data = raw if compressor is None else compressor.compress(raw) + compressor.flush(zlib.Z_SYNC_FLUSH)
+                self.stats.record(self._pending_events, len(raw), len(data))
+                self._pending_events = 0
+                yield data
+            if compressor is not None:
+                tail = compressor.flush()
+                self.stats.sent_bytes += len(tail)
+                yield tail
+        finally:
+            stream_monitor.finish(self.stats)
+
+    def response(self, chunks: AsyncIterator[str]) -> StreamingResponse:
+        """Wrap the endpoint's SSE text generator in a StreamingResponse"""
+        headers = dict(SSE_HEADERS)
+        if self.gzip:
+            headers["Content-Encoding"] = "gzip"
+            headers["Vary"] = "Accept-Encoding"
+        return StreamingResponse(self._encode(chunks), media_type="text/event-stream", headers=headers)
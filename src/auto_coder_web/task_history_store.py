@@ -0,0 +1,295 @@
+"""
+Indexed task-history store shared by the chat, coding and auto routers.
+
+Every task is still saved as ``.auto-coder/auto-coder.web/tasks/<id>.json``.
+Next to the directory, ``task-index.json`` keeps one summary row per task
+(type, timestamp, query, status, message count), ordered by
+(type, timestamp). History listings are answered from that index and only
+``get`` loads a task's full messages.
+
+Existing task directories are indexed on first use. Afterwards the directory
+is only rescanned when its mtime changes, e.g. when files are added by an
+older version, and only new or modified files are parsed.
+"""
+import bisect
+import json
+import os
+import threading
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+INDEX_VERSION = 1
+# Listing key used by get_task_history of the auto router, which shows all types
+ALL_TYPES = "*"
+
+
+class InvalidTaskIdError(ValueError):
+    """A task id that does not name a file inside the task directory"""
+
+
+@dataclass
+class TaskSummary:
+    """Index row of a saved task, without its messages"""
+    id: str
+    type: Optional[str]
+    query: str
+    status: str
+    timestamp: int
+    event_file_id: Optional[str]
+    message_count: int
+    mtime_ns: int = 0
+
+    @classmethod
+    def from_task(cls, task_id: str, task_data: Dict[str, Any], mtime_ns: int = 0) -> "TaskSummary":
+        messages = task_data.get("messages")
+        timestamp = task_data.get("timestamp") or 0
+        return cls(
+            id=task_id,
+            type=task_data.get("type"),
+            query=str(task_data.get("query", "")),
+            status=str(task_data.get("status", "")),
+            timestamp=int(timestamp) if isinstance(timestamp, (int, float)) else 0,
+            event_file_id=task_data.get("event_file_id"),
+            message_count=len(messages) if isinstance(messages, list) else 0,
+            mtime_ns=mtime_ns,
+        )
+
+    @property
+    def sort_key(self) -> Tuple[int, str]:
+        # Newest first, ties broken by id so pagination is stable
+        return (-self.timestamp, self.id)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data.pop("mtime_ns")
+        return data
+
+
+class TaskHistoryStore:
+    """Task files of one project plus their summary index"""
+
+    def __init__(self, project_path: str):
+        web_dir = os.path.join(project_path, ".auto-coder", "auto-coder.web")
+        self.task_dir = os.path.join(web_dir, "tasks")
+        self.index_file = os.path.join(web_dir, "task-index.json")
+        self._lock = threading.RLock()
+        self._entries: Dict[str, TaskSummary] = {}
+        # type (or ALL_TYPES) -> sorted list of (sort_key, id)
+        self._ordered: Dict[str, List[Tuple[Tuple[int, str], str]]] = {}
+        self._dir_mtime_ns: Optional[int] = None
+        self._loaded = False
+
+    def task_file(self, task_id: str) -> str:
+        if not task_id or os.path.basename(task_id) != task_id or task_id.startswith("."):
+            raise InvalidTaskIdError(f"Invalid task id: {task_id}")
+        return os.path.join(self.task_dir, f"{task_id}.json")
+
+    def save(self, task_id: str, task_data: Dict[str, Any]):
+        """Write a task file and update its index row"""
+        task_file = self.task_file(task_id)
+        with self._lock:
+            self._ensure_loaded()
+            tmp_file = f"{task_file}.tmp"
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump(task_data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_file, task_file)
+            self._put(TaskSummary.from_task(task_id, task_data, os.stat(task_file).st_mtime_ns))
+            # Our own write changed the directory mtime, no rescan needed
+            self._dir_mtime_ns = self._get_dir_mtime_ns()
+            self._save_index()
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """Load the full task, messages included"""
+        try:
+            with open(self.task_file(task_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def list_summaries(self, task_type: Optional[str] = ALL_TYPES, limit: Optional[int] = None,
+                       before: Optional[int] = None,
+                       before_id: Optional[str] = None) -> Tuple[List[TaskSummary], bool]:
+        """
+        Summary rows, newest first.
+
+        Args:
+            task_type: Task type to list, ALL_TYPES for every type
+            limit: Maximum number of rows
+            before: Only rows with a timestamp strictly lower than this
+            before_id: Together with ``before``, only rows after the row
+                ``(before, before_id)`` in sort order, so tasks sharing the
+                cursor's timestamp are not skipped
+
+        Returns:
+            (rows, whether more rows follow)
+        """
+        with self._lock:
+            self._sync()
+            ordered = self._ordered.get(task_type or ALL_TYPES, [])
+            start = 0
+            if before is not None and before_id is not None:
+                start = bisect.bisect_right(ordered, ((-before, before_id), before_id))
+            elif before is not None:
+                start = bisect.bisect_left(ordered, ((-before + 1, ""), ""))
+            end = len(ordered) if limit is None else min(len(ordered), start + limit)
+            rows = [self._entries[task_id] for _, task_id in ordered[start:end]]
+            return rows, end < len(ordered)
+
+    def load_tasks(self, task_type: Optional[str] = ALL_TYPES,
+                   before: Optional[int] = None) -> List[Tuple[str, Dict[str, Any]]]:
+        """Full tasks of a type, newest first; used by the legacy unpaginated listing"""
+        rows, _ = self.list_summaries(task_type, before=before)
+        tasks = []
+        for row in rows:
+            try:
+                task_data = self.get(row.id)
+            except (OSError, ValueError) as e:
+                logger.error(f"Error reading task file {row.id}.json: {str(e)}")
+                continue
+            if task_data is not None:
+                tasks.append((row.id, task_data))
+        return tasks
+
+    def _get_dir_mtime_ns(self) -> Optional[int]:
+        try:
+            return os.stat(self.task_dir).st_mtime_ns
+        except OSError:
+            return None
+
+    def _put(self, summary: TaskSummary):
+        self._remove(summary.id)
+        self._entries[summary.id] = summary
+        for key in {ALL_TYPES, summary.type or ALL_TYPES}:
+            bisect.insort(self._ordered.setdefault(key, []), (summary.sort_key, summary.id))
+
+    def _remove(self, task_id: str):
+        old = self._entries.pop(task_id, None)
+        if old is None:
+            return
+        for key in {ALL_TYPES, old.type or ALL_TYPES}:
+            ordered = self._ordered.get(key, [])
+            index = bisect.bisect_left(ordered, (old.sort_key, old.id))
+            if index < len(ordered) and ordered[index][1] == task_id:
+                ordered.pop(index)
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        os.makedirs(self.task_dir, exist_ok=True)
+        try:
+            with open(self.index_file, "r", encoding="utf-8") as f:
+                index_data = json.load(f)
+            if index_data.get("version") == INDEX_VERSION:
+                for row in index_data.get("entries", []):
+                    self._put(TaskSummary(**row))
+                self._dir_mtime_ns = index_data.get("dir_mtime_ns")
+        except FileNotFoundError:
+            pass
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Ignoring corrupt task index {self.index_file}: {str(e)}")
+            self._entries.clear()
+            self._ordered.clear()
+        self._loaded = True
+
+    def _sync(self):
+        """Bring the index up to date with the task directory"""
+        self._ensure_loaded()
+        dir_mtime_ns = self._get_dir_mtime_ns()
+        if dir_mtime_ns is not None and dir_mtime_ns == self._dir_mtime_ns:
+            return
+
+        seen = set()
+        parsed = 0
+        with os.scandir(self.task_dir) as entries:
+            for entry in entries:
+                if not entry.name.endswith(".json") or not entry.is_file():
+                    continue
+                task_id = entry.name[:-len(".json")]
+                seen.add(task_id)
+                mtime_ns = entry.stat().st_mtime_ns
+                current = self._entries.get(task_id)
+                if current is not None and current.mtime_ns == mtime_ns:
+                    continue
+                try:
+                    with open(entry.path, "r", encoding="utf-8") as f:
+                        task_data = json.load(f)
+                except (OSError, ValueError) as e:
+                    logger.error(f"Error reading task file {entry.name}: {str(e)}")
+                    continue
+                if isinstance(task_data, dict):
+                    self._put(TaskSummary.from_task(task_id, task_data, mtime_ns))
+                    parsed += 1
+
+        for task_id in [task_id for task_id in self._entries if task_id not in seen]:
+            self._remove(task_id)
+        self._dir_mtime_ns = dir_mtime_ns
+        if parsed:
+            logger.info(f"Indexed {parsed} task files in {self.task_dir}")
+        self._save_index()
+
+    def _save_index(self):
+        index_data = {
+            "version": INDEX_VERSION,
+            "dir_mtime_ns": self._dir_mtime_ns,
+            "entries": [asdict(summary) for summary in self._entries.values()],
+        }
+        tmp_file = f"{self.index_file}.tmp"
+        try:
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump(index_data, f, ensure_ascii=False)
+            os.replace(tmp_file, self.index_file)
+        except OSError as e:
+            logger.warning(f"Could not save task index {self.index_file}: {str(e)}")
+
+
+def get_history_page(project_path: str, task_type: Optional[str], limit: Optional[int] = None,
+                     before: Optional[int] = None, with_id: bool = False,
+                     before_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Response body of the ``/history`` endpoints.
+
+    With ``limit`` the rows are summaries without messages plus the cursor of
+    the next page; without it the full task files are returned as before, so
+    existing clients keep working.
+
+    Args:
+        project_path: Project path
+        task_type: Task type to list, ALL_TYPES for every type
+        limit: Page size
+        before: Timestamp cursor, only older tasks are returned
+        before_id: Task id of the cursor, continues right after the row ``(before, before_id)``
+        with_id: Add the task id to full task data (auto router format)
+    """
+    store = get_task_history_store(project_path)
+    if limit is None:
+        tasks = []
+        for task_id, task_data in store.load_tasks(task_type, before):
+            if with_id:
+                task_data["id"] = task_id
+            tasks.append(task_data)
+        return {"tasks": tasks}
+
+    rows, has_more = store.list_summaries(task_type, limit, before, before_id)
+    last = rows[-1] if has_more and rows else None
+    return {
+        "tasks": [row.to_dict() for row in rows],
+        "has_more": has_more,
+        # 时间戳可能相同，游标同时包含时间戳和任务ID
+        "next_before": last.timestamp if last else None,
+        "next_before_id": last.id if last else None,
+    }
+
+
+_stores: Dict[str, TaskHistoryStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_task_history_store(project_path: str) -> TaskHistoryStore:
+    """The shared store of a project"""
+    with _stores_lock:
+        store = _stores.get(project_path)
+        if store is None:
+            store = _stores[project_path] = TaskHistoryStore(project_path)
+        return store
@@ -1,18 +1,23 @@
-from fastapi import WebSocket
+from fastapi import WebSocket, WebSocketDisconnect
 import asyncio
+import codecs
+import gzip
 import websockets
 import os
+import re
 import json
 import struct
 import signal
-from typing import Dict, Optional
+from collections import deque
+from typing import Any, Deque, Dict, Optional
 import threading
-import select
 import psutil
 import time
 import sys
 import platform
 
+from auto_coder_web.terminal_recording import SessionRecorder, recording_writer
+
 # 为不同平台选择合适的终端库
 if platform.system() == 'Windows':
     try:
@@ -25,9 +30,83 @@ else:
     import fcntl
     import termios
 
+# Maximum bytes taken from the PTY per read
+READ_CHUNK_SIZE = 64 * 1024
+# Output is flushed at most once per frame interval (~60 fps), bursts share a frame
+FRAME_INTERVAL = 0.016
+# Largest single WebSocket frame
+MAX_FRAME_SIZE = 256 * 1024
+# PTY reading pauses when this much output waits to be sent and resumes below LOW_WATERMARK
+HIGH_WATERMARK = 1024 * 1024
+LOW_WATERMARK = 256 * 1024
+# Client input is no longer received while this much input waits for the shell, resumes below INPUT_LOW_WATERMARK
+INPUT_HIGH_WATERMARK = 1024 * 1024
+INPUT_LOW_WATERMARK = 256 * 1024
+
+# Scrollback kept per session for replay on reattach
+SCROLLBACK_BYTES = 2 * 1024 * 1024
+# Scrollback budget shared by all sessions, per-session budgets shrink as sessions are added
+MAX_SCROLLBACK_TOTAL = 32 * 1024 * 1024
+MAX_SESSIONS = 32
+# Detached sessions are closed after this long without a client
+SESSION_IDLE_TIMEOUT = 30 * 60
+REAP_INTERVAL = 60
+
+SESSION_NAME_PATTERN = re.compile(r'^[\w.-]{1,128}$')
+
+
+class TerminalLimitError(Exception):
+    """Raised when no more terminal sessions can be created"""
+
+
+class ScrollbackBuffer:
+    """Byte-budgeted ring buffer of the most recent terminal output"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._chunks: Deque[bytes] = deque()
+
+    def append(self, data: bytes):
+        if not data:
+            return
+        self._chunks.append(data)
+        self.size += len(data)
+        self._trim()
+
+    def resize(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._trim()
+
+    def _trim(self):
+        while self.size > self.max_bytes and self._chunks:
+            excess = self.size - self.max_bytes
+            head = self._chunks[0]
+            if len(head) <= excess:
+                self._chunks.popleft()
+                self.size -= len(head)
+            else:
+                self._chunks[0] = head[excess:]
+                self.size -= excess
+
+    def snapshot(self) -> bytes:
+        data = b''.join(self._chunks)
+        # 丢弃旧数据时可能切断了UTF-8多字节字符，跳过开头残留的续字节
+        start = 0
+        while start < min(len(data), 3) and 0x80 <= data[start] <= 0xBF:
+            start += 1
+        return data[start:]
+
+
 class TerminalSession:
-    def __init__(self, websocket: WebSocket, shell: str = None):
+    def __init__(self, websocket: Optional[WebSocket], shell: str = None, binary: bool = False,
+                 name: Optional[str] = None, scrollback_bytes: int = SCROLLBACK_BYTES):
+        # 当前连接的客户端，会话分离（detached）时为 None
         self.websocket = websocket
+        self.name = name
+        self.created_at = time.time()
+        # binary: 输出以二进制帧发送原始字节，由客户端解码
+        self.binary = binary
         # 根据平台选择默认shell
         if shell is None:
             if platform.system() == 'Windows':
@@ -44,6 +123,24 @@ class TerminalSession:
         self._last_heartbeat = time.time()
         self.platform = platform.system()
         self.pty = None  # 用于Windows的winpty实例
+        # 文本模式下跨读取块的UTF-8多字节序列由增量解码器拼接
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        # Output read from the PTY and not yet sent
+        self._output = bytearray()
+        self._output_ready: Optional[asyncio.Event] = None
+        # Loop the PTY fd is registered with while reading is not paused
+        self._reader_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pty_eof = False
+        self._last_flush = 0.0
+        # Input the PTY did not accept yet (large pastes), flushed by an add_writer callback
+        self._input = bytearray()
+        self._writer_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._input_drained: Optional[asyncio.Event] = None
+        self.scrollback = ScrollbackBuffer(scrollback_bytes)
+        # Keeps scrollback replay and live output of one client in order
+        self._send_lock = asyncio.Lock()
+        # asciicast 录制，未开启录制时为 None
+        self.recorder: Optional[SessionRecorder] = None
 
     async def start(self):
         """Start the terminal session"""
@@ -86,6 +183,8 @@ class TerminalSession:
         """Resize the terminal"""
         if not self.running:
             return
+        if self.recorder is not None:
+            self.recorder.resize(rows, cols)
             
         if self.platform == 'Windows':
             if self.pty:
@@ -97,105 +196,216 @@ class TerminalSession:
                 # Set new window size
                 fcntl.ioctl(self.fd, termios.TIOCSWINSZ, size)
 
+    @property
+    def attached(self) -> bool:
+        return self.websocket is not None
+
+    async def attach(self, websocket: WebSocket, binary: bool = False) -> Optional[WebSocket]:
+        """
+        Attach a client and replay the scrollback to it.
+
+        Binary clients receive the scrollback as a single gzip compressed
+        binary frame, announced by a ``{"type": "scrollback"}`` text frame;
+        text clients receive it as one text frame.
+
+        Returns:
+            The previously attached websocket, which the caller should close
+        """
+        async with self._send_lock:
+            previous = self.websocket
+            self.websocket = websocket
+            self.binary = binary
+            self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+            self._last_heartbeat = time.time()
+            data = self.scrollback.snapshot()
+            if data:
+                try:
+                    if binary:
+                        compressed = await asyncio.to_thread(gzip.compress, data, 6)
+                        await websocket.send_text(json.dumps({
+                            "type": "scrollback", "encoding": "gzip", "size": len(data)}))
+                        await websocket.send_bytes(compressed)
+                    else:
+                        await websocket.send_text(data.decode('utf-8', errors='replace'))
+                except Exception as e:
+                    print(f"Error replaying scrollback: {e}")
+        return previous
+
+    def detach(self, websocket: WebSocket):
+        """Detach the client if it is still the attached one, the shell keeps running"""
+        if self.websocket is websocket:
+            self.websocket = None
+            self._last_heartbeat = time.time()
+
+    async def _emit(self, data: bytes):
+        """Record output in the scrollback and forward it to the attached client"""
+        if self.recorder is not None:
+            self.recorder.output(data)
+        async with self._send_lock:
+            self.scrollback.append(data)
+            if self.websocket is not None and not await self._safe_send(data):
+                # 连接已断开，转为分离状态，输出继续进入回滚缓冲
+                self.websocket = None
+
+    async def _safe_send(self, data: bytes) -> bool:
+        """Safely send data to websocket with error handling"""
+        try:
+            if self.websocket.client_state.CONNECTED:
+                if self.binary:
+                    await self.websocket.send_bytes(data)
+                else:
+                    text = self._decoder.decode(data)
+                    if text:
+                        await self.websocket.send_text(text)
+                return True
+            else:
+                print("WebSocket disconnected")
+                return False
+        except Exception as e:
+            print(f"WebSocket send error: {e}")
+            return False
+
     async def _handle_io(self):
         """Handle I/O between PTY and WebSocket"""
+        try:
+            if self.platform == 'Windows':
+                await self._handle_io_threaded()
+            else:
+                await self._handle_io_unix()
+        except Exception as e:
+            print(f"Fatal error in IO handling: {e}")
+        finally:
+            self.running = False
+            print("IO handling stopped")
+            self.cleanup()
+
+    def _start_reading(self):
+        if self._reader_loop is None and self.fd is not None and not self._pty_eof:
+            self._reader_loop = asyncio.get_running_loop()
+            self._reader_loop.add_reader(self.fd, self._on_pty_readable)
+
+    def _stop_reading(self):
+        if self._reader_loop is not None:
+            self._reader_loop.remove_reader(self.fd)
+            self._reader_loop = None
+
+    def _on_pty_readable(self):
+        """add_reader callback: move available PTY output into the send buffer"""
+        try:
+            data = os.read(self.fd, READ_CHUNK_SIZE)
+        except BlockingIOError:
+            return
+        except OSError:
+            # EIO: the shell exited and the slave side is closed
+            data = b''
+        if data:
+            self._output += data
+            if len(self._output) >= HIGH_WATERMARK:
+                # 客户端消费不过来，暂停读取PTY，由shell的写阻塞来限流
+                self._stop_reading()
+        else:
+            self._pty_eof = True
+            self._stop_reading()
+        self._output_ready.set()
+
+    async def _handle_io_unix(self):
+        """
+        Event loop native PTY I/O.
+
+        The non-blocking PTY fd is watched with ``loop.add_reader`` and its
+        output collected in a send buffer. The buffer is flushed at most once
+        per FRAME_INTERVAL, so the first output after an idle period (key
+        echo) goes out immediately while bursts are coalesced into frames of
+        up to MAX_FRAME_SIZE. Reading pauses when HIGH_WATERMARK bytes are
+        waiting for a slow client and resumes below LOW_WATERMARK.
+        """
+        loop = asyncio.get_running_loop()
+        self._output_ready = asyncio.Event()
+        os.set_blocking(self.fd, False)
+        self._start_reading()
+        try:
+            while self.running:
+                await self._output_ready.wait()
+                delay = self._last_flush + FRAME_INTERVAL - loop.time()
+                if delay > 0 and len(self._output) < MAX_FRAME_SIZE and not self._pty_eof:
+                    await asyncio.sleep(delay)
+                self._output_ready.clear()
+
+                while self._output and self.running:
+                    frame = bytes(self._output[:MAX_FRAME_SIZE])
+                    del self._output[:MAX_FRAME_SIZE]
+                    if len(self._output) < LOW_WATERMARK:
+                        self._start_reading()
+                    await self._emit(frame)
+                    self._last_flush = loop.time()
+
+                if self._pty_eof:
+                    break
+                self._start_reading()
+        finally:
+            self._stop_reading()
+
+    async def _handle_io_threaded(self):
+        """Windows fallback: blocking winpty reads in the default executor"""
         loop = asyncio.get_running_loop()
 
-        def _read_pty(fd, size=1024):
-            """Synchronous PTY read with timeout"""
+        def _read_pty(size=1024):
+            """Synchronous winpty read with timeout"""
+            if not self.pty:
+                return None
             try:
-                if self.platform == 'Windows':
-                    # Windows下使用winpty的读取方法
-                    if self.pty:
-                        try:
-                            # winpty 可能有不同的读取方法
-                            if hasattr(self.pty, 'read'):
-                                data = self.pty.read(size)
-                            elif hasattr(self.pty, 'read_blocking'):
-                                data = self.pty.read_blocking(size, timeout=100)  # 100ms超时
-                            else:
-                                # 如果没有直接的读取方法，返回空数据
-                                return b''
-                            
-                            if isinstance(data, str):
-                                return data.encode('utf-8')
-                            elif isinstance(data, bytes):
-                                return data
-                            else:
-                                return b''
-                        except Exception as e:
-                            print(f"Error reading from winpty: {e}")
-                            return None
+                # winpty 可能有不同的读取方法
+                if hasattr(self.pty, 'read'):
+                    data = self.pty.read(size)
+                elif hasattr(self.pty, 'read_blocking'):
+                    data = self.pty.read_blocking(size, timeout=100)  # 100ms超时
                 else:
-                    # Unix系统使用select
-                    r, _, _ = select.select([fd], [], [], 0.1)
-                    if r:
-                        try:
-                            data = os.read(fd, size)
-                            return data if data else None
-                        except (OSError, EOFError) as e:
-                            print(f"Error reading PTY: {e}")
-                            return None
+                    # 如果没有直接的读取方法，返回空数据
                     return b''
-            except Exception as e:
-                print(f"Fatal error in PTY read: {e}")
-                return None
 
-        async def _safe_send(data: bytes):
-            """Safely send data to websocket with error handling"""
-            try:
-                if self.websocket.client_state.CONNECTED:
-                    await self.websocket.send_text(data.decode('utf-8', errors='replace'))
-                    return True
+                if isinstance(data, str):
+                    return data.encode('utf-8')
+                elif isinstance(data, bytes):
+                    return data
                 else:
-                    print("WebSocket disconnected")
-                    return False
+                    return b''
             except Exception as e:
-                print(f"WebSocket send error: {e}")
-                return False
+                print(f"Error reading from winpty: {e}")
+                return None
 
         read_errors = 0
         MAX_READ_ERRORS = 3
 
-        try:
-            while self.running:
-                try:                    
-                    if self.fd is None:
-                        break
-                    data = await loop.run_in_executor(None, _read_pty, self.fd)
-
-                    if not self.running:
-                        break
-
-                    if data is None:
-                        read_errors += 1
-                        if read_errors >= MAX_READ_ERRORS:
-                            print(f"Too many PTY read errors ({read_errors}), stopping")
-                            break
-                        await asyncio.sleep(0.1)
-                        continue
-
-                    read_errors = 0
-
-                    if data:
-                        if not await _safe_send(data):
-                            break
+        while self.running:
+            try:
+                if self.pty is None:
+                    break
+                data = await loop.run_in_executor(None, _read_pty)
 
-                    await asyncio.sleep(0.001)
+                if not self.running:
+                    break
 
-                except Exception as e:
-                    print(f"IO handling error: {e}")
+                if data is None:
                     read_errors += 1
                     if read_errors >= MAX_READ_ERRORS:
+                        print(f"Too many PTY read errors ({read_errors}), stopping")
                         break
                     await asyncio.sleep(0.1)
+                    continue
 
-        except Exception as e:
-            print(f"Fatal error in IO handling: {e}")
-        finally:
-            self.running = False
-            print("IO handling stopped")
-            self.cleanup()
+                read_errors = 0
+
+                if data:
+                    await self._emit(data)
+
+                await asyncio.sleep(0.001)
+
+            except Exception as e:
+                print(f"IO handling error: {e}")
+                read_errors += 1
+                if read_errors >= MAX_READ_ERRORS:
+                    break
+                await asyncio.sleep(0.1)
 
     def write(self, data: str):
         """Write data to the terminal"""        
@@ -215,14 +425,70 @@ class TerminalSession:
             else:
                 encoded_data = data.encode('utf-8')
                 if self.fd is not None:
-                    os.write(self.fd, encoded_data)
+                    self._write_all(encoded_data)
         except Exception as e:
             print(f"Error writing to terminal: {e}")
 
+    def _write_all(self, data: bytes):
+        """
+        Write to the non-blocking PTY fd without blocking the event loop.
+
+        What the PTY's input queue does not accept is kept in order in the
+        pending input buffer and written by ``_on_pty_writable`` once the
+        shell has read some of its input.
+        """
+        if not self._input:
+            try:
+                written = os.write(self.fd, data)
+            except BlockingIOError:
+                written = 0
+            data = data[written:]
+            if not data:
+                return
+        self._input += data
+        if self._writer_loop is None:
+            self._writer_loop = asyncio.get_running_loop()
+            self._writer_loop.add_writer(self.fd, self._on_pty_writable)
+        if len(self._input) >= INPUT_HIGH_WATERMARK and self._input_drained is not None:
+            self._input_drained.clear()
+
+    def _stop_writing(self):
+        if self._writer_loop is not None:
+            self._writer_loop.remove_writer(self.fd)
+            self._writer_loop = None
+
+    def _on_pty_writable(self):
+        """add_writer callback: move pending input into the PTY"""
+        try:
+            written = os.write(self.fd, self._input)
+        except BlockingIOError:
+            return
+        except OSError:
+            # The shell exited, nobody reads the input anymore
+            written = len(self._input)
+        del self._input[:written]
+        if not self._input:
+            self._stop_writing()
+        if len(self._input) < INPUT_LOW_WATERMARK and self._input_drained is not None:
+            self._input_drained.set()
+
+    async def drain_input(self):
+        """Wait while more than INPUT_HIGH_WATERMARK bytes of input wait for the shell"""
+        if len(self._input) < INPUT_HIGH_WATERMARK:
+            return
+        if self._input_drained is None:
+            self._input_drained = asyncio.Event()
+        # 等到积压的输入降到 INPUT_LOW_WATERMARK 以下
+        while len(self._input) >= INPUT_LOW_WATERMARK and self.running:
+            self._input_drained.clear()
+            await self._input_drained.wait()
+
     def cleanup(self):
         """Clean up the terminal session"""
         print("Cleaning up terminal session...")
         self.running = False
+        if self.recorder is not None:
+            self.recorder.close()
         
         if self.platform == 'Windows':
             if self.pty:
@@ -243,6 +509,14 @@ class TerminalSession:
                 except Exception as e:
                     print(f"Error cleaning up winpty: {e}")
         else:
+            # 先从事件循环注销fd，再关闭，避免关闭后的fd号被复用时仍被监听
+            self._stop_reading()
+            self._stop_writing()
+            self._input.clear()
+            if self._input_drained is not None:
+                self._input_drained.set()
+            if self._output_ready is not None:
+                self._output_ready.set()
             if self.pid:
                 try:
                     os.kill(self.pid, signal.SIGTERM)
@@ -253,37 +527,191 @@ class TerminalSession:
                     os.close(self.fd)
                 except OSError:
                     pass
+                self.fd = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "pid": self.pid,
+            "running": self.running,
+            "attached": self.attached,
+            "binary": self.binary,
+            "created_at": self.created_at,
+            "last_heartbeat": self._last_heartbeat,
+            "scrollback_bytes": self.scrollback.size,
+            "scrollback_max_bytes": self.scrollback.max_bytes,
+            "recording": self.recorder.recording_id if self.recorder is not None else None,
+        }
 
 class TerminalManager:
-    def __init__(self):
+    """
+    Terminal sessions by name.
+
+    A client connecting with ``?session=<name>`` attaches to the running
+    session of that name (or creates it); when the connection closes the
+    session is only detached and the shell keeps running, so a page reload
+    reattaches to it. Connections without a name get a throwaway session
+    that is closed together with the connection.
+    """
+
+    def __init__(self, max_sessions: int = MAX_SESSIONS, max_buffer_bytes: int = MAX_SCROLLBACK_TOTAL,
+                 idle_timeout: float = SESSION_IDLE_TIMEOUT):
         self.sessions: Dict[str, TerminalSession] = {}
+        self.max_sessions = max_sessions
+        self.max_buffer_bytes = max_buffer_bytes
+        self.idle_timeout = idle_timeout
+        self._reaper_task: Optional[asyncio.Task] = None
+        # 录制目录未配置时不录制
+        self.recordings_dir: Optional[str] = None
+        self.record_all = False
+
+    def configure_recording(self, recordings_dir: str, record_all: bool = False):
+        """
+        Configure asciicast recording of terminal sessions
+
+        Args:
+            recordings_dir: 录制文件目录
+            record_all: 为true时录制所有会话，否则只录制以 ``?record=1`` 连接创建的会话
+        """
+        self.recordings_dir = recordings_dir
+        self.record_all = record_all
+
+    def _scrollback_budget(self, session_count: int) -> int:
+        return min(SCROLLBACK_BYTES, self.max_buffer_bytes // max(session_count, 1))
 
-    async def create_session(self, websocket: WebSocket, session_id: str):
+    def _rebalance_scrollback(self):
+        """Shrink (or grow back) every session's scrollback so the total stays within max_buffer_bytes"""
+        budget = self._scrollback_budget(len(self.sessions))
+        for session in self.sessions.values():
+            session.scrollback.resize(budget)
+
+    async def _evict_detached_session(self) -> bool:
+        """Close the least recently used detached session to make room for a new one"""
+        detached = [(session._last_heartbeat, name) for name, session in self.sessions.items()
+                    if not session.attached or not session.running]
+        if not detached:
+            return False
+        _, name = min(detached)
+        print(f"Terminal session limit reached, closing detached session {name}")
+        await self.close_session(name)
+        return True
+
+    async def create_session(self, websocket: WebSocket, session_id: str, binary: bool = False,
+                             record: bool = False):
         """Create a new terminal session"""
         if session_id in self.sessions:
             await self.close_session(session_id)
+        if len(self.sessions) >= self.max_sessions and not await self._evict_detached_session():
+            raise TerminalLimitError(f"Too many terminal sessions (max {self.max_sessions})")
 
-        session = TerminalSession(websocket)
+        session = TerminalSession(websocket, binary=binary, name=session_id,
+                                  scrollback_bytes=self._scrollback_budget(len(self.sessions) + 1))
         self.sessions[session_id] = session
-        await session.start()
+        self._rebalance_scrollback()
+        try:
+            if self.recordings_dir and (record or self.record_all):
+                session.recorder = recording_writer.start_recording(self.recordings_dir, session_id, session.shell)
+            await session.start()
+        except Exception:
+            session.cleanup()
+            del self.sessions[session_id]
+            self._rebalance_scrollback()
+            raise
+        self._ensure_reaper()
         return session
 
     async def close_session(self, session_id: str):
         """Close a terminal session"""
-        if session_id in self.sessions:
-            self.sessions[session_id].cleanup()
-            del self.sessions[session_id]
+        session = self.sessions.pop(session_id, None)
+        if session is None:
+            return
+        websocket = session.websocket
+        session.websocket = None
+        session.cleanup()
+        self._rebalance_scrollback()
+        if websocket is not None:
+            try:
+                await websocket.close(code=1000, reason="Terminal session closed")
+            except Exception:
+                pass
+
+    def _ensure_reaper(self):
+        if self._reaper_task is None or self._reaper_task.done():
+            self._reaper_task = asyncio.create_task(self._reap_loop())
+
+    async def _reap_loop(self):
+        while self.sessions:
+            await asyncio.sleep(REAP_INTERVAL)
+            await self.reap_idle_sessions()
+
+    async def reap_idle_sessions(self):
+        """Close sessions whose shell exited or that stayed detached for longer than idle_timeout"""
+        now = time.time()
+        for name, session in list(self.sessions.items()):
+            if not session.running:
+                await self.close_session(name)
+            elif not session.attached and now - session._last_heartbeat > self.idle_timeout:
+                print(f"Closing idle terminal session {name}")
+                await self.close_session(name)
+
+    def stats(self) -> Dict[str, Any]:
+        """Live sessions and their scrollback memory"""
+        sessions = [session.to_dict() for session in self.sessions.values()]
+        return {
+            "sessions": sessions,
+            "count": len(sessions),
+            "max_sessions": self.max_sessions,
+            "buffer_bytes": sum(session["scrollback_bytes"] for session in sessions),
+            "max_buffer_bytes": self.max_buffer_bytes,
+            "idle_timeout": self.idle_timeout,
+        }
 
     async def handle_websocket(self, websocket: WebSocket, session_id: str):
-        """Handle websocket connection for a terminal session"""
+        """
+        Handle websocket connection for a terminal session
+
+        Clients connecting with ``?binary=1`` receive the output as binary
+        frames of raw bytes, others as text frames. ``?session=<name>``
+        attaches to a named, detachable session, ``?record=1`` records a
+        newly created session.
+        """
         session = None
+        binary = websocket.query_params.get('binary', '').lower() in ('1', 'true')
+        name = websocket.query_params.get('session')
+        record = websocket.query_params.get('record', '').lower() in ('1', 'true')
+        detachable = bool(name)
+        if detachable:
+            session_id = name
         try:
             await websocket.accept()
-            session = await self.create_session(websocket, session_id)
+            if detachable and not SESSION_NAME_PATTERN.match(name):
+                await websocket.close(code=1008, reason="Invalid terminal session name")
+                return
+
+            session = self.sessions.get(session_id) if detachable else None
+            if session is not None and session.running:
+                previous = await session.attach(websocket, binary=binary)
+                if previous is not None:
+                    # 同一会话只保留最新的连接，旧连接正常关闭（不会触发客户端重连）
+                    try:
+                        await previous.close(code=1000, reason="Terminal session attached elsewhere")
+                    except Exception:
+                        pass
+            else:
+                try:
+                    session = await self.create_session(websocket, session_id, binary=binary, record=record)
+                except TerminalLimitError as e:
+                    await websocket.send_text(json.dumps({"type": "error", "message": str(e)}))
+                    await websocket.close(code=1013, reason=str(e))
+                    return
 
             try:
                 while True:
+                    # shell 还没读走的输入过多时先不接收新消息，由WebSocket向客户端反压
+                    await session.drain_input()
                     data = await websocket.receive_text()
+                    # 任何客户端消息（输入、调整大小、心跳）都说明会话在使用中
+                    session._last_heartbeat = time.time()
 
                     # ① 尝试解析 JSON
                     try:
@@ -298,7 +726,7 @@ class TerminalManager:
                             case 'resize':
                                 session.resize(msg['rows'], msg['cols'])
                             case 'heartbeat':
-                                session._last_heartbeat = time.time()
+                                pass  # 收到任何消息时都已刷新心跳时间
                             case 'stdin':
                                 if 'payload' in msg:
                                     session.write(msg['payload'])
@@ -306,6 +734,8 @@ class TerminalManager:
                                 session.write(data)   # 兜底：未知控制消息 → 直接写
                     else:
                         session.write(data) 
+            except WebSocketDisconnect:
+                print("WebSocket disconnected during terminal session")
             except websockets.exceptions.ConnectionClosed:
                 print("WebSocket closed normally during terminal session")
             except Exception as e:
@@ -321,7 +751,10 @@ class TerminalManager:
             if not ("1001" in str(e) or "ConnectionClosed" in str(e.__class__.__name__)):
                 raise
         finally:
-            if session_id in self.sessions:
+            if detachable:
+                if session is not None:
+                    session.detach(websocket)
+            elif session_id in self.sessions:
                 await self.close_session(session_id)
 
 terminal_manager = TerminalManager()
\ No newline at end of file
@@ -0,0 +1,267 @@
+"""
+Terminal session recording in asciicast v2 format.
+
+Recording must not slow down the terminal output path, so a session only
+timestamps each output chunk or resize and puts it on a ``queue.SimpleQueue``
+(a non-blocking put, no lock shared with the writer). A single writer thread
+does the UTF-8 decoding and JSON encoding and appends to the recording files
+through large write buffers, flushed about once a second.
+
+A recording ``<id>.cast`` is rotated when it exceeds ``max_bytes``: the full
+file is renamed to ``<id>.<n>.cast`` (n = 1, 2, ...), at most ``max_parts``
+rotated parts are kept, and recording continues in a new ``<id>.cast`` with
+its own header and time base, so every part plays on its own.
+"""
+import codecs
+import json
+import os
+import queue
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+RECORDING_SUFFIX = ".cast"
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+DEFAULT_MAX_PARTS = 5
+WRITE_BUFFER_SIZE = 256 * 1024
+FLUSH_INTERVAL = 1.0
+
+RECORDING_ID_PATTERN = re.compile(r'^[\w.-]{1,200}$')
+
+
+class SessionRecorder:
+    """Producer side of one recording, used by the terminal session on the event loop"""
+
+    def __init__(self, writer: "RecordingWriter", recording_id: str, path: str):
+        self.recording_id = recording_id
+        self.path = path
+        self._writer = writer
+        self._start = time.monotonic()
+        self.closed = False
+
+    def output(self, data: bytes):
+        if not self.closed:
+            self._writer.submit(("o", self, time.monotonic() - self._start, data))
+
+    def resize(self, rows: int, cols: int):
+        if not self.closed:
+            self._writer.submit(("r", self, time.monotonic() - self._start, (rows, cols)))
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self._writer.submit(("close", self))
+
+
+class _RecordingFile:
+    """Writer side of one recording, only touched by the writer thread"""
+
+    def __init__(self, path: str, title: str, shell: str, max_bytes: int, max_parts: int):
+        self.path = path
+        self.title = title
+        self.shell = shell
+        self.max_bytes = max_bytes
+        self.max_parts = max_parts
+        self.width = 80
+        self.height = 24
+        self.parts = 0
+        # Seconds since the recording started at which the current part started
+        self.time_offset = 0.0
+        self.decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self.dirty = False
+        self._open()
+
+    def _open(self):
+        self.file = open(self.path, 'ab', buffering=WRITE_BUFFER_SIZE)
+        self.size = self.file.tell()
+        header = {
+            "version": 2,
+            "width": self.width,
+            "height": self.height,
+            "timestamp": int(time.time()),
+            "title": self.title,
+            "env": {"SHELL": self.shell, "TERM": "xterm-256color"},
+        }
+        self._write_line(json.dumps(header, ensure_ascii=False))
+
+    def _write_line(self, line: str):
+        data = (line + "\n").encode("utf-8")
+        self.file.write(data)
+        self.size += len(data)
+        self.dirty = True
+
+    def write_event(self, elapsed: float, code: str, data: str):
+        if not data:
+            return
+        self._write_line(json.dumps([round(elapsed - self.time_offset, 6), code, data], ensure_ascii=False))
+        if self.size >= self.max_bytes:
+            self._rotate(elapsed)
+
+    def write_output(self, elapsed: float, data: bytes):
+        self.write_event(elapsed, "o", self.decoder.decode(data))
+
+    def write_resize(self, elapsed: float, rows: int, cols: int):
+        self.width, self.height = cols, rows
+        self.write_event(elapsed, "r", f"{cols}x{rows}")
+
+    def _rotate(self, elapsed: float):
+        self.file.close()
+        self.parts += 1
+        base = self.path[:-len(RECORDING_SUFFIX)]
+        os.replace(self.path, f"{base}.{self.parts}{RECORDING_SUFFIX}")
+        expired = f"{base}.{self.parts - self.max_parts}{RECORDING_SUFFIX}"
+        if self.parts > self.max_parts and os.path.exists(expired):
+            os.remove(expired)
+        self.time_offset = elapsed
+        self._open()
+
+    def flush(self):
+        if self.dirty:
+            self.file.flush()
+            self.dirty = False
+
+    def close(self):
+        self.file.close()
+
+
+class RecordingWriter:
+    """Dedicated writer thread shared by all recordings"""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, max_parts: int = DEFAULT_MAX_PARTS):
+        self.max_bytes = max_bytes
+        self.max_parts = max_parts
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._active: Dict[str, SessionRecorder] = {}
+
+    def submit(self, item):
+        self._queue.put(item)
+
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="terminal-recording-writer", daemon=True)
+                self._thread.start()
+
+    def start_recording(self, directory: str, name: str, shell: str) -> SessionRecorder:
+        """
+        Start recording a terminal session
+
+        Args:
+            directory: 录制文件所在目录
+            name: 终端会话名称，用于生成录制ID
+            shell: 会话使用的shell，写入asciicast头部
+
+        Returns:
+            会话使用的录制器
+        """
+        os.makedirs(directory, exist_ok=True)
+        base_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{name}"
+        recording_id = base_id
+        counter = 1
+        while os.path.exists(os.path.join(directory, recording_id + RECORDING_SUFFIX)):
+            counter += 1
+            recording_id = f"{base_id}-{counter}"
+        path = os.path.join(directory, recording_id + RECORDING_SUFFIX)
+
+        self._ensure_started()
+        recorder = SessionRecorder(self, recording_id, path)
+        self._active[recording_id] = recorder
+        self.submit(("open", recorder, name, shell))
+        return recorder
+
+    def is_active(self, recording_id: str) -> bool:
+        recorder = self._active.get(recording_id)
+        return recorder is not None and not recorder.closed
+
+    def flush(self, timeout: float = 2.0):
+        """Write buffered events of all recordings to disk, e.g. before a recording is read"""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        done = threading.Event()
+        self.submit(("flush", done))
+        done.wait(timeout)
+
+    def stop(self, timeout: float = 5.0):
+        """Flush and close all recordings and stop the writer thread"""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self.submit(("stop",))
+        self._thread.join(timeout)
+
+    def _run(self):
+        files: Dict[SessionRecorder, _RecordingFile] = {}
+        last_flush = time.monotonic()
+        while True:
+            try:
+                item = self._queue.get(timeout=FLUSH_INTERVAL)
+            except queue.Empty:
+                item = None
+
+            try:
+                kind = item[0] if item else None
+                if kind == "o":
+                    recording = files.get(item[1])
+                    if recording is not None:
+                        recording.write_output(item[2], item[3])
+                elif kind == "r":
+                    recording = files.get(item[1])
+                    if recording is not None:
+                        recording.write_resize(item[2], *item[3])
+                elif kind == "open":
+                    recorder = item[1]
+                    files[recorder] = _RecordingFile(recorder.path, item[2], item[3], self.max_bytes, self.max_parts)
+                elif kind == "close":
+                    recording = files.pop(item[1], None)
+                    self._active.pop(item[1].recording_id, None)
+                    if recording is not None:
+                        recording.close()
+                elif kind == "flush":
+                    for recording in files.values():
+                        recording.flush()
+                    item[1].set()
+                elif kind == "stop":
+                    for recorder, recording in files.items():
+                        recorder.closed = True
+                        recording.close()
+                    files.clear()
+                    self._active.clear()
+                    return
+            except Exception as e:
+                logger.error(f"Error writing terminal recording: {str(e)}")
+
+            now = time.monotonic()
+            if now - last_flush >= FLUSH_INTERVAL:
+                for recording in files.values():
+                    try:
+                        recording.flush()
+                    except Exception as e:
+                        logger.error(f"Error flushing terminal recording {recording.path}: {str(e)}")
+                last_flush = now
+
+
+def list_recordings(directory: str) -> List[Dict[str, Any]]:
+    """Recordings (including rotated parts) in a directory, newest first"""
+    if not os.path.isdir(directory):
+        return []
+    recordings = []
+    for entry in os.scandir(directory):
+        if not entry.is_file() or not entry.name.endswith(RECORDING_SUFFIX):
+            continue
+        stat = entry.stat()
+        recording_id = entry.name[:-len(RECORDING_SUFFIX)]
+        recordings.append({
+            "id": recording_id,
+            "size": stat.st_size,
+            "modified": stat.st_mtime,
+            "active": recording_writer.is_active(recording_id),
+        })
+    recordings.sort(key=lambda r: r["modified"], reverse=True)
+    return recordings
+
+
+recording_writer = RecordingWriter()
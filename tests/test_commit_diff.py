@@ -0,0 +1,103 @@
+"""
+Benchmarks of the commit diff of the history panel on a temporary repository.
+
+All change types come from a single ``git diff-tree`` pass, so a commit with
+hundreds of files costs the same two git processes as a commit with one.
+"""
+import asyncio
+import os
+import time
+
+import git
+import pytest
+
+from auto_coder_web.git_service import GitService
+
+history_router = pytest.importorskip("auto_coder_web.expert_routers.history_router")
+
+MODIFIED_FILES = 500
+# Generous bound, the two git processes take a few tens of milliseconds
+MAX_DIFF_SECONDS = 5.0
+
+RENAMED_CONTENT = "".join(f"def function_{i}():\n    return {i}\n\n" for i in range(50))
+
+
+def commit_all(repo: git.Repo, message: str) -> str:
+    repo.git.add(A=True)
+    repo.git.commit("-m", message)
+    return repo.head.commit.hexsha
+
+
+@pytest.fixture
+def repo(tmp_path):
+    repo = git.Repo.init(tmp_path)
+    with repo.config_writer() as config:
+        config.set_value("user", "name", "test")
+        config.set_value("user", "email", "test@example.com")
+    return repo
+
+
+def write(repo: git.Repo, path: str, content: str):
+    file_path = os.path.join(repo.working_tree_dir, path)
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, "w") as f:
+        f.write(content)
+
+
+def compute(repo: git.Repo, sha: str):
+    service = GitService(repo.working_tree_dir)
+
+    async def run():
+        commit_sha, parent_sha = await history_router.resolve_commit(service, sha)
+        start = time.perf_counter()
+        result = await history_router.compute_commit_diff(service, commit_sha, parent_sha)
+        return result, time.perf_counter() - start
+
+    return asyncio.run(run())
+
+
+def change_types(result):
+    return {change["path"]: change["change_type"] for change in result["file_changes"]}
+
+
+def test_root_commit_files_are_all_added(repo):
+    write(repo, "README.md", "hello\n")
+    write(repo, "src/main.py", "print('hello')\n")
+    root = commit_all(repo, "root")
+
+    result, _ = compute(repo, root)
+
+    assert result["success"]
+    assert change_types(result) == {"README.md": "added", "src/main.py": "added"}
+    assert "src/main.py" in result["diff"]
+
+
+def test_change_types_of_a_large_commit(repo):
+    write(repo, "modified.txt", "before\n")
+    write(repo, "deleted.txt", "going away\n")
+    write(repo, "old/name.py", RENAMED_CONTENT)
+    for i in range(MODIFIED_FILES):
+        write(repo, f"pkg/module_{i}.py", f"value = {i}\n")
+    commit_all(repo, "base")
+
+    write(repo, "modified.txt", "after\n")
+    write(repo, "added.txt", "new file\n")
+    repo.git.rm("deleted.txt")
+    os.renames(os.path.join(repo.working_tree_dir, "old/name.py"),
+               os.path.join(repo.working_tree_dir, "new/name.py"))
+    for i in range(MODIFIED_FILES):
+        write(repo, f"pkg/module_{i}.py", f"value = {i + 1}\n")
+    sha = commit_all(repo, "change")
+
+    result, elapsed = compute(repo, sha)
+
+    assert elapsed < MAX_DIFF_SECONDS
+    types = change_types(result)
+    assert len(types) == MODIFIED_FILES + 4
+    assert types["modified.txt"] == "modified"
+    assert types["added.txt"] == "added"
+    assert types["deleted.txt"] == "deleted"
+    # Renames are reported once, under the new path
+    assert types["new/name.py"] == "renamed"
+    assert "old/name.py" not in types
+    assert all(types[f"pkg/module_{i}.py"] == "modified" for i in range(MODIFIED_FILES))
@@ -0,0 +1,144 @@
+"""
+Benchmarks of history windowing on synthetic 10k-message sessions.
+
+The tokenizer is replaced by a deterministic counter so the timings measure
+the windowing and the token cache, not the tokenizer.
+"""
+import json
+import time
+
+import pytest
+
+from auto_coder_web import history_window
+from auto_coder_web.history_window import (
+    DEFAULT_HISTORY_TOKEN_BUDGET,
+    TOOL_OUTPUT_TOKEN_LIMITS,
+    apply_truncation_policy,
+    build_history_window,
+)
+
+SESSION_SIZE = 10000
+# Generous bounds, a windowing pass takes a few milliseconds
+MAX_WINDOW_SECONDS = 0.5
+MAX_FULL_WALK_SECONDS = 5.0
+
+
+class CountingTokenizer:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, text: str) -> int:
+        self.calls += 1
+        return len(text) // 4 + 1
+
+
+@pytest.fixture
+def tokenizer(monkeypatch):
+    from autocoder.rag import token_counter
+
+    counter = CountingTokenizer()
+    monkeypatch.setattr(token_counter, "count_tokens", counter)
+    history_window._token_cache.clear()
+    yield counter
+    history_window._token_cache.clear()
+
+
+def make_session(size: int = SESSION_SIZE):
+    """User/assistant turns mixed with tool outputs, some far above their limits"""
+    messages = []
+    for i in range(size):
+        if i % 10 == 9:
+            content = json.dumps({
+                "tool_name": "ReadFileTool",
+                "success": True,
+                "content": f"line {i} of a large file\n" * (400 if i % 50 == 49 else 5),
+            })
+            messages.append({"role": "user", "content": content})
+        elif i % 2 == 0:
+            messages.append({"role": "user", "content": f"question {i}: " + "please change the code " * 20})
+        else:
+            messages.append({"role": "assistant", "content": f"answer {i}: " + "here is the change " * 40})
+    return messages
+
+
+def test_window_of_10k_session_is_bounded(tokenizer):
+    messages = make_session()
+
+    start = time.perf_counter()
+    window = build_history_window(messages, DEFAULT_HISTORY_TOKEN_BUDGET)
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < MAX_WINDOW_SECONDS
+    assert 0 < window.included_count < SESSION_SIZE
+    assert window.included_tokens <= DEFAULT_HISTORY_TOKEN_BUDGET
+    # The window is the newest contiguous suffix of the session
+    assert window.messages[-1] == apply_truncation_policy(messages[-1])[0]
+    # Messages older than the window are never tokenized
+    assert tokenizer.calls < 2 * window.included_count + 2
+
+
+def test_rebuilding_window_hits_token_cache(tokenizer):
+    messages = make_session()
+    first = build_history_window(messages, DEFAULT_HISTORY_TOKEN_BUDGET)
+    calls = tokenizer.calls
+
+    second = build_history_window(messages, DEFAULT_HISTORY_TOKEN_BUDGET)
+    assert tokenizer.calls == calls
+    assert second.to_dict() == first.to_dict()
+
+    # A new message is the only content that gets tokenized
+    messages.append({"role": "user", "content": "one more question"})
+    build_history_window(messages, DEFAULT_HISTORY_TOKEN_BUDGET)
+    assert tokenizer.calls == calls + 1
+
+
+def test_full_walk_of_10k_session_is_cached(tokenizer):
+    messages = make_session()
+    budget = 10 ** 9
+
+    start = time.perf_counter()
+    window = build_history_window(messages, budget)
+    first_elapsed = time.perf_counter() - start
+    assert window.included_count == SESSION_SIZE
+    assert window.truncated_count > 0
+    assert first_elapsed < MAX_FULL_WALK_SECONDS
+
+    calls = tokenizer.calls
+    start = time.perf_counter()
+    build_history_window(messages, budget)
+    assert time.perf_counter() - start < MAX_FULL_WALK_SECONDS
+    assert tokenizer.calls == calls
+
+
+def test_tool_outputs_are_truncated_to_their_limit(tokenizer):
+    messages = make_session(100)
+    window = build_history_window(messages, 10 ** 9)
+    limit = TOOL_OUTPUT_TOKEN_LIMITS["ReadFileTool"]
+    for message in window.messages:
+        text = message["content"]
+        if "tool_name" in text:
+            assert len(text) // 4 + 1 <= limit + 50
+
+
+@pytest.mark.parametrize("content", [
+    json.dumps({"tool_name": "ReadFileTool", "success": True, "content": "x" * 200000}),
+    "y" * 200000,
+])
+def test_newest_message_over_budget_is_truncated_to_fit(tokenizer, content):
+    messages = make_session(20) + [{"role": "user", "content": content}]
+    budget = 1000
+
+    window = build_history_window(messages, budget)
+
+    assert window.included_count == 1
+    assert window.truncated_count == 1
+    assert 0 < window.included_tokens <= budget
+    assert window.messages[0]["role"] == "user"
+    assert window.messages[0]["content"]
+
+
+def test_tiny_budget_still_keeps_newest_message(tokenizer):
+    messages = make_session(20)
+    window = build_history_window(messages, 5)
+    assert window.included_count == 1
+    assert window.included_tokens <= 5
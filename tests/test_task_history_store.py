@@ -0,0 +1,67 @@
+import os
+
+import pytest
+
+from auto_coder_web.task_history_store import ALL_TYPES, TaskHistoryStore, get_history_page
+
+
+@pytest.fixture
+def project_path(tmp_path):
+    os.makedirs(tmp_path / ".auto-coder" / "auto-coder.web" / "tasks")
+    return str(tmp_path)
+
+
+def save_task(store: TaskHistoryStore, task_id: str, timestamp: int, task_type: str = "chat"):
+    store.save(task_id, {"type": task_type, "query": task_id, "status": "completed",
+                         "timestamp": timestamp, "messages": []})
+
+
+def read_all_pages(project_path: str, task_type: str, limit: int):
+    ids = []
+    before = before_id = None
+    while True:
+        page = get_history_page(project_path, task_type, limit, before, before_id=before_id)
+        ids.extend(task["id"] for task in page["tasks"])
+        if not page["has_more"]:
+            return ids
+        before, before_id = page["next_before"], page["next_before_id"]
+
+
+def test_tasks_sharing_a_timestamp_across_page_boundary(project_path):
+    store = TaskHistoryStore(project_path)
+    save_task(store, "newest", 300)
+    for i in range(7):
+        save_task(store, f"tie-{i}", 200)
+    save_task(store, "oldest", 100)
+
+    expected = ["newest"] + [f"tie-{i}" for i in range(7)] + ["oldest"]
+    for limit in (1, 2, 3, 4):
+        assert read_all_pages(project_path, "chat", limit) == expected
+
+    first_page = get_history_page(project_path, "chat", 3)
+    assert first_page["next_before"] == 200
+    assert first_page["next_before_id"] == "tie-1"
+
+
+def test_cursor_survives_deleted_boundary_task(project_path):
+    store = TaskHistoryStore(project_path)
+    for i in range(4):
+        save_task(store, f"tie-{i}", 200)
+
+    page = get_history_page(project_path, "chat", 2)
+    os.remove(store.task_file(page["next_before_id"]))
+
+    rest = get_history_page(project_path, "chat", 10, page["next_before"],
+                            before_id=page["next_before_id"])
+    assert [task["id"] for task in rest["tasks"]] == ["tie-2", "tie-3"]
+
+
+def test_timestamp_only_cursor_returns_strictly_older_tasks(project_path):
+    store = TaskHistoryStore(project_path)
+    save_task(store, "a", 200)
+    save_task(store, "b", 200, task_type="coding")
+    save_task(store, "c", 100)
+
+    rows, has_more = store.list_summaries(ALL_TYPES, before=200)
+    assert [row.id for row in rows] == ["c"]
+    assert not has_more